@@ -11,6 +11,32 @@ interface IQFile {
   num_samples: number;
   modified: number;
   format: string;
+  sample_rate: number;
+  center_freq: number | null;
+  source_format: string;
+  source_filename: string;
+  description: string | null;
+  annotations: number;
+  preview: IQPreview | null;
+}
+
+interface IQPreview {
+  waterfall_url: string;
+  psd_url: string;
+  psd_data_url: string;
+  peak_db: number;
+  peak_offset_hz: number;
+  noise_floor_db: number;
+}
+
+interface IQConversion {
+  id: string;
+  filename: string;
+  source_filename: string;
+  source_format: string;
+  status: 'converting' | 'failed';
+  progress: number;
+  error: string | null;
 }
 
 const IQLibraryPage: React.FC = () => {
@@ -18,6 +44,7 @@ const IQLibraryPage: React.FC = () => {
   const DEMO_MODE = true;
 
   const [iqFiles, setIqFiles] = useState<IQFile[]>([]);
+  const [conversions, setConversions] = useState<IQConversion[]>([]);
   const [loading, setLoading] = useState(true);
   const [uploading, setUploading] = useState(false);
 
@@ -25,11 +52,20 @@ const IQLibraryPage: React.FC = () => {
     loadIQFiles();
   }, []);
 
+  // Poll while uploads are still being converted to complex64 or previewed
+  useEffect(() => {
+    const converting = conversions.some((c) => c.status === 'converting');
+    if (!converting && !iqFiles.some((f) => !f.preview)) return;
+    const timer = setTimeout(loadIQFiles, converting ? 1000 : 3000);
+    return () => clearTimeout(timer);
+  }, [conversions, iqFiles]);
+
   const loadIQFiles = async () => {
     try {
       const response = await fetch(`${API_BASE_URL}/api/v1/iq-library`);
       const data = await response.json();
       setIqFiles(data.iq_files);
+      setConversions(data.conversions || []);
     } catch (error) {
       console.error('Failed to load IQ files:', error);
     } finally {
@@ -124,7 +160,7 @@ const IQLibraryPage: React.FC = () => {
             <input
               type="file"
               multiple
-              accept=".iq,.dat,.raw,.cfile"
+              accept=".iq,.dat,.raw,.cfile,.cf32,.fc32,.cu8,.cs8,.cs16,.sc16,.wav,.sigmf-data,.sigmf-meta"
               onChange={handleUpload}
               disabled={uploading || DEMO_MODE}
               className="hidden"
@@ -133,6 +169,25 @@ const IQLibraryPage: React.FC = () => {
         </div>
       </div>
 
+      {/* Conversions in progress */}
+      {conversions.length > 0 && (
+        <div className="card p-6 mb-6">
+          <h2 className="text-lg font-semibold text-text-primary mb-4">Converting</h2>
+          <div className="space-y-2">
+            {conversions.map((job) => (
+              <div key={job.id} className="flex items-center justify-between text-sm">
+                <span className="text-text-primary">
+                  {job.source_filename} <span className="uppercase text-text-muted">({job.source_format})</span>
+                </span>
+                <span className={job.status === 'failed' ? 'text-red-500' : 'text-text-secondary'}>
+                  {job.status === 'failed' ? `Failed: ${job.error}` : `${Math.round(job.progress * 100)}%`}
+                </span>
+              </div>
+            ))}
+          </div>
+        </div>
+      )}
+
       {/* IQ Files List */}
       <div className="card p-6 mb-6">
         <h2 className="text-lg font-semibold text-text-primary mb-4">
@@ -142,7 +197,7 @@ const IQLibraryPage: React.FC = () => {
           <div className="text-center py-8 text-text-secondary">Loading...</div>
         ) : iqFiles.length === 0 ? (
           <div className="text-center py-8 text-text-secondary">
-            No IQ files uploaded yet. Upload .iq, .dat, .raw, or .cfile files to get started.
+            No IQ files uploaded yet. Upload IQ captures (complex float, cu8, cs8, cs16, WAV or SigMF) to get started.
           </div>
         ) : (
           <div className="space-y-3">
@@ -155,6 +210,9 @@ const IQLibraryPage: React.FC = () => {
                   <FileAudio className="w-8 h-8 text-primary" />
                   <div className="flex-1">
                     <div className="font-medium text-text-primary">{file.filename}</div>
+                    {file.description && (
+                      <div className="text-sm text-text-secondary">{file.description}</div>
+                    )}
                     <div className="flex gap-4 text-xs text-text-secondary mt-1">
                       <span className="flex items-center gap-1">
                         <HardDrive className="w-3 h-3" />
@@ -165,9 +223,34 @@ const IQLibraryPage: React.FC = () => {
                         {formatDuration(file.duration_seconds)}
                       </span>
                       <span>{file.num_samples.toLocaleString()} samples</span>
-                      <span className="uppercase">{file.format}</span>
+                      <span>{(file.sample_rate / 1e6).toFixed(3)} MS/s</span>
+                      {file.center_freq != null && <span>{(file.center_freq / 1e6).toFixed(3)} MHz</span>}
+                      <span className="uppercase">{file.source_format || file.format}</span>
+                      {file.annotations > 0 && <span>{file.annotations} annotations</span>}
+                      {file.preview && (
+                        <span>
+                          Peak {file.preview.peak_db} dB @ {(file.preview.peak_offset_hz / 1e3).toFixed(1)} kHz,
+                          floor {file.preview.noise_floor_db} dB
+                        </span>
+                      )}
                     </div>
                   </div>
+                  {file.preview ? (
+                    <div className="flex gap-2">
+                      <img
+                        src={`${API_BASE_URL}${file.preview.waterfall_url}`}
+                        alt={`${file.filename} waterfall`}
+                        className="h-16 w-32 rounded object-fill"
+                      />
+                      <img
+                        src={`${API_BASE_URL}${file.preview.psd_url}`}
+                        alt={`${file.filename} spectrum`}
+                        className="h-16 w-40 rounded object-fill"
+                      />
+                    </div>
+                  ) : (
+                    <span className="text-xs text-text-secondary">Analyzing spectrum...</span>
+                  )}
                 </div>
 
                 <button
@@ -187,14 +270,16 @@ const IQLibraryPage: React.FC = () => {
       <div className="card p-6">
         <h2 className="text-lg font-semibold text-text-primary mb-4">Supported Formats</h2>
         <ul className="list-disc list-inside text-sm text-text-secondary space-y-2">
-          <li><strong className="text-text-primary">.iq</strong> - Complex64 IQ samples (I/Q interleaved, 32-bit float)</li>
-          <li><strong className="text-text-primary">.dat</strong> - Raw binary IQ data</li>
-          <li><strong className="text-text-primary">.raw</strong> - Raw IQ samples</li>
-          <li><strong className="text-text-primary">.cfile</strong> - GNU Radio complex float format</li>
+          <li><strong className="text-text-primary">.iq, .cfile, .cf32, .dat, .raw</strong> - Complex64 IQ samples (I/Q interleaved, 32-bit float), used as is</li>
+          <li><strong className="text-text-primary">.cu8</strong> - rtl_sdr unsigned 8-bit IQ</li>
+          <li><strong className="text-text-primary">.cs8</strong> - HackRF signed 8-bit IQ</li>
+          <li><strong className="text-text-primary">.cs16, .sc16</strong> - Signed 16-bit IQ (HackRF, USRP)</li>
+          <li><strong className="text-text-primary">.wav</strong> - Two-channel (I/Q) WAV, 8/16/32-bit PCM or 32-bit float</li>
+          <li><strong className="text-text-primary">.sigmf-data + .sigmf-meta</strong> - SigMF recording (upload both together)</li>
         </ul>
         <p className="text-sm text-text-secondary mt-4">
-          All files should contain complex64 samples (8 bytes per sample).
-          Sample rate is assumed to be 1.024 MHz for duration calculation.
+          Other formats are converted to complex64 in the background; the original is kept alongside.
+          WAV and SigMF files carry their own sample rate; raw captures default to 1.024 MHz.
         </p>
       </div>
     </div>
@@ -30,6 +30,23 @@ const MediaLibraryPage: React.FC = () => {
 
   useEffect(() => {
     fetchMedia();
+
+    // Live updates: the server pushes files added/removed after the initial listing
+    const events = new EventSource(`${API_BASE_URL}/api/v1/media/events`);
+    events.addEventListener('added', (e) => {
+      const added: MediaFile = JSON.parse((e as MessageEvent).data);
+      setMediaFiles(prev => {
+        const others = prev.filter(f => f.path !== added.path);
+        return [...others, added].sort((a, b) => a.filename.localeCompare(b.filename));
+      });
+    });
+    events.addEventListener('removed', (e) => {
+      const removed: MediaFile = JSON.parse((e as MessageEvent).data);
+      setMediaFiles(prev => prev.filter(f => f.path !== removed.path));
+    });
+    events.addEventListener('resync', () => fetchMedia());
+
+    return () => events.close();
   }, []);
 
   useEffect(() => {
@@ -243,7 +260,7 @@ const MediaLibraryPage: React.FC = () => {
                 onClick={() => setSelectedImage(file)}
               >
                 <img
-                  src={`${file.path}?t=${file.modified}`}
+                  src={`${file.path}?w=320&t=${file.modified}`}
                   alt={file.filename}
                   className="w-full h-full object-cover"
                   loading="lazy"
@@ -320,7 +337,7 @@ const MediaLibraryPage: React.FC = () => {
                 >
                   <td className="py-2 px-4">
                     <img
-                      src={file.path}
+                      src={`${file.path}?w=160`}
                       alt={file.filename}
                       className="w-12 h-12 object-cover rounded cursor-pointer"
                       onClick={() => setSelectedImage(file)}
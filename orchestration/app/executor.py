@@ -3,8 +3,23 @@ import json
 import os
 import time
 import paho.mqtt.client as mqtt
+import threading
 import docker
 from redis_manager import RedisManager
+from iq_ingest import read_sidecar
+
+
+# Host ports for SDR instances' rtl_tcp servers, shared by every exercise on this host
+_sdr_port_range = os.getenv('SDR_PORT_RANGE', '1234-1263').split('-')
+SDR_PORT_POOL = range(int(_sdr_port_range[0]), int(_sdr_port_range[-1]) + 1)
+SDR_PORT_LABEL = 'scip.sdr-port'
+_reserved_sdr_ports = {}  # port -> container name
+_sdr_ports_lock = threading.Lock()
+
+# Host path of the IQ library (bind mounts are resolved by the Docker host)
+IQ_LIBRARY_HOST_DIR = os.getenv('IQ_LIBRARY_HOST_DIR', '/scenarios/iq_library')
+# The same library as seen from this container (for reading SigMF sidecars)
+IQ_LIBRARY_DIR = "/scenarios/iq_library"
 
 
 class ExerciseExecutor:
@@ -39,6 +54,7 @@ class ExerciseExecutor:
         self.team_containers = []
         self.service_containers = []
         self.dashboard_urls = {}
+        self.sdr_endpoints = {}  # team_id -> {"host", "port", "control_topic"}
 
         # Turn-based state
         self.turn_based = False
@@ -62,6 +78,20 @@ class ExerciseExecutor:
         except Exception as e:
             print(f"MQTT connection error: {e}")
 
+    def publish_inject(self, team_id: str, inject: dict):
+        """
+        Deliver a timeline inject to a team's feed.
+
+        Trigger injects for a team with an SDR service also go to its
+        control topic, so timeline commands (seek, set_loop, jamming, ...)
+        reach the service mid-exercise, not just the dashboard.
+        """
+        topic = f"/exercise/{self.scenario_name}/team/{team_id}/feed"
+        self.mqtt_client.publish(topic, json.dumps(inject), qos=1)
+        endpoint = self.sdr_endpoints.get(team_id)
+        if endpoint and inject.get('type') == 'trigger':
+            self.mqtt_client.publish(endpoint['control_topic'], json.dumps(inject), qos=1)
+
     def load_scenario(self):
         """Loads the scenario and its associated timelines."""
         scenario_path = os.path.join("/scenarios", f"{self.scenario_name}.json")
@@ -133,6 +163,9 @@ class ExerciseExecutor:
                 # Use PUBLIC_HOST env var for AWS deployment, fallback to localhost for local dev
                 public_host = os.getenv('PUBLIC_HOST', 'localhost')
                 self.dashboard_urls[team_id] = f"http://{public_host}:{port}/?team={team_id}&exercise={self.scenario_name}"
+                if team_id in self.sdr_endpoints:
+                    # SDR dashboards show which rtl_tcp port to point GQRX at
+                    self.dashboard_urls[team_id] += f"&sdr_port={self.sdr_endpoints[team_id]['port']}"
 
                 # Debugging: Print container status and logs
                 container.reload()
@@ -144,24 +177,101 @@ class ExerciseExecutor:
                 traceback.print_exc()
                 raise # Re-raise to propagate the error
 
+    def _sdr_teams(self):
+        """
+        Teams that get their own SDR service instance.
+
+        A team's own iq_file wins; otherwise the scenario-level iq_file is used
+        for every team on the SDR dashboard.
+
+        Returns:
+            List of (team, iq_file) tuples
+        """
+        default_iq_file = self.scenario_data.get('iq_file')
+        default_image = self.scenario_data.get('dashboard_image', 'team-dashboard:latest')
+        sdr_teams = []
+        for team in self.scenario_data.get('teams', []):
+            iq_file = team.get('iq_file')
+            if not iq_file and default_iq_file and \
+                    team.get('dashboard_image', default_image).startswith('team-dashboard-sdr'):
+                iq_file = default_iq_file
+            if iq_file:
+                sdr_teams.append((team, iq_file))
+        return sdr_teams
+
+    def _allocate_sdr_port(self, container_name: str, requested_port=None):
+        """
+        Reserve a host port for an SDR instance's rtl_tcp server.
+
+        Ports in use are those reserved by this process plus those labelled on
+        running SDR containers (so exercises deployed before a restart count).
+
+        Args:
+            container_name: Container the port is reserved for
+            requested_port: Port pinned in the scenario, if any
+
+        Returns:
+            The reserved port, or None if none is available
+        """
+        with _sdr_ports_lock:
+            used = {port for port, owner in _reserved_sdr_ports.items() if owner != container_name}
+            try:
+                for container in self.docker_client.containers.list(filters={'label': SDR_PORT_LABEL}):
+                    if container.name != container_name:
+                        used.add(int(container.labels[SDR_PORT_LABEL]))
+            except docker.errors.APIError as e:
+                print(f"Could not list SDR containers for port allocation: {e}")
+
+            if requested_port is not None:
+                if requested_port in used:
+                    print(f"SDR port {requested_port} requested for {container_name} is already in use")
+                    return None
+                candidates = [requested_port]
+            else:
+                candidates = [port for port in SDR_PORT_POOL if port not in used]
+
+            if not candidates:
+                print(f"No free SDR ports in {SDR_PORT_POOL.start}-{SDR_PORT_POOL.stop - 1}")
+                return None
+            _reserved_sdr_ports[candidates[0]] = container_name
+            return candidates[0]
+
+    def _release_sdr_ports(self, container_name: str = None):
+        """Return one SDR instance's port (default: all of this exercise's) to the pool."""
+        with _sdr_ports_lock:
+            for port, owner in list(_reserved_sdr_ports.items()):
+                if owner == container_name or (
+                        container_name is None and owner.startswith(f"sdr-service-{self.scenario_name}-")):
+                    del _reserved_sdr_ports[port]
+
     def _deploy_sdr_service(self):
-        """Deploy SDR service if scenario requires it."""
-        # Check if scenario has iq_file configured
-        iq_file = self.scenario_data.get('iq_file')
-        if not iq_file:
+        """Deploy one SDR service per team that uses one (see _sdr_teams)."""
+        sdr_teams = self._sdr_teams()
+        if not sdr_teams:
             print("No IQ file configured, skipping SDR service deployment")
             return
 
-        container_name = f"sdr-service-{self.scenario_name}"
+        for team, iq_file in sdr_teams:
+            self._deploy_team_sdr_service(team, iq_file)
 
-        # Convert /iq_library/file.iq to absolute host path
+    def _deploy_team_sdr_service(self, team: dict, iq_file: str):
+        """Deploy a team's SDR service on a pooled host port with its own MQTT namespace."""
+        team_id = team['id']
+        container_name = f"sdr-service-{self.scenario_name}-{team_id}"
+
+        # Library files: mount the whole library read-only so switch_iq can reach
+        # any file; anything else is mounted on its own as before
+        sidecar = {}
         if iq_file.startswith('/iq_library/'):
-            iq_filename = iq_file[13:]  # Remove /iq_library/ prefix
-            iq_file_host_path = f"/scenarios/iq_library/{iq_filename}"
+            iq_filename = iq_file[len('/iq_library/'):]
+            iq_file_path = f"/iq_files/{iq_filename}"
+            volumes = {IQ_LIBRARY_HOST_DIR: {'bind': '/iq_files', 'mode': 'ro'}}
+            sidecar = read_sidecar(os.path.join(IQ_LIBRARY_DIR, iq_filename)) or {}
         else:
-            iq_file_host_path = iq_file
+            iq_file_path = '/iq_files/current.iq'
+            volumes = {iq_file: {'bind': iq_file_path, 'mode': 'ro'}}
 
-        print(f"Deploying SDR service with IQ file: {iq_file}")
+        print(f"Deploying SDR service for team {team_id} with IQ file: {iq_file}")
 
         # Check if container exists and remove it
         try:
@@ -172,26 +282,87 @@ class ExerciseExecutor:
         except docker.errors.NotFound:
             pass
 
+        port = self._allocate_sdr_port(container_name, team.get('sdr_port'))
+        if port is None:
+            print(f"Skipping SDR service for team {team_id}: no port available")
+            return
+
+        control_topic = f"/exercise/{self.scenario_name}/team/{team_id}/injects"
+        spectrum_topic = f"/exercise/{self.scenario_name}/team/{team_id}/spectrum"
+        # The recording's own SigMF metadata decides its rate unless the team pins one
+        sample_rate = team.get('sample_rate') or sidecar.get('sample_rate') or \
+            self.scenario_data.get('sample_rate', 1024000)
+        environment = {
+            'IQ_FILE_PATH': iq_file_path,
+            'SAMPLE_RATE': str(int(sample_rate)),
+            'EXERCISE_ID': self.scenario_name,
+            'TEAM_ID': team_id,
+            'MQTT_TOPIC': control_topic,
+            'SPECTRUM_TOPIC': spectrum_topic
+        }
+        if sidecar.get('center_freq') is not None:
+            environment['CENTER_FREQ'] = str(int(sidecar['center_freq']))
+        # Jamming timeline applied by the service at exact stream sample indices
+        jamming_schedule = team.get('jamming_schedule', self.scenario_data.get('jamming_schedule'))
+        if jamming_schedule:
+            environment['JAMMING_SCHEDULE'] = json.dumps(jamming_schedule)
+        # Extra sources mixed over the main recording; scene recordings come from the library
+        scene_sources = team.get('scene', self.scenario_data.get('scene'))
+        if scene_sources:
+            library_mount = volumes.get(IQ_LIBRARY_HOST_DIR, {}).get('bind', '/iq_library')
+            container_sources = []
+            for source in scene_sources:
+                if source.get('kind') == 'recording' and source.get('file', '').startswith('/iq_library/'):
+                    volumes.setdefault(IQ_LIBRARY_HOST_DIR, {'bind': library_mount, 'mode': 'ro'})
+                    source = dict(source, file=f"{library_mount}/{source['file'][len('/iq_library/'):]}")
+                container_sources.append(source)
+            environment['SCENE_SOURCES'] = json.dumps(container_sources)
+        # Link conditions (path loss, rain fade, Doppler, AWGN) applied to the main recording
+        channel_effects = team.get('channel_effects', self.scenario_data.get('channel_effects'))
+        if channel_effects:
+            environment['CHANNEL_EFFECTS'] = json.dumps(channel_effects)
+        # Where playback starts, how fast, and any A/B loop region
+        playback = team.get('playback', self.scenario_data.get('playback'))
+        if playback:
+            environment['PLAYBACK'] = json.dumps(playback)
+        # After-action recording of the mixed output; files land in the IQ library
+        recording = team.get('recording', self.scenario_data.get('recording'))
+        if recording and recording.get('enabled', True):
+            # Written straight into the library root, so the library mount (if any) becomes writable
+            library_volume = volumes.setdefault(IQ_LIBRARY_HOST_DIR, {'bind': '/iq_library', 'mode': 'rw'})
+            library_volume['mode'] = 'rw'
+            environment.update({
+                'RECORD_DIR': library_volume['bind'],
+                'RECORD_FORMAT': recording.get('format', 'cf32'),
+                'RECORD_PREFIX': f"rec-{self.scenario_name}-{team_id}",
+                'RECORD_ROTATE_MB': str(recording.get('rotate_mb', 1024)),
+                'RECORD_ROTATE_S': str(recording.get('rotate_s', 0)),
+                'RECORD_ON_START': str(recording.get('start', True)).lower()
+            })
+
         try:
             container = self.docker_client.containers.run(
                 'scip-v3-sdr-service:latest',
                 name=container_name,
                 detach=True,
-                environment={
-                    'IQ_FILE_PATH': '/iq_files/current.iq',
-                    'SAMPLE_RATE': '1024000'
-                },
-                ports={'1234/tcp': 1234},
-                volumes={
-                    iq_file_host_path: {
-                        'bind': '/iq_files/current.iq',
-                        'mode': 'ro'
-                    }
+                environment=environment,
+                labels={
+                    SDR_PORT_LABEL: str(port),
+                    'scip.exercise': self.scenario_name,
+                    'scip.team': team_id
                 },
+                ports={'1234/tcp': port},
+                volumes=volumes,
                 network=os.getenv('DOCKER_NETWORK', 'scip-network')
             )
             self.service_containers.append(container)
-            print(f"SDR service deployed: {container.name}")
+            self.sdr_endpoints[team_id] = {
+                "host": os.getenv('PUBLIC_HOST', 'localhost'),
+                "port": port,
+                "control_topic": control_topic,
+                "spectrum_topic": spectrum_topic
+            }
+            print(f"SDR service deployed: {container.name} on port {port}, control topic {control_topic}")
 
             container.reload()
             print(f"SDR service status: {container.status}")
@@ -200,6 +371,7 @@ class ExerciseExecutor:
             print(f"Error deploying SDR service: {e}")
             import traceback
             traceback.print_exc()
+            self._release_sdr_ports(container_name)
 
     async def start(self):
         """
@@ -213,8 +385,9 @@ class ExerciseExecutor:
 
         self._connect_mqtt()
         self.load_scenario()
-        self._deploy_team_dashboards()
+        # SDR first so team dashboards can be told their rtl_tcp port
         self._deploy_sdr_service()
+        self._deploy_team_dashboards()
 
         # Don't start the timer immediately - wait for explicit start command
         self.state = "NOT_STARTED"
@@ -228,7 +401,8 @@ class ExerciseExecutor:
         return {
             "status": "Exercise deployed",
             "scenario": self.scenario_name,
-            "dashboard_urls": self.dashboard_urls
+            "dashboard_urls": self.dashboard_urls,
+            "sdr_endpoints": self.sdr_endpoints
         }
 
     async def schedule_turn_injects(self, turn: int):
@@ -504,8 +678,6 @@ class ExerciseExecutor:
 
                             # Check if time to deliver
                             if inject_time == time_since_turn_start and (team_id, inject_id) not in published_injects:
-                                topic = f"/exercise/{self.scenario_name}/team/{team_id}/feed"
-
                                 inject_with_metadata = {
                                     **inject,
                                     "delivered_at": elapsed_seconds,
@@ -517,7 +689,7 @@ class ExerciseExecutor:
                                 }
 
                                 print(f"[Turn {self.current_turn}] Delivering inject {inject_id} at T+{elapsed_seconds}s (turn time +{time_since_turn_start}s)")
-                                self.mqtt_client.publish(topic, json.dumps(inject_with_metadata), qos=1)
+                                self.publish_inject(team_id, inject_with_metadata)
                                 published_injects.add((team_id, inject_id))
 
                                 await self.redis_manager.record_inject_delivery(
@@ -531,8 +703,6 @@ class ExerciseExecutor:
                             inject_time = inject.get('time')
 
                             if inject_time == elapsed_seconds and (team_id, inject_id) not in published_injects:
-                                topic = f"/exercise/{self.scenario_name}/team/{team_id}/feed"
-
                                 inject_with_metadata = {
                                     **inject,
                                     "delivered_at": elapsed_seconds,
@@ -543,7 +713,7 @@ class ExerciseExecutor:
                                 }
 
                                 print(f"Publishing inject {inject_id} to team {team_id} at {formatted_timer}")
-                                self.mqtt_client.publish(topic, json.dumps(inject_with_metadata), qos=1)
+                                self.publish_inject(team_id, inject_with_metadata)
                                 published_injects.add((team_id, inject_id))
 
                                 await self.redis_manager.record_inject_delivery(
@@ -606,6 +776,7 @@ class ExerciseExecutor:
                 container.remove()
             except Exception as e:
                 print(f"Error stopping service container {container.name}: {e}")
+        self._release_sdr_ports()
 
         # Clean up Redis keys to prevent stale data in next exercise
         await self.redis_manager.cleanup_exercise(self.scenario_name)
@@ -0,0 +1,228 @@
+"""
+IQ Library Index for SCIP v3
+
+Keeps the IQ library listing in memory, built from each canonical file's
+SigMF sidecar (see iq_ingest). The index is built once at startup and then
+kept current by a watchdog observer on the library directory, so listing
+the library never re-reads sidecars or does per-file arithmetic; files
+written by other containers (e.g. SDR recordings) appear as soon as their
+sidecar lands.
+
+With a preview analyzer attached (see iq_preview), entries carry their PSD
+summary and thumbnail URLs, and files without a current preview are queued
+for analysis as they are indexed. With an ingestor attached, "converting"
+sidecars written by other containers (cu8 SDR recordings) are handed to it.
+
+Canonical files from before sidecars existed get one written at startup,
+with the 1.024 MHz default rate and a freshly computed SHA-512.
+"""
+
+import os
+import threading
+from typing import Dict, List, Optional
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+from iq_ingest import (
+    SIDECAR_SUFFIX, LEGACY_SIDECAR_SUFFIX, DEFAULT_SAMPLE_RATE, read_sidecar, write_sidecar, file_sha512
+)
+
+
+# Canonical (complex64) dataset extensions listed in the library
+CANONICAL_FORMATS = {'.iq', '.dat', '.raw', '.cfile'}
+
+
+class _IndexEventHandler(FileSystemEventHandler):
+    """Forwards watchdog events to the index."""
+
+    def __init__(self, index):
+        self.index = index
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.index.refresh(event.src_path)
+
+    def on_closed(self, event):
+        if not event.is_directory:
+            self.index.refresh(event.src_path)
+
+    def on_deleted(self, event):
+        if not event.is_directory:
+            self.index.refresh(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.index.refresh(event.src_path)
+            self.index.refresh(event.dest_path)
+
+
+class IQLibraryIndex:
+    """In-memory IQ library listing built from SigMF sidecars."""
+
+    def __init__(self, library_dir: str, analyzer=None, ingestor=None):
+        """
+        Initialize an empty index.
+
+        Args:
+            library_dir: IQ library root (served to SDR containers as /iq_library/)
+            analyzer: Optional IQPreviewAnalyzer that keeps previews for indexed files
+            ingestor: Optional IQIngestor that converts files other containers leave pending
+        """
+        self.library_dir = library_dir
+        self.analyzer = analyzer
+        self.ingestor = ingestor
+        self.entries: Dict[str, dict] = {}  # canonical filename -> listing entry
+        self.lock = threading.Lock()
+        self.observer = None
+
+    @staticmethod
+    def dataset_name(filename: str) -> Optional[str]:
+        """The canonical filename a library file belongs to (itself or its sidecar's dataset)."""
+        for suffix in (SIDECAR_SUFFIX, LEGACY_SIDECAR_SUFFIX):
+            if filename.endswith(suffix):
+                filename = filename[:-len(suffix)]
+                break
+        if filename.startswith('.') or os.path.splitext(filename)[1].lower() not in CANONICAL_FORMATS:
+            return None
+        return filename
+
+    def _build_entry(self, filename: str) -> Optional[dict]:
+        file_path = os.path.join(self.library_dir, filename)
+        metadata = read_sidecar(file_path)
+        if metadata is None or metadata.get('status') != 'ready':
+            # Conversions in progress are listed from their jobs, not here
+            if metadata and metadata.get('status') == 'converting' and self.ingestor is not None:
+                self.ingestor.adopt(file_path, metadata)
+            return None
+        stat = os.stat(file_path)
+
+        sample_rate = metadata.get('sample_rate') or DEFAULT_SAMPLE_RATE
+        num_samples = stat.st_size // 8  # 8 bytes per complex64 sample
+        source = metadata.get('source') or {}
+        return {
+            'filename': filename,
+            'path': f"/iq_library/{filename}",
+            'size': stat.st_size,
+            'size_mb': round(stat.st_size / (1024 * 1024), 2),
+            'duration_seconds': round(num_samples / sample_rate, 1),
+            'num_samples': num_samples,
+            'sample_rate': sample_rate,
+            'center_freq': metadata.get('center_freq'),
+            'description': metadata.get('description'),
+            'annotations': len(metadata.get('annotations') or []),
+            'sha512': metadata.get('sha512'),
+            'source_format': source.get('datatype', 'cf32_le'),
+            'source_filename': source.get('filename', filename),
+            'source_sha512': source.get('sha512'),
+            'source_path': source.get('path'),
+            'modified': stat.st_mtime,
+            'format': os.path.splitext(filename)[1][1:],
+            'preview': self._preview(filename, metadata, sample_rate)
+        }
+
+    def _preview(self, filename: str, metadata: dict, sample_rate: float) -> Optional[dict]:
+        """Preview fields for a listing entry, queueing an analysis if the preview is missing or stale."""
+        if self.analyzer is None:
+            return None
+        summary = self.analyzer.summary(filename, metadata.get('sha512'))
+        if summary is None:
+            self.analyzer.submit(filename, metadata.get('sha512'), sample_rate, metadata.get('center_freq'))
+            return None
+        base_url = f"/api/v1/iq-library/preview/{filename}"
+        return {
+            'waterfall_url': f"{base_url}/waterfall.png",
+            'psd_url': f"{base_url}/psd.png",
+            'psd_data_url': f"{base_url}/psd.json",
+            'peak_db': summary['peak_db'],
+            'peak_offset_hz': summary['peak_offset_hz'],
+            'noise_floor_db': summary['noise_floor_db']
+        }
+
+    def refresh(self, file_path: str):
+        """Rebuild the entry a changed dataset or sidecar belongs to."""
+        if os.path.dirname(os.path.abspath(file_path)) != os.path.abspath(self.library_dir):
+            return
+        filename = self.dataset_name(os.path.basename(file_path))
+        if filename is None:
+            return
+        try:
+            entry = self._build_entry(filename)
+        except OSError:
+            # Dataset missing (deleted, or its sidecar was written first); a later event settles it
+            entry = None
+
+        with self.lock:
+            if entry is None:
+                self.entries.pop(filename, None)
+            else:
+                self.entries[filename] = entry
+
+    def _backfill(self, filename: str):
+        """Write a sidecar for a canonical file that has none (or only a legacy JSON one)."""
+        file_path = os.path.join(self.library_dir, filename)
+        metadata = read_sidecar(file_path) or {
+            'status': 'ready',
+            'sample_rate': DEFAULT_SAMPLE_RATE,
+            'source': {'filename': filename, 'path': filename, 'datatype': 'cf32_le'}
+        }
+        if metadata.get('status') != 'ready':
+            return  # the ingestor finishes it
+        if not metadata.get('sha512'):
+            metadata['sha512'] = file_sha512(file_path)
+            if metadata['source'].get('path') == filename:
+                metadata['source']['sha512'] = metadata['sha512']
+        metadata.setdefault('num_samples', os.path.getsize(file_path) // 8)
+        write_sidecar(file_path, metadata)
+        print(f"IQ library: wrote SigMF sidecar for {filename}")
+
+    def scan(self):
+        """Index the whole library, writing sidecars for files that lack one."""
+        for filename in os.listdir(self.library_dir):
+            if self.dataset_name(filename) != filename or not os.path.isfile(os.path.join(self.library_dir, filename)):
+                continue
+            if not os.path.exists(os.path.join(self.library_dir, filename + SIDECAR_SUFFIX)):
+                try:
+                    self._backfill(filename)
+                except OSError as e:
+                    print(f"IQ library: could not write sidecar for {filename}: {e}")
+            self.refresh(os.path.join(self.library_dir, filename))
+
+    def start(self):
+        """Build the index and start watching the library directory."""
+        # Watch before the initial scan so files written during it are not missed
+        self.observer = Observer()
+        self.observer.schedule(_IndexEventHandler(self), self.library_dir, recursive=False)
+        self.observer.daemon = True
+        self.observer.start()
+        self.scan()
+        print(f"IQ library index: {len(self.entries)} files, watching {self.library_dir}")
+
+    def stop(self):
+        """Stop the filesystem watcher."""
+        if self.observer:
+            self.observer.stop()
+            self.observer.join(timeout=5)
+
+    def list(self) -> List[dict]:
+        """Get all ready library files sorted by filename."""
+        with self.lock:
+            iq_files = list(self.entries.values())
+        iq_files.sort(key=lambda x: x['filename'])
+        return iq_files
+
+    def get(self, filename: str) -> Optional[dict]:
+        with self.lock:
+            return self.entries.get(filename)
+
+    def find_source(self, sha512: str, datatype: str) -> Optional[dict]:
+        """
+        Find a library file converted from identical source content.
+
+        Returns:
+            Its listing entry, or None
+        """
+        with self.lock:
+            for entry in self.entries.values():
+                if entry['source_sha512'] == sha512 and entry['source_format'] == datatype:
+                    return entry
+        return None
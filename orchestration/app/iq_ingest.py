@@ -0,0 +1,520 @@
+"""
+IQ Capture Ingestion for SCIP v3
+
+Accepts captures in the formats SDR tools actually write (rtl_sdr cu8,
+HackRF cs8, HackRF/USRP cs16, complex float, two-channel WAV and SigMF
+recordings) and converts them to the canonical format the SDR service
+memory-maps: headerless complex64 (.iq). Conversion runs on a background
+thread and streams the source in fixed-size blocks, so memory use does not
+depend on file size and uploads return immediately.
+
+Originals are kept under originals/. Each canonical file gets a SigMF
+metadata sidecar (<name>.iq.sigmf-meta) recording its sample rate, center
+frequency, SHA-512, annotations and source; the source hash in the sidecar
+lets an identical re-upload reuse the existing conversion instead of
+converting again.
+"""
+
+import hashlib
+import json
+import os
+import queue
+import struct
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+import numpy as np
+
+
+ORIGINALS_DIR_NAME = "originals"
+WORK_DIR_NAME = ".ingest"
+SIDECAR_SUFFIX = ".sigmf-meta"
+LEGACY_SIDECAR_SUFFIX = ".json"
+CANONICAL_EXTENSION = ".iq"
+SIGMF_VERSION = "1.0.0"
+
+DEFAULT_SAMPLE_RATE = 1024000
+
+# Samples converted per block (fixed memory: ~24 bytes per sample in flight)
+BLOCK_SAMPLES = int(os.getenv('IQ_INGEST_BLOCK_SAMPLES', 1 << 20))
+
+# SigMF datatype -> (numpy component dtype, offset, scale); a sidecar's source
+# may carry its own offset/scale (SDR recordings use the rtl_tcp cu8 mapping)
+DATATYPES = {
+    'cf32_le': ('<f4', 0.0, 1.0),
+    'cf32_be': ('>f4', 0.0, 1.0),
+    'ci32_le': ('<i4', 0.0, 1.0 / 2 ** 31),
+    'ci32_be': ('>i4', 0.0, 1.0 / 2 ** 31),
+    'ci16_le': ('<i2', 0.0, 1.0 / 32768),
+    'ci16_be': ('>i2', 0.0, 1.0 / 32768),
+    'ci8': ('i1', 0.0, 1.0 / 128),
+    'cu8': ('u1', 127.5, 1.0 / 127.5),
+}
+
+# Names tools and users commonly use for the same layouts
+DATATYPE_ALIASES = {
+    'cf32': 'cf32_le', 'fc32': 'cf32_le', 'complex64': 'cf32_le',
+    'cs16': 'ci16_le', 'sc16': 'ci16_le', 'ci16': 'ci16_le',
+    'cs8': 'ci8', 'sc8': 'ci8', 'ci8_le': 'ci8', 'cu8_le': 'cu8',
+}
+
+# Upload extension -> datatype ("wav"/"sigmf" are read from the file's own header)
+EXTENSION_FORMATS = {
+    '.iq': 'cf32_le', '.cfile': 'cf32_le', '.dat': 'cf32_le', '.raw': 'cf32_le',
+    '.cf32': 'cf32_le', '.fc32': 'cf32_le',
+    '.cs16': 'ci16_le', '.sc16': 'ci16_le',
+    '.cs8': 'ci8', '.cu8': 'cu8',
+    '.wav': 'wav',
+    '.sigmf-data': 'sigmf',
+}
+SIGMF_META_EXTENSION = '.sigmf-meta'
+
+
+def normalize_datatype(name: str) -> str:
+    """
+    Map a format name onto a supported SigMF datatype.
+
+    Raises:
+        ValueError: Unsupported format
+    """
+    datatype = DATATYPE_ALIASES.get(name.lower(), name.lower())
+    if datatype not in DATATYPES:
+        raise ValueError(f"Unsupported IQ format '{name}'. Supported: {', '.join(sorted(DATATYPES))}")
+    return datatype
+
+
+def split_extension(filename: str) -> tuple:
+    """Split off the extension, treating .sigmf-data/.sigmf-meta as one extension."""
+    lower = filename.lower()
+    for extension in ('.sigmf-data', SIGMF_META_EXTENSION):
+        if lower.endswith(extension):
+            return filename[:-len(extension)], extension
+    base, extension = os.path.splitext(filename)
+    return base, extension.lower()
+
+
+def _probe_wav(path: str) -> Dict:
+    """Locate the sample data of a two-channel (I/Q) WAV file."""
+    with open(path, 'rb') as f:
+        riff, _, wave_id = struct.unpack('<4sI4s', f.read(12))
+        if riff != b'RIFF' or wave_id != b'WAVE':
+            raise ValueError("Not a RIFF/WAVE file")
+
+        fmt = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError("WAV file has no data chunk")
+            chunk_id, chunk_size = struct.unpack('<4sI', header)
+            if chunk_id == b'fmt ':
+                body = f.read(chunk_size)
+                audio_format, channels, sample_rate, _, _, bits = struct.unpack('<HHIIHH', body[:16])
+                if audio_format == 0xFFFE and len(body) >= 26:
+                    # WAVE_FORMAT_EXTENSIBLE: the real format is the subformat GUID's first word
+                    audio_format = struct.unpack('<H', body[24:26])[0]
+                fmt = (audio_format, channels, sample_rate, bits)
+            elif chunk_id == b'data':
+                if fmt is None:
+                    raise ValueError("WAV data chunk before fmt chunk")
+                data_offset = f.tell()
+                data_length = min(chunk_size, os.path.getsize(path) - data_offset)
+                break
+            else:
+                f.seek(chunk_size, os.SEEK_CUR)
+            if chunk_size % 2:
+                f.seek(1, os.SEEK_CUR)  # chunks are word aligned
+
+    audio_format, channels, sample_rate, bits = fmt
+    if channels != 2:
+        raise ValueError(f"WAV IQ needs 2 channels (I, Q), file has {channels}")
+    datatype = {(1, 8): 'cu8', (1, 16): 'ci16_le', (1, 32): 'ci32_le', (3, 32): 'cf32_le'}.get((audio_format, bits))
+    if datatype is None:
+        raise ValueError(f"Unsupported WAV sample format {audio_format} with {bits} bits")
+
+    return {'datatype': datatype, 'data_offset': data_offset, 'data_length': data_length,
+            'sample_rate': sample_rate}
+
+
+def _probe_sigmf(meta_path: str) -> Dict:
+    """Read datatype, sample rate and center frequency from a SigMF metadata file."""
+    with open(meta_path, 'r') as f:
+        meta = json.load(f)
+    core = meta.get('global', {})
+    captures = meta.get('captures') or [{}]
+    return {
+        'datatype': normalize_datatype(core.get('core:datatype', '')),
+        'data_offset': 0,
+        'data_length': None,
+        'sample_rate': core.get('core:sample_rate'),
+        'center_freq': captures[0].get('core:frequency'),
+        'description': core.get('core:description'),
+        # Sample indices survive conversion unchanged, so annotations carry over as they are
+        'annotations': meta.get('annotations', []),
+    }
+
+
+def probe_source(path: str, filename: str, declared_format: Optional[str] = None,
+                 sigmf_meta_path: Optional[str] = None) -> Dict:
+    """
+    Work out how to read an uploaded capture.
+
+    Header-bearing formats (WAV, SigMF) describe themselves; headerless raw
+    files are identified by extension unless a format is declared.
+
+    Args:
+        path: Uploaded file on disk
+        filename: Original filename (for the extension)
+        declared_format: Format given with the upload (overrides the extension)
+        sigmf_meta_path: The .sigmf-meta uploaded alongside a .sigmf-data file
+
+    Returns:
+        Dict with datatype, data_offset, data_length (None = to end of file),
+        and sample_rate / center_freq where the file provides them
+
+    Raises:
+        ValueError: Unrecognized or unsupported format
+    """
+    extension = split_extension(filename)[1]
+    kind = EXTENSION_FORMATS.get(extension)
+
+    if kind == 'wav':
+        return _probe_wav(path)
+    if kind == 'sigmf':
+        if sigmf_meta_path is None:
+            raise ValueError("SigMF data needs its .sigmf-meta file in the same upload")
+        return _probe_sigmf(sigmf_meta_path)
+
+    if declared_format:
+        datatype = normalize_datatype(declared_format)
+    elif kind:
+        datatype = kind
+    else:
+        raise ValueError(f"Unknown IQ file type '{extension}'; declare its format")
+    return {'datatype': datatype, 'data_offset': 0, 'data_length': None}
+
+
+def sidecar_path(canonical_path: str) -> str:
+    return canonical_path + SIDECAR_SUFFIX
+
+
+def to_sigmf(canonical_path: str, metadata: Dict) -> Dict:
+    """
+    Build a SigMF metadata document for a canonical library file.
+
+    Library bookkeeping (conversion status, sample count, source) goes in
+    scip: keys next to the core fields.
+    """
+    global_fields = {
+        'core:datatype': metadata.get('datatype', 'cf32_le'),
+        'core:sample_rate': metadata.get('sample_rate') or DEFAULT_SAMPLE_RATE,
+        'core:version': SIGMF_VERSION,
+        'core:dataset': os.path.basename(canonical_path),
+        'core:sha512': metadata.get('sha512'),
+        'core:description': metadata.get('description'),
+        'core:recorder': metadata.get('recorder'),
+        'scip:status': metadata.get('status', 'ready'),
+        'scip:num_samples': metadata.get('num_samples'),
+        'scip:source': metadata.get('source'),
+        'scip:error': metadata.get('error'),
+    }
+    capture = {'core:sample_start': 0}
+    if metadata.get('center_freq') is not None:
+        capture['core:frequency'] = metadata['center_freq']
+    return {
+        'global': {key: value for key, value in global_fields.items() if value is not None},
+        'captures': [capture],
+        'annotations': metadata.get('annotations', []),
+    }
+
+
+def from_sigmf(document: Dict) -> Dict:
+    """Flatten a SigMF metadata document into the library's metadata dict."""
+    core = document.get('global', {})
+    captures = document.get('captures') or [{}]
+    return {
+        'status': core.get('scip:status', 'ready'),
+        'datatype': core.get('core:datatype', 'cf32_le'),
+        'sample_rate': core.get('core:sample_rate'),
+        'center_freq': captures[0].get('core:frequency'),
+        'num_samples': core.get('scip:num_samples'),
+        'sha512': core.get('core:sha512'),
+        'description': core.get('core:description'),
+        'recorder': core.get('core:recorder'),
+        'source': core.get('scip:source', {}),
+        'error': core.get('scip:error'),
+        'annotations': document.get('annotations', []),
+    }
+
+
+def read_sidecar(canonical_path: str) -> Optional[Dict]:
+    """Load the metadata sidecar of a canonical file, if it has one."""
+    try:
+        with open(sidecar_path(canonical_path), 'r') as f:
+            return from_sigmf(json.load(f))
+    except (OSError, ValueError):
+        pass
+    # Plain JSON sidecars written before SigMF metadata (same flat layout)
+    try:
+        with open(canonical_path + LEGACY_SIDECAR_SUFFIX, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_sidecar(canonical_path: str, metadata: Dict):
+    """Write (or replace) the SigMF sidecar of a canonical file."""
+    # Write-then-rename so readers never see a truncated sidecar
+    path = sidecar_path(canonical_path)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(to_sigmf(canonical_path, metadata), f, indent=2)
+    os.replace(tmp_path, path)
+    if os.path.exists(canonical_path + LEGACY_SIDECAR_SUFFIX):
+        os.remove(canonical_path + LEGACY_SIDECAR_SUFFIX)
+
+
+def file_sha512(path: str, block_size: int = 8 * 1024 * 1024) -> str:
+    digest = hashlib.sha512()
+    with open(path, 'rb') as f:
+        while block := f.read(block_size):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def convert_to_complex64(source_path: str, target_path: str, datatype: str,
+                         data_offset: int = 0, data_length: Optional[int] = None,
+                         progress=None, digest=None, offset: Optional[float] = None,
+                         scale: Optional[float] = None) -> int:
+    """
+    Stream a capture into a complex64 file, one fixed-size block at a time.
+
+    Args:
+        source_path: Capture to read
+        target_path: complex64 file to write
+        datatype: SigMF datatype of the capture
+        data_offset: Byte offset of the first sample
+        data_length: Bytes of sample data (None = to end of file)
+        progress: Optional callback(bytes_read)
+        digest: Optional hashlib object updated with the bytes written
+        offset: Value subtracted from each component (None = the datatype's default)
+        scale: Factor applied after the offset (None = the datatype's default)
+
+    Returns:
+        Number of samples written
+    """
+    component_dtype, default_offset, default_scale = DATATYPES[datatype]
+    offset = default_offset if offset is None else offset
+    scale = default_scale if scale is None else scale
+    component_dtype = np.dtype(component_dtype)
+    sample_bytes = 2 * component_dtype.itemsize
+
+    if data_length is None:
+        data_length = os.path.getsize(source_path) - data_offset
+    remaining = data_length // sample_bytes  # a trailing partial sample is dropped
+
+    block = np.empty(2 * min(BLOCK_SAMPLES, max(remaining, 1)), dtype=np.float32)
+    written = 0
+    with open(source_path, 'rb') as src, open(target_path, 'wb') as dst:
+        src.seek(data_offset)
+        while remaining > 0:
+            count = min(BLOCK_SAMPLES, remaining)
+            raw = np.fromfile(src, dtype=component_dtype, count=2 * count)
+            count = len(raw) // 2
+            if count == 0:
+                break
+            out = block[:2 * count]
+            # Cast, center and scale into the reused float32 block
+            np.copyto(out, raw[:2 * count], casting='unsafe')
+            if offset:
+                out -= np.float32(offset)
+            if scale != 1.0:
+                out *= np.float32(scale)
+            out.tofile(dst)
+            if digest is not None:
+                digest.update(out)
+
+            written += count
+            remaining -= count
+            if progress:
+                progress(written * sample_bytes)
+    return written
+
+
+class IQIngestor:
+    """Background converter from uploaded captures to canonical library files."""
+
+    def __init__(self, library_dir: str):
+        """
+        Initialize the ingestor (call start() to begin converting).
+
+        Args:
+            library_dir: IQ library root; canonical files live directly in it
+        """
+        self.library_dir = library_dir
+        self.originals_dir = os.path.join(library_dir, ORIGINALS_DIR_NAME)
+        self.work_dir = os.path.join(library_dir, WORK_DIR_NAME)
+        self.lock = threading.Lock()
+        self.jobs = {}  # job_id -> job dict
+        self.queue = queue.Queue()
+        self.thread = None
+
+        os.makedirs(self.originals_dir, exist_ok=True)
+        os.makedirs(self.work_dir, exist_ok=True)
+
+    def start(self):
+        """Start the worker thread and resume conversions interrupted by a restart."""
+        if self.thread is not None:
+            return
+        for filename in os.listdir(self.work_dir):
+            # Partial outputs of interrupted conversions; their jobs are resubmitted below
+            if filename.endswith('.partial'):
+                os.remove(os.path.join(self.work_dir, filename))
+
+        self.thread = threading.Thread(target=self._run, name="iq-ingest", daemon=True)
+        self.thread.start()
+
+        for filename in os.listdir(self.library_dir):
+            if not filename.endswith((CANONICAL_EXTENSION + SIDECAR_SUFFIX, CANONICAL_EXTENSION + LEGACY_SIDECAR_SUFFIX)):
+                continue
+            canonical_path = os.path.join(self.library_dir, filename[:filename.rindex(CANONICAL_EXTENSION)]
+                                          + CANONICAL_EXTENSION)
+            metadata = read_sidecar(canonical_path)
+            if metadata and metadata.get('status') == 'converting':
+                print(f"Resuming IQ conversion of {metadata['source']['filename']}")
+                self._enqueue(canonical_path, metadata)
+
+    def reserved_names(self) -> set:
+        """Canonical filenames claimed by conversions still in progress."""
+        with self.lock:
+            return {job['filename'] for job in self.jobs.values() if job['status'] == 'converting'}
+
+    def submit(self, canonical_filename: str, original_path: str, original_filename: str,
+               source: Dict, sha512: str, sample_rate: Optional[float] = None,
+               center_freq: Optional[float] = None) -> Dict:
+        """
+        Queue conversion of a stored original into a canonical library file.
+
+        Args:
+            canonical_filename: Name of the .iq file to produce in the library
+            original_path: Where the original is kept
+            original_filename: The name it was uploaded under
+            source: probe_source() result
+            sha512: SHA-512 of the original
+            sample_rate: Declared rate (overrides the file's own header)
+            center_freq: Declared center frequency (overrides the file's own header)
+
+        Returns:
+            The job dict
+        """
+        canonical_path = os.path.join(self.library_dir, canonical_filename)
+        metadata = {
+            'status': 'converting',
+            'datatype': 'cf32_le',
+            'sample_rate': sample_rate or source.get('sample_rate') or DEFAULT_SAMPLE_RATE,
+            'center_freq': center_freq if center_freq is not None else source.get('center_freq'),
+            'num_samples': None,
+            'description': source.get('description'),
+            'annotations': source.get('annotations', []),
+            'source': {
+                'filename': original_filename,
+                'path': os.path.relpath(original_path, self.library_dir),
+                'datatype': source['datatype'],
+                'data_offset': source.get('data_offset', 0),
+                'data_length': source.get('data_length'),
+                'sha512': sha512
+            }
+        }
+        # Claimed before the sidecar is persisted (so a restart can resume the job),
+        # and the sidecar is written before the worker can finish and overwrite it
+        job = self._register(canonical_path, metadata)
+        write_sidecar(canonical_path, metadata)
+        self.queue.put((job['id'], canonical_path, metadata))
+        return dict(job)
+
+    def adopt(self, canonical_path: str, metadata: Dict) -> Optional[Dict]:
+        """
+        Queue conversion of a "converting" sidecar nobody is working on.
+
+        Picks up files dropped into the library by other containers (e.g. cu8
+        recordings from the SDR service, written under originals/).
+
+        Returns:
+            The new job dict, or None if the file is already being converted
+        """
+        job = self._register(canonical_path, metadata, exclusive=True)
+        if job is None:
+            return None
+        print(f"Converting {metadata['source']['filename']} written to the library")
+        self.queue.put((job['id'], canonical_path, metadata))
+        return dict(job)
+
+    def _register(self, canonical_path: str, metadata: Dict, exclusive: bool = False) -> Optional[Dict]:
+        job = {
+            'id': uuid.uuid4().hex,
+            'filename': os.path.basename(canonical_path),
+            'source_filename': metadata['source']['filename'],
+            'source_format': metadata['source']['datatype'],
+            'status': 'converting',
+            'progress': 0.0,
+            'error': None,
+            'submitted': time.time()
+        }
+        with self.lock:
+            if exclusive and any(j['filename'] == job['filename'] and j['status'] == 'converting'
+                                 for j in self.jobs.values()):
+                return None
+            self.jobs[job['id']] = job
+        return job
+
+    def _enqueue(self, canonical_path: str, metadata: Dict) -> Dict:
+        job = self._register(canonical_path, metadata)
+        self.queue.put((job['id'], canonical_path, metadata))
+        return dict(job)
+
+    def job(self, job_id: str) -> Optional[Dict]:
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def list_jobs(self) -> List[Dict]:
+        with self.lock:
+            return [dict(job) for job in self.jobs.values()]
+
+    def _run(self):
+        while True:
+            job_id, canonical_path, metadata = self.queue.get()
+            try:
+                self._convert(job_id, canonical_path, metadata)
+            except Exception as e:
+                print(f"IQ conversion failed for {canonical_path}: {e}")
+                with self.lock:
+                    self.jobs[job_id].update(status='failed', error=str(e))
+                metadata['status'] = 'failed'
+                metadata['error'] = str(e)
+                write_sidecar(canonical_path, metadata)
+
+    def _convert(self, job_id: str, canonical_path: str, metadata: Dict):
+        source = metadata['source']
+        original_path = os.path.join(self.library_dir, source['path'])
+        total = source['data_length'] or max(os.path.getsize(original_path) - source['data_offset'], 1)
+
+        def progress(done):
+            with self.lock:
+                self.jobs[job_id]['progress'] = round(min(done / total, 1.0), 3)
+
+        started = time.perf_counter()
+        partial_path = os.path.join(self.work_dir, os.path.basename(canonical_path) + '.partial')
+        digest = hashlib.sha512()
+        num_samples = convert_to_complex64(original_path, partial_path, source['datatype'],
+                                           source['data_offset'], source['data_length'], progress, digest,
+                                           source.get('offset'), source.get('scale'))
+        # The canonical file appears complete or not at all
+        os.replace(partial_path, canonical_path)
+
+        metadata.update(status='ready', num_samples=num_samples, sha512=digest.hexdigest())
+        write_sidecar(canonical_path, metadata)
+        with self.lock:
+            self.jobs[job_id].update(status='ready', progress=1.0)
+        print(f"Converted {source['filename']} ({source['datatype']}) -> {os.path.basename(canonical_path)}: "
+              f"{num_samples} samples in {time.perf_counter() - started:.1f}s")
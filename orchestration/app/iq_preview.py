@@ -0,0 +1,259 @@
+"""
+IQ Library Previews for SCIP v3
+
+Analyzes each canonical library file once, in the background, so the
+library can show what is in a recording before it is picked for a scenario:
+
+- a Welch PSD (Hann window, 50% overlap) averaged over the whole file,
+  stored as a compact JSON array (PREVIEW_PSD_BINS values in 0.1 dB steps)
+  and as a small PNG plot
+- a decimated waterfall: the file's frames averaged into WATERFALL_ROWS
+  time slices, stored as a colour-mapped PNG thumbnail
+
+The file is read through a memmap in fixed-size blocks and every block's
+frames go through one batched FFT, so memory use is constant regardless of
+file size. Results live in the library's hidden .previews/ directory and
+are keyed by the dataset's SHA-512, so a replaced file is re-analyzed.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+from typing import Dict, Optional
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from PIL import Image, ImageDraw
+
+
+PREVIEW_DIR_NAME = ".previews"
+PREVIEW_KINDS = ('psd.json', 'psd.png', 'waterfall.png')
+
+FFT_SIZE = int(os.getenv('IQ_PREVIEW_FFT_SIZE', 1024))
+PREVIEW_PSD_BINS = 256
+WATERFALL_ROWS = 256
+# Frames per FFT batch: ~FFT_SIZE * 16 bytes each while in flight
+FRAMES_PER_BLOCK = 256
+
+PSD_IMAGE_SIZE = (320, 120)
+DB_RANGE = 80.0  # dynamic range shown in the images, below the peak
+
+
+def _colormap() -> np.ndarray:
+    """256-entry RGB palette, dark blue through yellow to white (as on the SDR dashboard)."""
+    stops = np.array([[0, 0, 16], [0, 0, 128], [0, 160, 200], [240, 220, 0], [255, 64, 0], [255, 255, 255]],
+                     dtype=np.float64)
+    position = np.linspace(0, len(stops) - 1, 256)
+    index = np.minimum(position.astype(int), len(stops) - 2)
+    t = (position - index)[:, None]
+    return (stops[index] + (stops[index + 1] - stops[index]) * t).astype(np.uint8)
+
+
+PALETTE = _colormap()
+
+
+def analyze_iq_file(file_path: str, fft_size: int = FFT_SIZE, rows: int = WATERFALL_ROWS) -> Dict:
+    """
+    Compute the Welch PSD and a decimated waterfall of a complex64 file.
+
+    Args:
+        file_path: Canonical complex64 file
+        fft_size: FFT length (frequency bins)
+        rows: Waterfall time slices
+
+    Returns:
+        Dict with 'psd' (fft_size linear power, DC centred), 'waterfall'
+        (rows x fft_size linear power, DC centred) and 'frames' analyzed
+    """
+    samples = np.memmap(file_path, dtype=np.complex64, mode='r')
+    hop = fft_size // 2
+    num_frames = (len(samples) - fft_size) // hop + 1 if len(samples) >= fft_size else 0
+    if num_frames == 0:
+        raise ValueError(f"File too short to analyze ({len(samples)} samples)")
+
+    window = np.hanning(fft_size).astype(np.float32)
+    # Scale so a full-scale tone reads 0 dB
+    scale = 1.0 / float(window.sum()) ** 2
+    rows = min(rows, num_frames)
+
+    waterfall = np.zeros((rows, fft_size), dtype=np.float64)
+    row_frames = np.zeros(rows, dtype=np.int64)
+    # Waterfall row of every frame (time slices of equal frame counts)
+    row_starts = (np.arange(rows) * num_frames + rows - 1) // rows
+
+    for first in range(0, num_frames, FRAMES_PER_BLOCK):
+        count = min(FRAMES_PER_BLOCK, num_frames - first)
+        start = first * hop
+        block = np.asarray(samples[start:start + (count - 1) * hop + fft_size])
+        frames = sliding_window_view(block, fft_size)[::hop][:count]
+
+        spectra = np.fft.fft(frames * window, axis=1)
+        power = spectra.real ** 2 + spectra.imag ** 2
+
+        # Sum consecutive frames that fall into the same waterfall row
+        frame_rows = np.searchsorted(row_starts, np.arange(first, first + count), side='right') - 1
+        boundaries = np.flatnonzero(np.diff(frame_rows)) + 1
+        segment_starts = np.concatenate(([0], boundaries))
+        waterfall[frame_rows[segment_starts]] += np.add.reduceat(power, segment_starts, axis=0)
+        row_frames += np.bincount(frame_rows, minlength=rows)
+
+    waterfall *= scale / row_frames[:, None]
+    psd = (waterfall * row_frames[:, None]).sum(axis=0) / num_frames
+
+    return {
+        'psd': np.fft.fftshift(psd),
+        'waterfall': np.fft.fftshift(waterfall, axes=1),
+        'frames': num_frames
+    }
+
+
+def _to_db(power: np.ndarray) -> np.ndarray:
+    return 10 * np.log10(np.maximum(power, 1e-20))
+
+
+def render_waterfall_png(waterfall_db: np.ndarray, path: str, width: int = 256):
+    """Colour-map a waterfall (rows x bins, dB) into a thumbnail, time running downwards."""
+    top = float(waterfall_db.max())
+    levels = np.clip((waterfall_db - (top - DB_RANGE)) * (255.0 / DB_RANGE), 0, 255).astype(np.uint8)
+    image = Image.fromarray(PALETTE[levels], mode='RGB')
+    if image.width != width:
+        image = image.resize((width, image.height), Image.Resampling.BOX)
+    image.save(path, optimize=True)
+
+
+def render_psd_png(psd_db: np.ndarray, path: str, size=PSD_IMAGE_SIZE):
+    """Draw the PSD as a line plot over the dB range shown in the thumbnails."""
+    width, height = size
+    top = float(psd_db.max())
+    x = np.linspace(0, width - 1, len(psd_db))
+    y = (top - psd_db) * ((height - 1) / DB_RANGE)
+    points = list(zip(x.tolist(), np.clip(y, 0, height - 1).tolist()))
+
+    image = Image.new('RGB', size, (11, 16, 32))
+    draw = ImageDraw.Draw(image)
+    draw.line([(width // 2, 0), (width // 2, height)], fill=(40, 48, 72))
+    draw.line(points, fill=(56, 189, 248))
+    image.save(path, optimize=True)
+
+
+def _pool_bins(power: np.ndarray, bins: int) -> np.ndarray:
+    """Average adjacent frequency bins down to `bins` values."""
+    if len(power) <= bins:
+        return power
+    return power[:len(power) // bins * bins].reshape(bins, -1).mean(axis=1)
+
+
+class IQPreviewAnalyzer:
+    """Background worker that keeps a preview for every library file."""
+
+    def __init__(self, library_dir: str, on_done=None):
+        """
+        Initialize the analyzer (call start() to begin analyzing).
+
+        Args:
+            library_dir: IQ library root
+            on_done: Optional callback(filename) after a preview is written
+        """
+        self.library_dir = library_dir
+        self.preview_dir = os.path.join(library_dir, PREVIEW_DIR_NAME)
+        self.on_done = on_done
+        self.queue = queue.Queue()
+        self.queued = set()
+        self.failed = {}  # filename -> sha512 of the content that could not be analyzed
+        self.lock = threading.Lock()
+        self.thread = None
+
+        os.makedirs(self.preview_dir, exist_ok=True)
+
+    def paths(self, filename: str) -> Dict[str, str]:
+        """Preview files of a dataset, by kind."""
+        base = os.path.join(self.preview_dir, filename)
+        return {kind: f"{base}.{kind}" for kind in PREVIEW_KINDS}
+
+    def summary(self, filename: str, sha512: Optional[str]) -> Optional[Dict]:
+        """
+        Load the stored PSD summary if it matches the dataset's current hash.
+
+        Returns:
+            The PSD JSON document, or None if there is no current preview
+        """
+        try:
+            with open(self.paths(filename)['psd.json'], 'r') as f:
+                summary = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return summary if summary.get('sha512') == sha512 else None
+
+    def submit(self, filename: str, sha512: Optional[str], sample_rate: float, center_freq: Optional[float]):
+        """Queue a file for analysis (ignored if already queued, or already failed for this content)."""
+        with self.lock:
+            if filename in self.queued or self.failed.get(filename, False) == sha512:
+                return
+            self.queued.add(filename)
+        self.queue.put((filename, sha512, sample_rate, center_freq))
+
+    def remove(self, filename: str):
+        """Delete a file's preview."""
+        for path in self.paths(filename).values():
+            if os.path.exists(path):
+                os.remove(path)
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="iq-preview", daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        while True:
+            filename, sha512, sample_rate, center_freq = self.queue.get()
+            try:
+                self._analyze(filename, sha512, sample_rate, center_freq)
+            except Exception as e:
+                print(f"IQ preview failed for {filename}: {e}")
+                with self.lock:
+                    self.failed[filename] = sha512
+            finally:
+                with self.lock:
+                    self.queued.discard(filename)
+
+    def _analyze(self, filename: str, sha512: Optional[str], sample_rate: float, center_freq: Optional[float]):
+        file_path = os.path.join(self.library_dir, filename)
+        if not os.path.exists(file_path):
+            return
+
+        started = time.perf_counter()
+        result = analyze_iq_file(file_path)
+        psd_db = _to_db(result['psd'])
+        waterfall_db = _to_db(result['waterfall'])
+        paths = self.paths(filename)
+
+        render_waterfall_png(waterfall_db, paths['waterfall.png'])
+        render_psd_png(psd_db, paths['psd.png'])
+
+        compact_db = _to_db(_pool_bins(result['psd'], PREVIEW_PSD_BINS))
+        peak_bin = int(np.argmax(psd_db))
+        bin_hz = sample_rate / len(psd_db)
+        summary = {
+            'sha512': sha512,
+            'sample_rate': sample_rate,
+            'center_freq': center_freq,
+            'fft_size': len(psd_db),
+            'frames': result['frames'],
+            'bins': len(compact_db),
+            'freq_start': -sample_rate / 2,
+            'freq_stop': sample_rate / 2,
+            'db': np.round(compact_db, 1).tolist(),
+            'peak_db': round(float(psd_db[peak_bin]), 1),
+            'peak_offset_hz': round((peak_bin - len(psd_db) // 2) * bin_hz),
+            'noise_floor_db': round(float(np.median(psd_db)), 1)
+        }
+        # Summary last and atomically: its presence marks the preview complete
+        tmp_path = f"{paths['psd.json']}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(summary, f)
+        os.replace(tmp_path, paths['psd.json'])
+
+        print(f"IQ preview for {filename}: {result['frames']} frames in {time.perf_counter() - started:.1f}s")
+        if self.on_done:
+            self.on_done(filename)
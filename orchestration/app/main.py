@@ -1,8 +1,8 @@
 
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from pydantic import BaseModel
 import paho.mqtt.client as mqtt
 import time
@@ -11,14 +11,28 @@ import os
 import shutil
 from pathlib import Path
 from PIL import Image
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 from executor import ExerciseExecutor
 from redis_manager import RedisManager
+from media_variants import attach_variants, variant_paths
+from media_store import MediaStore, BLOB_DIR_NAME
+from media_index import MediaIndex
+from media_render import route_media, media_url, resolve_media_path, MIME_TYPES
+from iq_ingest import (
+    IQIngestor, EXTENSION_FORMATS, SIGMF_META_EXTENSION, CANONICAL_EXTENSION, DEFAULT_SAMPLE_RATE,
+    SIDECAR_SUFFIX, LEGACY_SIDECAR_SUFFIX, probe_source, read_sidecar, write_sidecar, split_extension
+)
+from iq_index import IQLibraryIndex
+from iq_preview import IQPreviewAnalyzer, PREVIEW_KINDS
+from media_delivery import (
+    VariantCache, compute_etag, etag_digest, variant_etag, bucket_width, etag_matches, parse_range,
+    IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL
+)
 import asyncio
+import hashlib
 import re
 import random
-import base64
 import uuid
 
 app = FastAPI()
@@ -49,20 +63,38 @@ class ManualInjectRequest(BaseModel):
     content: dict
     media: List[str] = []
 
-# Mount static files for media serving
-# This allows accessing files at http://localhost:8001/api/media/*
-if os.path.exists(MEDIA_DIR):
-    app.mount("/api/media", StaticFiles(directory=MEDIA_DIR), name="media")
-else:
-    # Create media directory if it doesn't exist
+# Create media directory if it doesn't exist
+# Files are served at http://localhost:8001/api/media/* by get_media below
+if not os.path.exists(MEDIA_DIR):
     os.makedirs(MEDIA_DIR, exist_ok=True)
     os.makedirs(os.path.join(MEDIA_DIR, "library"), exist_ok=True)
-    app.mount("/api/media", StaticFiles(directory=MEDIA_DIR), name="media")
+
+# On-disk LRU cache for width-constrained media variants (?w=320)
+MEDIA_CACHE_DIR = os.getenv('MEDIA_CACHE_DIR', os.path.join(MEDIA_DIR, ".cache"))
+MEDIA_CACHE_MAX_BYTES = int(os.getenv('MEDIA_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+variant_cache = VariantCache(MEDIA_CACHE_DIR, MEDIA_CACHE_MAX_BYTES)
+
+# Content-addressed store: identical library uploads and generated images share one blob
+media_store = MediaStore(MEDIA_DIR)
+
+# Live in-memory media listing, kept current by an inotify watcher on MEDIA_DIR
+media_index = MediaIndex(MEDIA_DIR, media_store)
 
 # Create IQ library directory if it doesn't exist
 if not os.path.exists(IQ_LIBRARY_DIR):
     os.makedirs(IQ_LIBRARY_DIR, exist_ok=True)
 
+# Converts uploaded captures (cu8, cs16, WAV, SigMF, ...) to canonical complex64 in the background
+iq_ingestor = IQIngestor(IQ_LIBRARY_DIR)
+
+# PSD/waterfall previews of library files, computed once per file in the background
+iq_preview_analyzer = IQPreviewAnalyzer(
+    IQ_LIBRARY_DIR, on_done=lambda filename: iq_library_index.refresh(os.path.join(IQ_LIBRARY_DIR, filename))
+)
+
+# Live IQ library listing built from the SigMF sidecars, kept current by a watcher
+iq_library_index = IQLibraryIndex(IQ_LIBRARY_DIR, iq_preview_analyzer, iq_ingestor)
+
 # Mount scenarios directory for thumbnail serving
 # This allows accessing files at http://localhost:8001/api/scenarios/*
 if os.path.exists(SCENARIOS_DIR):
@@ -180,8 +212,7 @@ async def manual_inject(scenario_name: str, inject_data: ManualInjectRequest):
             "delivered_at": elapsed_seconds
         }
 
-        topic = f"/exercise/{scenario_name}/team/{team_id}/feed"
-        executor.mqtt_client.publish(topic, json.dumps(mqtt_payload), qos=1)
+        executor.publish_inject(team_id, mqtt_payload)
 
         # Log to Redis
         await redis_manager.record_inject_delivery(
@@ -444,91 +475,139 @@ def update_timeline(scenario_name: str, team_id: str, timeline_data: dict):
         raise HTTPException(status_code=500, detail=f"Error updating timeline: {str(e)}")
 
 
+def get_media_scan_dirs():
+    """Get the media library and scenario library/generated directories."""
+    scan_dirs = []
+
+    # 1. Global library directory
+    library_path = os.path.join(MEDIA_DIR, "library")
+    if os.path.exists(library_path):
+        scan_dirs.append(library_path)
+
+    # 2. All scenario library and generated directories
+    if os.path.exists(MEDIA_DIR):
+        for item in os.listdir(MEDIA_DIR):
+            scenario_dir = os.path.join(MEDIA_DIR, item)
+            if os.path.isdir(scenario_dir) and item != "library":
+                # Scan scenario library folder
+                scenario_library = os.path.join(scenario_dir, "library")
+                if os.path.exists(scenario_library):
+                    scan_dirs.append(scenario_library)
+                # Scan scenario generated folder
+                generated_dir = os.path.join(scenario_dir, "generated")
+                if os.path.exists(generated_dir):
+                    scan_dirs.append(generated_dir)
+
+    return scan_dirs
+
+
+@app.on_event("startup")
+async def start_media_services():
+    """Reconcile the media store with files changed while offline and start the media index."""
+    await asyncio.to_thread(
+        media_store.sync, get_media_scan_dirs(), {'.jpg', '.jpeg', '.png', '.gif', '.svg', '.webp'}
+    )
+
+    # Build the media listing once, then keep it current from filesystem events
+    await asyncio.to_thread(media_index.start, asyncio.get_running_loop())
+
+
+@app.on_event("shutdown")
+def stop_media_index():
+    """Stop the media directory watcher."""
+    media_index.stop()
+
+
 @app.get("/api/v1/media")
 def list_media():
     """List all media files in the library and scenario-generated folders with metadata."""
-    media_files = []
-    supported_formats = {'.jpg', '.jpeg', '.png', '.gif', '.svg'}
+    # Served from the live index; the watcher keeps it current so no rescan is needed
+    return {"media": media_index.list()}
+
+
+@app.get("/api/v1/media/events")
+async def media_events(request: Request):
+    """Server-sent events stream of media added/removed in the library and generated folders."""
+    queue = media_index.subscribe()
+
+    async def event_stream():
+        try:
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    # Keep-alive comment so proxies don't close an idle stream
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event.get('media'))}\n\n"
+        finally:
+            media_index.unsubscribe(queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.api_route("/api/media/{media_path:path}", methods=["GET", "HEAD"])
+def get_media(media_path: str, request: Request, w: Optional[int] = None, v: Optional[str] = None):
+    """
+    Serve a media file with strong ETags and byte-range support.
+
+    ?w=320 serves a variant no wider than the requested width (rounded up to a
+    cache bucket), generated on first request. ?v=<sha256> marks the URL as
+    content-addressed: if it matches the file's hash the response is immutable.
+    """
+    file_path = resolve_media_path(MEDIA_DIR, f"/api/media/{media_path}")
+    if not file_path or not os.path.isfile(file_path):
+        raise HTTPException(status_code=404, detail="File not found")
+
+    etag = compute_etag(file_path)
+    content_addressed = media_path.startswith(f"{BLOB_DIR_NAME}/") or (v is not None and v == etag_digest(etag))
+    serve_path = file_path
+
+    if w is not None:
+        if w < 1:
+            raise HTTPException(status_code=400, detail="Width must be positive")
+        width = bucket_width(w)
+        variant_path = variant_cache.get_variant(file_path, etag, width)
+        if variant_path:
+            serve_path = variant_path
+            etag = variant_etag(etag, width)
+
+    headers = {
+        "ETag": etag,
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if content_addressed else REVALIDATE_CACHE_CONTROL,
+        "Accept-Ranges": "bytes"
+    }
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    media_type = MIME_TYPES.get(os.path.splitext(file_path)[1].lower(), 'application/octet-stream')
+    size = os.path.getsize(serve_path)
+
+    # Only honour a range against the representation the client already has
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if if_range and if_range != etag:
+        range_header = None
 
     try:
-        # Directories to scan
-        scan_dirs = []
-
-        # 1. Global library directory
-        library_path = os.path.join(MEDIA_DIR, "library")
-        if os.path.exists(library_path):
-            scan_dirs.append(library_path)
-
-        # 2. All scenario library and generated directories
-        if os.path.exists(MEDIA_DIR):
-            for item in os.listdir(MEDIA_DIR):
-                scenario_dir = os.path.join(MEDIA_DIR, item)
-                if os.path.isdir(scenario_dir) and item != "library":
-                    # Scan scenario library folder
-                    scenario_library = os.path.join(scenario_dir, "library")
-                    if os.path.exists(scenario_library):
-                        scan_dirs.append(scenario_library)
-                    # Scan scenario generated folder
-                    generated_dir = os.path.join(scenario_dir, "generated")
-                    if os.path.exists(generated_dir):
-                        scan_dirs.append(generated_dir)
-
-        # Scan all directories
-        for scan_path in scan_dirs:
-            for root, dirs, files in os.walk(scan_path):
-                for filename in files:
-                    file_path = os.path.join(root, filename)
-                    file_ext = os.path.splitext(filename)[1].lower()
-
-                    # Only process image files
-                    if file_ext not in supported_formats:
-                        continue
-
-                    # Get relative path from media root
-                    rel_path = os.path.relpath(file_path, MEDIA_DIR)
-
-                    # Get file stats
-                    stat = os.stat(file_path)
-                    file_size = stat.st_size
-                    modified_time = stat.st_mtime
-
-                    # Try to get image dimensions
-                    width = None
-                    height = None
-                    if file_ext in {'.jpg', '.jpeg', '.png', '.gif'}:
-                        try:
-                            with Image.open(file_path) as img:
-                                width, height = img.size
-                        except Exception as e:
-                            print(f"Could not read dimensions for {filename}: {e}")
-
-                    # Determine MIME type
-                    mime_types = {
-                        '.jpg': 'image/jpeg',
-                        '.jpeg': 'image/jpeg',
-                        '.png': 'image/png',
-                        '.gif': 'image/gif',
-                        '.svg': 'image/svg+xml'
-                    }
-                    mime_type = mime_types.get(file_ext, 'application/octet-stream')
-
-                    media_files.append({
-                        'filename': filename,
-                        'path': f"/api/media/{rel_path}",
-                        'size': file_size,
-                        'width': width,
-                        'height': height,
-                        'modified': modified_time,
-                        'mime_type': mime_type
-                    })
-
-        # Sort by filename
-        media_files.sort(key=lambda x: x['filename'])
-
-        return {"media": media_files}
+        byte_range = parse_range(range_header, size)
+    except ValueError:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error listing media files: {str(e)}")
+    if byte_range is None:
+        return FileResponse(serve_path, media_type=media_type, headers=headers)
+
+    start, end = byte_range
+    with open(serve_path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start + 1)
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return Response(content=data, status_code=206, media_type=media_type, headers=headers)
 
 
 @app.post("/api/v1/media/upload")
@@ -589,20 +668,27 @@ async def upload_media(files: List[UploadFile] = File(...)):
             safe_filename = re.sub(r'[^\w\s.-]', '', file.filename)
             safe_filename = safe_filename.replace(' ', '-')
 
-            # Handle filename conflicts (auto-rename)
-            base_name = os.path.splitext(safe_filename)[0]
-            extension = os.path.splitext(safe_filename)[1]
-            final_filename = safe_filename
-            counter = 1
+            # Identical content already in the library is returned instead of stored again
+            sha = hashlib.sha256(content).hexdigest()
+            existing_alias = media_store.find_alias(sha, prefix="library/")
+
+            if existing_alias:
+                final_filename = os.path.basename(existing_alias)
+                file_path = os.path.join(MEDIA_DIR, existing_alias)
+            else:
+                # Handle filename conflicts (auto-rename)
+                base_name = os.path.splitext(safe_filename)[0]
+                extension = os.path.splitext(safe_filename)[1]
+                final_filename = safe_filename
+                counter = 1
 
-            while os.path.exists(os.path.join(library_path, final_filename)):
-                final_filename = f"{base_name}-{counter}{extension}"
-                counter += 1
+                while os.path.exists(os.path.join(library_path, final_filename)):
+                    final_filename = f"{base_name}-{counter}{extension}"
+                    counter += 1
 
-            # Save file
-            file_path = os.path.join(library_path, final_filename)
-            with open(file_path, 'wb') as f:
-                f.write(content)
+                # Save file as an alias of its content blob
+                file_path = os.path.join(library_path, final_filename)
+                media_store.put(file_path, content)
 
             # Extract metadata
             stat = os.stat(file_path)
@@ -632,7 +718,10 @@ async def upload_media(files: List[UploadFile] = File(...)):
             uploaded.append({
                 'filename': final_filename,
                 'original_filename': file.filename,
-                'path': f"/api/media/library/{final_filename}",
+                'path': f"/api/media/{media_store.alias_for(file_path)}",
+                'content_path': media_store.blob_url(sha),
+                'sha256': sha,
+                'deduplicated': existing_alias is not None,
                 'size': file_size,
                 'width': width,
                 'height': height,
@@ -683,8 +772,8 @@ def delete_media(path: str):
         raise HTTPException(status_code=400, detail="Path is not a file")
 
     try:
-        # Delete the file
-        os.remove(file_path)
+        # Delete the alias; the blob is reclaimed once nothing else references it
+        media_store.remove(file_path)
         return {
             "success": True,
             "message": f"File deleted successfully",
@@ -694,6 +783,19 @@ def delete_media(path: str):
         raise HTTPException(status_code=500, detail=f"Failed to delete file: {str(e)}")
 
 
+def remove_generated_media(file_path: str):
+    """Remove a generated image and its variants, releasing their blobs."""
+    for path in [file_path, *variant_paths(file_path).values()]:
+        media_store.remove(path)
+
+
+def store_generated_media(file_path: str):
+    """Move a generated image and its variants into the content-addressed store."""
+    for path in [file_path, *variant_paths(file_path).values()]:
+        if os.path.exists(path):
+            media_store.ingest(path)
+
+
 @app.post("/api/v1/scenarios/{scenario_id}/generate-social-media")
 async def generate_social_media(scenario_id: str):
     """Generate social media images for all social injects in the scenario."""
@@ -836,9 +938,8 @@ async def generate_social_media(scenario_id: str):
             filename = f"{safe_team_id}_{safe_id}_{platform}.png"
             file_path = os.path.join(generated_dir, filename)
 
-            # Delete existing file if present
-            if os.path.exists(file_path):
-                os.remove(file_path)
+            # Delete existing file and its variants if present
+            remove_generated_media(file_path)
 
             # PHASE 7: Render Template
             async with async_playwright() as p:
@@ -880,6 +981,12 @@ async def generate_social_media(scenario_id: str):
             # PHASE 6: Update Inject with Media Path (single platform)
             media_path = f"/api/media/{scenario_id}/generated/{filename}"
             inject['media'] = [media_path]
+
+            # Emit size-budgeted variants for constrained networks (encoding takes
+            # seconds per image, so it runs off the event loop)
+            await asyncio.to_thread(attach_variants, inject, file_path, media_path)
+            await asyncio.to_thread(store_generated_media, file_path)
+
             timeline_modified = True
             generated_count += 1
 
@@ -925,100 +1032,79 @@ async def generate_breaking_news(scenario_id: str):
 
     generated_count = 0
 
-    # Process each team's timeline
-    for team in scenario_data.get('teams', []):
-        team_id = team['id']
-        timeline_file = team.get('timeline_file')
-
-        if not timeline_file:
-            continue
-
-        timeline_path = os.path.join(SCENARIOS_DIR, timeline_file)
-        if not os.path.exists(timeline_path):
-            continue
-
-        # Load timeline
-        with open(timeline_path, 'r') as f:
-            timeline_data = json.load(f)
+    # One browser and page serve every inject so library images are fetched and decoded once
+    async with async_playwright() as p:
+        browser = await p.chromium.launch()
+        page = await browser.new_page(viewport={'width': 650, 'height': 1200})
+        await route_media(page, MEDIA_DIR)
 
-        timeline_modified = False
+        # Process each team's timeline
+        for team in scenario_data.get('teams', []):
+            team_id = team['id']
+            timeline_file = team.get('timeline_file')
 
-        # Process each inject
-        for inject in timeline_data.get('injects', []):
-            if inject.get('type') != 'news':
+            if not timeline_file:
                 continue
 
-            # Extract content
-            content = inject.get('content', {})
-            headline = content.get('headline', 'Breaking News')
-            body = content.get('body', '')
-            source = content.get('source', 'News Source')
-
-            # Calculate timestamp (same logic as social media)
-            turn = inject.get('turn', 1)
-            time_minutes = inject.get('time', 0)
-            base_hours = (turn - 1) * 2
-            total_minutes = (base_hours * 60) + time_minutes
-
-            if total_minutes < 60:
-                timestamp = f"{total_minutes}m ago" if total_minutes > 0 else "just now"
-            elif total_minutes < 1440:
-                hours = total_minutes // 60
-                mins = total_minutes % 60
-                timestamp = f"{hours}h {mins}m ago" if mins > 0 else f"{hours}h ago"
-            else:
-                days = total_minutes // 1440
-                remaining_hours = (total_minutes % 1440) // 60
-                timestamp = f"{days}d {remaining_hours}h ago" if remaining_hours > 0 else f"{days}d ago"
-
-            # Process images from media array (max 3)
-            images_html = ""
-            media_paths = inject.get('media', [])
-
-            for idx, media_path in enumerate(media_paths[:3]):
-                # Convert /api/media/... path to filesystem path
-                if media_path.startswith('/api/media/'):
-                    relative_path = media_path[11:]  # Remove '/api/media/'
-                    file_path = os.path.join(MEDIA_DIR, relative_path)
-
-                    if os.path.exists(file_path):
-                        try:
-                            # Read image and convert to base64
-                            with open(file_path, 'rb') as img_file:
-                                img_data = img_file.read()
-                                img_base64 = base64.b64encode(img_data).decode()
-
-                            # Determine MIME type
-                            ext = os.path.splitext(file_path)[1].lower()
-                            mime_types = {
-                                '.jpg': 'image/jpeg',
-                                '.jpeg': 'image/jpeg',
-                                '.png': 'image/png',
-                                '.gif': 'image/gif'
-                            }
-                            mime_type = mime_types.get(ext, 'image/jpeg')
-
-                            # Create img tag with embedded data
-                            images_html += f'<img src="data:{mime_type};base64,{img_base64}" class="news-image" alt="News image {idx + 1}">\n'
-                        except Exception as e:
-                            print(f"Error embedding image {media_path}: {e}")
+            timeline_path = os.path.join(SCENARIOS_DIR, timeline_file)
+            if not os.path.exists(timeline_path):
+                continue
 
-            # Generate filename
-            inject_id = inject.get('id', f"inject_{time_minutes}")
-            safe_id = re.sub(r'[^\w\-]', '_', inject_id)
-            safe_team_id = re.sub(r'[^\w\-]', '_', team_id)
-            filename = f"{safe_team_id}_{safe_id}_breaking_news.png"
-            file_path = os.path.join(generated_dir, filename)
+            # Load timeline
+            with open(timeline_path, 'r') as f:
+                timeline_data = json.load(f)
 
-            # Delete existing file if present
-            if os.path.exists(file_path):
-                os.remove(file_path)
+            timeline_modified = False
 
-            # Render template
-            async with async_playwright() as p:
-                browser = await p.chromium.launch()
-                page = await browser.new_page(viewport={'width': 650, 'height': 1200})
+            # Process each inject
+            for inject in timeline_data.get('injects', []):
+                if inject.get('type') != 'news':
+                    continue
 
+                # Extract content
+                content = inject.get('content', {})
+                headline = content.get('headline', 'Breaking News')
+                body = content.get('body', '')
+                source = content.get('source', 'News Source')
+
+                # Calculate timestamp (same logic as social media)
+                turn = inject.get('turn', 1)
+                time_minutes = inject.get('time', 0)
+                base_hours = (turn - 1) * 2
+                total_minutes = (base_hours * 60) + time_minutes
+
+                if total_minutes < 60:
+                    timestamp = f"{total_minutes}m ago" if total_minutes > 0 else "just now"
+                elif total_minutes < 1440:
+                    hours = total_minutes // 60
+                    mins = total_minutes % 60
+                    timestamp = f"{hours}h {mins}m ago" if mins > 0 else f"{hours}h ago"
+                else:
+                    days = total_minutes // 1440
+                    remaining_hours = (total_minutes % 1440) // 60
+                    timestamp = f"{days}d {remaining_hours}h ago" if remaining_hours > 0 else f"{days}d ago"
+
+                # Process images from media array (max 3)
+                images_html = ""
+                media_paths = inject.get('media', [])
+
+                for idx, media_path in enumerate(media_paths[:3]):
+                    # Reference library images by URL; the render page serves them from the shared cache
+                    file_path = resolve_media_path(MEDIA_DIR, media_path)
+                    if file_path and os.path.exists(file_path):
+                        images_html += f'<img src="{media_url(media_path)}" class="news-image" alt="News image {idx + 1}">\n'
+
+                # Generate filename
+                inject_id = inject.get('id', f"inject_{time_minutes}")
+                safe_id = re.sub(r'[^\w\-]', '_', inject_id)
+                safe_team_id = re.sub(r'[^\w\-]', '_', team_id)
+                filename = f"{safe_team_id}_{safe_id}_breaking_news.png"
+                file_path = os.path.join(generated_dir, filename)
+
+                # Delete existing file and its variants if present
+                remove_generated_media(file_path)
+
+                # Render template
                 html = template
                 html = html.replace('{{HEADLINE}}', headline)
                 html = html.replace('{{BODY}}', body)
@@ -1026,31 +1112,37 @@ async def generate_breaking_news(scenario_id: str):
                 html = html.replace('{{TIMESTAMP}}', timestamp)
                 html = html.replace('{{IMAGES}}', images_html)
 
+                # set_content waits for the load event, so referenced images are decoded before the screenshot
                 await page.set_content(html)
                 await page.wait_for_timeout(500)
                 element = await page.query_selector('.news-container')
                 await element.screenshot(path=file_path)
 
-                await browser.close()
+                # Update inject with media path
+                media_path = f"/api/media/{scenario_id}/generated/{filename}"
 
-            # Update inject with media path
-            media_path = f"/api/media/{scenario_id}/generated/{filename}"
+                # Preserve existing media paths and add generated one
+                existing_media = inject.get('media', [])
+                # Remove any previous breaking_news.png for this inject
+                existing_media = [m for m in existing_media if not m.endswith('_breaking_news.png')]
+                # Add new generated image
+                existing_media.append(media_path)
+                inject['media'] = existing_media
 
-            # Preserve existing media paths and add generated one
-            existing_media = inject.get('media', [])
-            # Remove any previous breaking_news.png for this inject
-            existing_media = [m for m in existing_media if not m.endswith('_breaking_news.png')]
-            # Add new generated image
-            existing_media.append(media_path)
-            inject['media'] = existing_media
+                # Emit size-budgeted variants for constrained networks (encoding takes
+                # seconds per image, so it runs off the event loop)
+                await asyncio.to_thread(attach_variants, inject, file_path, media_path)
+                await asyncio.to_thread(store_generated_media, file_path)
 
-            timeline_modified = True
-            generated_count += 1
+                timeline_modified = True
+                generated_count += 1
 
-        # Save updated timeline if modified
-        if timeline_modified:
-            with open(timeline_path, 'w') as f:
-                json.dump(timeline_data, f, indent=2)
+            # Save updated timeline if modified
+            if timeline_modified:
+                with open(timeline_path, 'w') as f:
+                    json.dump(timeline_data, f, indent=2)
+
+        await browser.close()
 
     return {
         "status": "success",
@@ -1142,9 +1234,8 @@ async def generate_intelligence(scenario_id: str):
             filename = f"{safe_team_id}_{safe_id}_intelligence.png"
             file_path = os.path.join(generated_dir, filename)
 
-            # Delete existing file if present
-            if os.path.exists(file_path):
-                os.remove(file_path)
+            # Delete existing file and its variants if present
+            remove_generated_media(file_path)
 
             # Render template
             async with async_playwright() as p:
@@ -1175,6 +1266,11 @@ async def generate_intelligence(scenario_id: str):
             existing_media.append(media_path)
             inject['media'] = existing_media
 
+            # Emit size-budgeted variants for constrained networks (encoding takes
+            # seconds per image, so it runs off the event loop)
+            await asyncio.to_thread(attach_variants, inject, file_path, media_path)
+            await asyncio.to_thread(store_generated_media, file_path)
+
             timeline_modified = True
             generated_count += 1
 
@@ -1381,143 +1477,216 @@ def get_scenario_analytics(scenario_id: str):
     }
 
 
-@app.get("/api/v1/iq-library")
-def list_iq_files():
-    """List all IQ files in the library with metadata."""
-    if not os.path.exists(IQ_LIBRARY_DIR):
-        return {"iq_files": []}
-
-    iq_files = []
-    supported_formats = {'.iq', '.dat', '.raw', '.cfile'}
-
-    try:
-        for filename in os.listdir(IQ_LIBRARY_DIR):
-            file_path = os.path.join(IQ_LIBRARY_DIR, filename)
-            file_ext = os.path.splitext(filename)[1].lower()
-
-            # Only process IQ files
-            if file_ext not in supported_formats or not os.path.isfile(file_path):
-                continue
-
-            # Get file stats
-            stat = os.stat(file_path)
-            file_size = stat.st_size
-            modified_time = stat.st_mtime
-
-            # Calculate duration (assuming complex64 at 1.024 MHz)
-            sample_rate = 1024000  # Default sample rate
-            num_samples = file_size // 8  # 8 bytes per complex64 sample
-            duration_seconds = num_samples / sample_rate
+@app.on_event("startup")
+async def start_iq_library():
+    """Start the IQ conversion worker (resuming interrupted conversions), the preview analyzer and the library index."""
+    iq_ingestor.start()
+    iq_preview_analyzer.start()
+    # May hash pre-sidecar files to backfill their metadata, so keep it off the event loop
+    await asyncio.to_thread(iq_library_index.start)
 
-            iq_files.append({
-                'filename': filename,
-                'path': f"/iq_library/{filename}",
-                'size': file_size,
-                'size_mb': round(file_size / (1024 * 1024), 2),
-                'duration_seconds': round(duration_seconds, 1),
-                'num_samples': num_samples,
-                'modified': modified_time,
-                'format': file_ext[1:]  # Remove leading dot
-            })
 
-        # Sort by filename
-        iq_files.sort(key=lambda x: x['filename'])
+@app.on_event("shutdown")
+def stop_iq_library_index():
+    """Stop the IQ library watcher."""
+    iq_library_index.stop()
 
-        return {"iq_files": iq_files}
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error listing IQ files: {str(e)}")
+@app.get("/api/v1/iq-library")
+def list_iq_files():
+    """List all IQ files in the library with metadata."""
+    # Served from the sidecar index; the watcher keeps it current so nothing is re-read here
+    pending = [job for job in iq_ingestor.list_jobs() if job['status'] != 'ready']
+    return {"iq_files": iq_library_index.list(), "conversions": pending}
+
+
+@app.get("/api/v1/iq-library/jobs/{job_id}")
+def get_iq_conversion(job_id: str):
+    """Status and progress of a background IQ conversion."""
+    job = iq_ingestor.job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Conversion job not found")
+    return job
+
+
+@app.get("/api/v1/iq-library/preview/{filename}/{kind}")
+def get_iq_preview(filename: str, kind: str):
+    """Serve a library file's preview: waterfall.png, psd.png or psd.json."""
+    if kind not in PREVIEW_KINDS or iq_library_index.get(filename) is None:
+        raise HTTPException(status_code=404, detail="IQ file not found")
+    preview_path = iq_preview_analyzer.paths(filename)[kind]
+    if not os.path.exists(preview_path):
+        raise HTTPException(status_code=404, detail="Preview not ready")
+    return FileResponse(preview_path, media_type="application/json" if kind.endswith('.json') else "image/png")
+
+
+def _unique_library_name(filename: str, directory: str, reserved: set = frozenset()) -> str:
+    """Sanitize a filename and suffix it until it is free in directory."""
+    safe_filename = re.sub(r'[^\w\s.-]', '', filename).replace(' ', '-')
+    base_name, extension = split_extension(safe_filename)
+    final_filename = safe_filename
+    counter = 1
+    while os.path.exists(os.path.join(directory, final_filename)) or final_filename in reserved:
+        final_filename = f"{base_name}-{counter}{extension}"
+        counter += 1
+    return final_filename
 
 
 @app.post("/api/v1/iq-library/upload")
-async def upload_iq_file(files: List[UploadFile] = File(...)):
-    """Upload IQ files to the library."""
+async def upload_iq_file(
+    files: List[UploadFile] = File(...),
+    format: Optional[str] = Form(None),
+    sample_rate: Optional[float] = Form(None),
+    center_freq: Optional[float] = Form(None),
+    description: Optional[str] = Form(None)
+):
+    """
+    Upload IQ captures to the library.
+
+    complex64 files are stored as they are. Other formats (cu8, cs8, cs16,
+    WAV, SigMF pairs, or raw files with a declared format) are kept as
+    originals and converted to complex64 in the background; the response
+    carries a job per conversion. format, sample_rate, center_freq and
+    description apply to every file in the upload and override what the
+    files declare. Every library file gets a SigMF sidecar.
+    """
     os.makedirs(IQ_LIBRARY_DIR, exist_ok=True)
 
     uploaded = []
     errors = []
 
     # Supported file types
-    allowed_extensions = {'.iq', '.dat', '.raw', '.cfile'}
+    allowed_extensions = set(EXTENSION_FORMATS) | {SIGMF_META_EXTENSION}
 
     # File size limit: 500MB (IQ files can be large)
     max_file_size = 500 * 1024 * 1024
 
+    # 1. Stream every file to the work directory, hashing on the way
+    received = []
     for file in files:
-        try:
-            file_ext = os.path.splitext(file.filename)[1].lower()
+        file_ext = split_extension(file.filename)[1]
 
-            # Validate file extension
-            if file_ext not in allowed_extensions:
-                errors.append({
-                    "filename": file.filename,
-                    "error": f"Invalid file type. Allowed: {', '.join(allowed_extensions)}"
-                })
-                continue
+        # Validate file extension
+        if file_ext not in allowed_extensions and not format:
+            errors.append({
+                "filename": file.filename,
+                "error": f"Invalid file type. Allowed: {', '.join(sorted(allowed_extensions))}"
+            })
+            continue
 
-            # Read file content
-            content = await file.read()
-            file_size = len(content)
+        temp_path = os.path.join(iq_ingestor.work_dir, f"upload-{uuid.uuid4().hex}")
+        sha512 = hashlib.sha512()
+        file_size = 0
+        try:
+            with open(temp_path, 'wb') as f:
+                while chunk := await file.read(1024 * 1024):
+                    file_size += len(chunk)
+                    if file_size > max_file_size:
+                        raise ValueError("File too large (> 500MB limit)")
+                    sha512.update(chunk)
+                    f.write(chunk)
+        except Exception as e:
+            os.remove(temp_path)
+            errors.append({"filename": file.filename, "error": f"Upload failed: {str(e)}"})
+            continue
+        received.append((file.filename, file_ext, temp_path, sha512.hexdigest(), file_size))
 
-            # Validate file size
-            if file_size > max_file_size:
-                errors.append({
-                    "filename": file.filename,
-                    "error": f"File too large ({file_size / (1024*1024):.1f}MB > 500MB limit)"
+    # SigMF metadata files travel with their data file
+    sigmf_meta = {split_extension(name)[0]: path for name, ext, path, _, _ in received
+                  if ext == SIGMF_META_EXTENSION}
+
+    # 2. Store or queue each capture
+    for filename, file_ext, temp_path, sha512, file_size in received:
+        if file_ext == SIGMF_META_EXTENSION:
+            continue
+        try:
+            source = probe_source(temp_path, filename, format,
+                                  sigmf_meta.get(split_extension(filename)[0]))
+
+            if description:
+                source['description'] = description
+
+            cached = iq_library_index.find_source(sha512, source['datatype'])
+            if cached:
+                # Same content, already converted: nothing to store
+                os.remove(temp_path)
+                uploaded.append({
+                    'filename': cached['filename'],
+                    'original_filename': filename,
+                    'path': f"/iq_library/{cached['filename']}",
+                    'status': 'ready',
+                    'cached': True
                 })
                 continue
 
-            # Validate file is complex64 format (size must be multiple of 8)
-            if file_size % 8 != 0:
-                errors.append({
-                    "filename": file.filename,
-                    "error": "File size invalid - must be multiple of 8 bytes (complex64 format)"
+            is_canonical = (source['datatype'] == 'cf32_le' and source['data_offset'] == 0
+                            and EXTENSION_FORMATS.get(file_ext) == 'cf32_le')
+            if is_canonical:
+                # Already complex64: the upload is its own canonical file
+                if file_size % 8 != 0:
+                    raise ValueError("File size invalid - must be multiple of 8 bytes (complex64 format)")
+                final_filename = _unique_library_name(filename, IQ_LIBRARY_DIR, iq_ingestor.reserved_names())
+                file_path = os.path.join(IQ_LIBRARY_DIR, final_filename)
+                os.replace(temp_path, file_path)
+                write_sidecar(file_path, {
+                    'status': 'ready',
+                    'datatype': 'cf32_le',
+                    'sample_rate': sample_rate or DEFAULT_SAMPLE_RATE,
+                    'center_freq': center_freq,
+                    'num_samples': file_size // 8,
+                    'sha512': sha512,
+                    'description': description,
+                    'source': {'filename': filename, 'path': final_filename, 'datatype': 'cf32_le',
+                               'data_offset': 0, 'data_length': file_size, 'sha512': sha512}
+                })
+                uploaded.append({
+                    'filename': final_filename,
+                    'original_filename': filename,
+                    'path': f"/iq_library/{final_filename}",
+                    'size': file_size,
+                    'size_mb': round(file_size / (1024 * 1024), 2),
+                    'duration_seconds': round(file_size // 8 / (sample_rate or DEFAULT_SAMPLE_RATE), 1),
+                    'num_samples': file_size // 8,
+                    'status': 'ready'
                 })
                 continue
 
-            # Sanitize filename
-            import re
-            safe_filename = re.sub(r'[^\w\s.-]', '', file.filename)
-            safe_filename = safe_filename.replace(' ', '-')
-
-            # Handle filename conflicts
-            base_name = os.path.splitext(safe_filename)[0]
-            extension = os.path.splitext(safe_filename)[1]
-            final_filename = safe_filename
-            counter = 1
-
-            while os.path.exists(os.path.join(IQ_LIBRARY_DIR, final_filename)):
-                final_filename = f"{base_name}-{counter}{extension}"
-                counter += 1
-
-            # Save file
-            file_path = os.path.join(IQ_LIBRARY_DIR, final_filename)
-            with open(file_path, 'wb') as f:
-                f.write(content)
-
-            # Calculate metadata
-            stat = os.stat(file_path)
-            num_samples = file_size // 8
-            sample_rate = 1024000
-            duration_seconds = num_samples / sample_rate
-
+            # Keep the original, convert a complex64 copy into the library
+            original_filename = _unique_library_name(filename, iq_ingestor.originals_dir)
+            original_path = os.path.join(iq_ingestor.originals_dir, original_filename)
+            os.replace(temp_path, original_path)
+            meta_path = sigmf_meta.get(split_extension(filename)[0])
+            if meta_path and os.path.exists(meta_path):
+                os.replace(meta_path, os.path.join(
+                    iq_ingestor.originals_dir, split_extension(original_filename)[0] + SIGMF_META_EXTENSION))
+
+            canonical_filename = _unique_library_name(
+                split_extension(filename)[0] + CANONICAL_EXTENSION, IQ_LIBRARY_DIR, iq_ingestor.reserved_names()
+            )
+            job = iq_ingestor.submit(canonical_filename, original_path, filename, source, sha512,
+                                     sample_rate, center_freq)
             uploaded.append({
-                'filename': final_filename,
-                'original_filename': file.filename,
-                'path': f"/iq_library/{final_filename}",
-                'size': file_size,
-                'size_mb': round(file_size / (1024 * 1024), 2),
-                'duration_seconds': round(duration_seconds, 1),
-                'num_samples': num_samples,
-                'modified': stat.st_mtime
+                'filename': canonical_filename,
+                'original_filename': filename,
+                'path': f"/iq_library/{canonical_filename}",
+                'source_format': source['datatype'],
+                'status': 'converting',
+                'job_id': job['id']
             })
 
         except Exception as e:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
             errors.append({
-                "filename": file.filename,
+                "filename": filename,
                 "error": f"Upload failed: {str(e)}"
             })
 
+    # Metadata files whose data file never arrived
+    for meta_path in sigmf_meta.values():
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+
     return {
         "success": len(uploaded) > 0,
         "uploaded": uploaded,
@@ -1536,7 +1705,7 @@ def delete_iq_file(path: str):
         raise HTTPException(status_code=400, detail="Invalid IQ library path")
 
     # Convert to filesystem path
-    relative_path = path[13:]  # Remove '/iq_library/' prefix
+    relative_path = path[len('/iq_library/'):]
     file_path = os.path.join(IQ_LIBRARY_DIR, relative_path)
 
     # Security: Ensure path is within IQ_LIBRARY_DIR
@@ -1554,7 +1723,19 @@ def delete_iq_file(path: str):
         raise HTTPException(status_code=400, detail="Path is not a file")
 
     try:
+        # The retained original goes with it (unless the file is its own original)
+        sidecar = read_sidecar(file_path) or {}
         os.remove(file_path)
+        for suffix in (SIDECAR_SUFFIX, LEGACY_SIDECAR_SUFFIX):
+            if os.path.exists(file_path + suffix):
+                os.remove(file_path + suffix)
+        iq_preview_analyzer.remove(relative_path)
+        original = sidecar.get('source', {}).get('path')
+        if original and original != relative_path:
+            original_path = os.path.join(IQ_LIBRARY_DIR, original)
+            for retained_path in (original_path, split_extension(original_path)[0] + SIGMF_META_EXTENSION):
+                if os.path.exists(retained_path):
+                    os.remove(retained_path)
         return {
             "success": True,
             "message": "IQ file deleted successfully",
@@ -0,0 +1,214 @@
+"""
+Media Delivery for SCIP v3
+
+Supports the /api/media endpoint: strong ETags, width-constrained image
+variants generated on demand, and an on-disk LRU cache for those variants
+with a total size cap.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+from PIL import Image
+
+
+# Widths are rounded up to a bucket so the cache holds a bounded set of variants
+WIDTH_BUCKETS = [160, 320, 480, 640, 960, 1280, 1920]
+
+# Formats PIL can resize and re-encode in their original format
+RESIZABLE_FORMATS = {
+    '.jpg': 'JPEG',
+    '.jpeg': 'JPEG',
+    '.png': 'PNG',
+    '.webp': 'WEBP'
+}
+
+# Cache-Control for URLs that embed a content hash and can never change
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Cache-Control for mutable paths: cache, but always revalidate with the ETag
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+
+
+_etag_cache = {}  # file_path -> ((mtime_ns, size), etag)
+_etag_lock = threading.Lock()
+
+
+def compute_etag(file_path: str) -> str:
+    """
+    Compute a strong ETag (SHA-256 of file contents) for a file.
+
+    Hashes are memoized per (mtime, size) so unchanged files are only read once.
+    """
+    stat = os.stat(file_path)
+    key = (stat.st_mtime_ns, stat.st_size)
+
+    with _etag_lock:
+        cached = _etag_cache.get(file_path)
+    if cached and cached[0] == key:
+        return cached[1]
+
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    etag = f'"{digest.hexdigest()}"'
+
+    with _etag_lock:
+        _etag_cache[file_path] = (key, etag)
+    return etag
+
+
+def etag_digest(etag: str) -> str:
+    """Strip the quotes from a strong ETag, leaving the hex digest."""
+    return etag.strip('"')
+
+
+def variant_etag(etag: str, width: int) -> str:
+    """Derive the strong ETag of a width variant from its original's ETag."""
+    return f'"{etag_digest(etag)}-w{width}"'
+
+
+def bucket_width(width: int) -> int:
+    """Round a requested width up to the nearest cache bucket."""
+    for bucket in WIDTH_BUCKETS:
+        if width <= bucket:
+            return bucket
+    return WIDTH_BUCKETS[-1]
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against a strong ETag."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range "bytes=" header.
+
+    Args:
+        range_header: Value of the Range request header
+        size: Total size of the representation
+
+    Returns:
+        Inclusive (start, end) byte offsets, or None if no range was requested
+
+    Raises:
+        ValueError: If the range is malformed or unsatisfiable
+    """
+    if not range_header:
+        return None
+    if not range_header.startswith('bytes=') or ',' in range_header:
+        raise ValueError("Only single byte ranges are supported")
+
+    start_str, _, end_str = range_header[6:].strip().partition('-')
+    if start_str == '':
+        # Suffix range: last N bytes
+        length = int(end_str)
+        if length <= 0:
+            raise ValueError("Unsatisfiable range")
+        start, end = max(size - length, 0), size - 1
+    else:
+        start = int(start_str)
+        end = int(end_str) if end_str else size - 1
+        end = min(end, size - 1)
+
+    if start > end or start >= size:
+        raise ValueError("Unsatisfiable range")
+    return start, end
+
+
+class VariantCache:
+    """On-disk LRU cache of resized image variants with a total size cap."""
+
+    def __init__(self, cache_dir: str, max_bytes: int = 256 * 1024 * 1024):
+        """
+        Initialize the cache, indexing any variants left from a previous run.
+
+        Args:
+            cache_dir: Directory holding cached variants
+            max_bytes: Total size of cached variants before eviction
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.entries = OrderedDict()  # filename -> size, least recently used first
+        self.lock = threading.Lock()
+
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # Rebuild LRU order from modification times (touched on every hit)
+        existing = []
+        for filename in os.listdir(cache_dir):
+            path = os.path.join(cache_dir, filename)
+            if filename.startswith('.') or not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            existing.append((stat.st_mtime, filename, stat.st_size))
+        for _, filename, size in sorted(existing):
+            self.entries[filename] = size
+            self.total_bytes += size
+        self._evict()
+
+    def get_variant(self, file_path: str, etag: str, width: int) -> Optional[str]:
+        """
+        Get a width-constrained variant of an image, creating it if needed.
+
+        Args:
+            file_path: Filesystem path of the original image
+            etag: Strong ETag of the original (keys the variant to its content)
+            width: Bucketed maximum width
+
+        Returns:
+            Path of the cached variant, or None if the original should be
+            served as-is (unsupported format or already narrow enough)
+        """
+        ext = os.path.splitext(file_path)[1].lower()
+        if ext not in RESIZABLE_FORMATS:
+            return None
+
+        filename = f"{etag_digest(etag)}-w{width}{ext}"
+        path = os.path.join(self.cache_dir, filename)
+
+        with self.lock:
+            if filename in self.entries and os.path.exists(path):
+                self.entries.move_to_end(filename)
+                os.utime(path)
+                return path
+
+        with Image.open(file_path) as img:
+            if img.width <= width:
+                return None
+            height = max(1, round(img.height * width / img.width))
+            resized = img.resize((width, height), Image.Resampling.LANCZOS)
+
+        # Write to a temp file and rename so concurrent readers never see partial output
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        save_format = RESIZABLE_FORMATS[ext]
+        if save_format == 'JPEG':
+            resized.convert('RGB').save(tmp_path, save_format, quality=85, optimize=True)
+        else:
+            resized.save(tmp_path, save_format, optimize=True)
+        os.replace(tmp_path, path)
+
+        with self.lock:
+            size = os.path.getsize(path)
+            self.total_bytes -= self.entries.pop(filename, 0)
+            self.entries[filename] = size
+            self.total_bytes += size
+            self._evict()
+        return path
+
+    def _evict(self):
+        """Remove least recently used variants until under the size cap."""
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            filename, size = self.entries.popitem(last=False)
+            self.total_bytes -= size
+            try:
+                os.remove(os.path.join(self.cache_dir, filename))
+            except OSError:
+                pass
@@ -0,0 +1,228 @@
+"""
+Live Media Index for SCIP v3
+
+Keeps an in-memory index of the media library and scenario library/generated
+folders. The index is built with a single walk at startup and then kept
+current by an inotify watcher (via watchdog), so listing media never rescans
+the disk. Changes are fanned out to subscribers (the SSE endpoint) as
+"added" / "removed" events.
+"""
+
+import asyncio
+import os
+import threading
+from typing import Dict, List, Optional
+from PIL import Image
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+from media_variants import is_variant_file
+
+
+SUPPORTED_FORMATS = {'.jpg', '.jpeg', '.png', '.gif', '.svg'}
+
+MIME_TYPES = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.gif': 'image/gif',
+    '.svg': 'image/svg+xml'
+}
+
+
+class _IndexEventHandler(FileSystemEventHandler):
+    """Forwards watchdog events to the index."""
+
+    def __init__(self, index):
+        self.index = index
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.index.refresh(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.index.refresh(event.src_path)
+
+    def on_closed(self, event):
+        if not event.is_directory:
+            self.index.refresh(event.src_path)
+
+    def on_deleted(self, event):
+        if event.is_directory:
+            self.index.remove_tree(event.src_path)
+        else:
+            self.index.remove(event.src_path)
+
+    def on_moved(self, event):
+        if event.is_directory:
+            self.index.remove_tree(event.src_path)
+            self.index.scan(event.dest_path)
+        else:
+            self.index.remove(event.src_path)
+            self.index.refresh(event.dest_path)
+
+
+class MediaIndex:
+    """In-memory media listing kept current by a filesystem watcher."""
+
+    def __init__(self, media_dir: str, media_store=None):
+        """
+        Initialize an empty index.
+
+        Args:
+            media_dir: Root media directory (served at /api/media/)
+            media_store: Optional MediaStore used to report content hashes
+        """
+        self.media_dir = media_dir
+        self.media_store = media_store
+        self.entries: Dict[str, dict] = {}  # relative path -> media entry
+        self.lock = threading.Lock()
+        self.subscribers: List[asyncio.Queue] = []
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.observer = None
+
+    def is_indexed(self, rel_path: str) -> bool:
+        """
+        Check whether a path relative to the media root belongs in the listing.
+
+        Indexed locations are library/**, <scenario>/library/** and
+        <scenario>/generated/**; hidden files, temp files and variants are not.
+        """
+        parts = rel_path.split(os.sep)
+        if any(part.startswith('.') for part in parts):
+            return False
+        filename = parts[-1]
+        if os.path.splitext(filename)[1].lower() not in SUPPORTED_FORMATS or is_variant_file(filename):
+            return False
+        if parts[0] == "library":
+            return len(parts) > 1
+        return len(parts) > 2 and parts[1] in ("library", "generated")
+
+    def _build_entry(self, file_path: str, rel_path: str) -> dict:
+        filename = os.path.basename(file_path)
+        file_ext = os.path.splitext(filename)[1].lower()
+        stat = os.stat(file_path)
+
+        # Try to get image dimensions
+        width = None
+        height = None
+        if file_ext in {'.jpg', '.jpeg', '.png', '.gif'}:
+            try:
+                with Image.open(file_path) as img:
+                    width, height = img.size
+            except Exception as e:
+                # Usually a file still being written; a later event refreshes it
+                print(f"Could not read dimensions for {filename}: {e}")
+
+        return {
+            'filename': filename,
+            'path': f"/api/media/{rel_path}",
+            'sha256': self.media_store.lookup(file_path) if self.media_store else None,
+            'size': stat.st_size,
+            'width': width,
+            'height': height,
+            'modified': stat.st_mtime,
+            'mime_type': MIME_TYPES.get(file_ext, 'application/octet-stream')
+        }
+
+    def refresh(self, file_path: str):
+        """Add or update the entry for a file, publishing an event if it changed."""
+        rel_path = os.path.relpath(file_path, self.media_dir)
+        if not self.is_indexed(rel_path):
+            return
+        try:
+            entry = self._build_entry(file_path, rel_path)
+        except OSError:
+            # Vanished before we could stat it; a delete event follows
+            return
+        if entry['size'] == 0:
+            # Just created and not yet written; the close event refreshes it
+            return
+
+        with self.lock:
+            previous = self.entries.get(rel_path)
+            self.entries[rel_path] = entry
+        if previous != entry:
+            self._publish("added", entry)
+
+    def remove(self, file_path: str):
+        """Drop the entry for a file, publishing an event if it was indexed."""
+        rel_path = os.path.relpath(file_path, self.media_dir)
+        with self.lock:
+            entry = self.entries.pop(rel_path, None)
+        if entry:
+            self._publish("removed", entry)
+
+    def remove_tree(self, dir_path: str):
+        """Drop all entries under a directory."""
+        prefix = os.path.relpath(dir_path, self.media_dir) + os.sep
+        with self.lock:
+            removed = [rel for rel in self.entries if rel.startswith(prefix)]
+        for rel_path in removed:
+            self.remove(os.path.join(self.media_dir, rel_path))
+
+    def scan(self, directory: str):
+        """Index every file under a directory (used at startup and for moved-in trees)."""
+        for root, dirs, files in os.walk(directory):
+            dirs[:] = [d for d in dirs if not d.startswith('.')]
+            for filename in files:
+                self.refresh(os.path.join(root, filename))
+
+    def list(self) -> List[dict]:
+        """Get all indexed media sorted by filename."""
+        with self.lock:
+            media_files = list(self.entries.values())
+        media_files.sort(key=lambda x: x['filename'])
+        return media_files
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        """
+        Build the index and start watching the media directory.
+
+        Args:
+            loop: Event loop that subscriber queues belong to
+        """
+        self.loop = loop
+
+        # Watch before the initial walk so files written during the walk are not missed
+        self.observer = Observer()
+        self.observer.schedule(_IndexEventHandler(self), self.media_dir, recursive=True)
+        self.observer.daemon = True
+        self.observer.start()
+        self.scan(self.media_dir)
+        print(f"Media index: {len(self.entries)} files, watching {self.media_dir}")
+
+    def stop(self):
+        """Stop the filesystem watcher."""
+        if self.observer:
+            self.observer.stop()
+            self.observer.join(timeout=5)
+
+    def subscribe(self) -> asyncio.Queue:
+        """Register a subscriber queue for change events."""
+        queue = asyncio.Queue(maxsize=1000)
+        self.subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        """Remove a subscriber queue."""
+        if queue in self.subscribers:
+            self.subscribers.remove(queue)
+
+    def _publish(self, event_type: str, entry: dict):
+        """Hand an event to every subscriber on the event loop (called from the watcher thread)."""
+        if not self.loop or not self.subscribers:
+            return
+        event = {"type": event_type, "media": entry}
+        self.loop.call_soon_threadsafe(self._deliver, event)
+
+    def _deliver(self, event: dict):
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Subscriber is not keeping up: drop its backlog and tell it to refetch the listing
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"type": "resync"})
@@ -0,0 +1,137 @@
+"""
+Media Rendering Support for SCIP v3 Template Generation
+
+Serves library media to the headless browser used for template rendering.
+Templates reference images by URL on an internal origin; requests to that
+origin are fulfilled from a shared in-memory cache instead of embedding
+base64 data in the HTML, so page size no longer grows with image size.
+"""
+
+import os
+from urllib.parse import unquote
+from collections import OrderedDict
+from typing import Optional
+
+
+# Internal origin only resolvable inside the rendering browser
+MEDIA_ORIGIN = "http://media.render.internal"
+
+MIME_TYPES = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp',
+    '.svg': 'image/svg+xml'
+}
+
+
+class MediaCache:
+    """LRU cache of media file contents, invalidated when a file changes."""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        """
+        Initialize the cache.
+
+        Args:
+            max_bytes: Total size of cached file contents before eviction
+        """
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.entries = OrderedDict()  # file_path -> (mtime, size, data)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, file_path: str) -> Optional[bytes]:
+        """
+        Get file contents, reading from disk only on a miss or after a change.
+
+        Args:
+            file_path: Filesystem path of the media file
+
+        Returns:
+            File contents, or None if the file does not exist
+        """
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            self._evict(file_path)
+            return None
+
+        entry = self.entries.get(file_path)
+        if entry and entry[0] == stat.st_mtime and entry[1] == stat.st_size:
+            self.entries.move_to_end(file_path)
+            self.hits += 1
+            return entry[2]
+
+        self.misses += 1
+        with open(file_path, 'rb') as f:
+            data = f.read()
+
+        self._evict(file_path)
+        if len(data) <= self.max_bytes:
+            self.entries[file_path] = (stat.st_mtime, stat.st_size, data)
+            self.total_bytes += len(data)
+            while self.total_bytes > self.max_bytes:
+                _, (_, _, old) = self.entries.popitem(last=False)
+                self.total_bytes -= len(old)
+        return data
+
+    def _evict(self, file_path: str):
+        entry = self.entries.pop(file_path, None)
+        if entry:
+            self.total_bytes -= len(entry[2])
+
+
+# Shared across all renders in this process
+media_cache = MediaCache()
+
+
+def media_url(media_path: str) -> str:
+    """Map an /api/media/... path to its URL on the internal render origin."""
+    return f"{MEDIA_ORIGIN}{media_path}"
+
+
+def resolve_media_path(media_dir: str, media_path: str) -> Optional[str]:
+    """
+    Convert an /api/media/... path to a filesystem path inside media_dir.
+
+    Returns:
+        Filesystem path, or None if the path is invalid or escapes media_dir
+    """
+    if not media_path.startswith('/api/media/'):
+        return None
+
+    file_path = os.path.join(media_dir, media_path[11:])  # Remove '/api/media/'
+    real_media_dir = os.path.realpath(media_dir)
+    if not os.path.realpath(file_path).startswith(real_media_dir + os.sep):
+        return None
+    return file_path
+
+
+async def route_media(page, media_dir: str):
+    """
+    Serve media on the internal origin to a Playwright page.
+
+    Args:
+        page: Playwright page used for rendering
+        media_dir: Root media directory backing /api/media/
+    """
+    async def handle(route):
+        path = unquote(route.request.url[len(MEDIA_ORIGIN):].split('?')[0])
+        file_path = resolve_media_path(media_dir, path)
+        data = media_cache.get(file_path) if file_path else None
+
+        if data is None:
+            await route.fulfill(status=404, body="")
+            return
+
+        ext = os.path.splitext(file_path)[1].lower()
+        await route.fulfill(
+            status=200,
+            body=data,
+            content_type=MIME_TYPES.get(ext, 'application/octet-stream'),
+            headers={'Cache-Control': 'max-age=3600'}
+        )
+
+    await page.route(f"{MEDIA_ORIGIN}/**", handle)
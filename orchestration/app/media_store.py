@@ -0,0 +1,231 @@
+"""
+Content-Addressed Media Store for SCIP v3
+
+Stores media library uploads and generated output once per unique content,
+keyed by SHA-256. Human-readable paths under the media directory (e.g.
+library/alert.png) are kept as aliases: each alias is a hard link to its blob,
+so existing /api/media/... URLs keep working while identical content occupies
+disk space only once. Blobs are reference counted and removed when their last
+alias is deleted.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Iterable, Optional
+
+
+BLOB_DIR_NAME = ".blobs"
+
+
+class MediaStore:
+    """SHA-256 keyed blob store with an alias index and reference counts."""
+
+    def __init__(self, media_dir: str):
+        """
+        Initialize the store and load its index.
+
+        Args:
+            media_dir: Root media directory; aliases are paths relative to it
+        """
+        self.media_dir = media_dir
+        self.blob_dir = os.path.join(media_dir, BLOB_DIR_NAME)
+        self.index_path = os.path.join(self.blob_dir, "index.json")
+        self.lock = threading.RLock()
+
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self.aliases = {}  # alias -> sha256
+        self.blobs = {}    # sha256 -> {"ext", "size", "refs"}
+        self._load_index()
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, 'r') as f:
+                index = json.load(f)
+            self.aliases = index.get("aliases", {})
+            self.blobs = index.get("blobs", {})
+        except Exception as e:
+            print(f"Failed to load media store index, rebuilding: {e}")
+
+    def _save_index(self):
+        # Write-then-rename so a crash never leaves a truncated index
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"aliases": self.aliases, "blobs": self.blobs}, f)
+        os.replace(tmp_path, self.index_path)
+
+    def blob_path(self, sha: str) -> str:
+        """Filesystem path of a blob (sharded by the first two hex digits)."""
+        ext = self.blobs.get(sha, {}).get("ext", "")
+        return os.path.join(self.blob_dir, sha[:2], f"{sha}{ext}")
+
+    def blob_url(self, sha: str) -> str:
+        """Content-addressed /api/media/... URL of a blob (safe to cache forever)."""
+        rel_path = os.path.relpath(self.blob_path(sha), self.media_dir)
+        return f"/api/media/{rel_path}"
+
+    def alias_for(self, file_path: str) -> str:
+        """Alias key (path relative to the media directory) for a filesystem path."""
+        return os.path.relpath(file_path, self.media_dir)
+
+    def lookup(self, file_path: str) -> Optional[str]:
+        """Get the SHA-256 of an aliased file, or None if it is not in the store."""
+        with self.lock:
+            return self.aliases.get(self.alias_for(file_path))
+
+    def find_alias(self, sha: str, prefix: str = "") -> Optional[str]:
+        """
+        Find an existing alias for some content.
+
+        Args:
+            sha: SHA-256 of the content
+            prefix: Only consider aliases under this relative directory
+
+        Returns:
+            The first matching alias whose file still exists, or None
+        """
+        with self.lock:
+            for alias, alias_sha in self.aliases.items():
+                if alias_sha == sha and alias.startswith(prefix):
+                    if os.path.exists(os.path.join(self.media_dir, alias)):
+                        return alias
+        return None
+
+    def _write_blob(self, sha: str, ext: str, content: bytes):
+        """Create a blob from content if it does not exist yet."""
+        if sha not in self.blobs:
+            self.blobs[sha] = {"ext": ext, "size": len(content), "refs": 0}
+        path = self.blob_path(sha)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+
+    def _link_alias(self, alias: str, sha: str):
+        """Point an alias at a blob, replacing whatever the alias held before."""
+        alias_path = os.path.join(self.media_dir, alias)
+        previous = self.aliases.get(alias)
+
+        os.makedirs(os.path.dirname(alias_path), exist_ok=True)
+        tmp_path = f"{alias_path}.link"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        os.link(self.blob_path(sha), tmp_path)
+        os.replace(tmp_path, alias_path)
+
+        self.aliases[alias] = sha
+        self.blobs[sha]["refs"] += 1
+        if previous is not None:
+            self._release(previous)
+
+    def _release(self, sha: str):
+        """Drop one reference to a blob, deleting it when unreferenced."""
+        blob = self.blobs.get(sha)
+        if blob is None:
+            return
+        blob["refs"] -= 1
+        if blob["refs"] <= 0:
+            try:
+                os.remove(self.blob_path(sha))
+            except OSError:
+                pass
+            del self.blobs[sha]
+
+    def put(self, file_path: str, content: bytes) -> str:
+        """
+        Store content and alias it at file_path.
+
+        Args:
+            file_path: Filesystem path (inside the media directory) for the alias
+            content: File contents
+
+        Returns:
+            SHA-256 of the content
+        """
+        sha = hashlib.sha256(content).hexdigest()
+        ext = os.path.splitext(file_path)[1].lower()
+        with self.lock:
+            self._write_blob(sha, ext, content)
+            self._link_alias(self.alias_for(file_path), sha)
+            self._save_index()
+        return sha
+
+    def ingest(self, file_path: str) -> Optional[str]:
+        """
+        Move an existing file into the store, leaving a hard link in its place.
+
+        Returns:
+            SHA-256 of the file, or None if ingestion failed
+        """
+        try:
+            with open(file_path, 'rb') as f:
+                content = f.read()
+            return self.put(file_path, content)
+        except Exception as e:
+            print(f"Media store ingest failed for {file_path} (non-critical): {e}")
+            return None
+
+    def remove(self, file_path: str):
+        """
+        Delete an alias, reclaiming its blob once no other alias refers to it.
+
+        Files that were never stored are simply deleted.
+        """
+        alias = self.alias_for(file_path)
+        with self.lock:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            sha = self.aliases.pop(alias, None)
+            if sha is not None:
+                self._release(sha)
+                self._save_index()
+
+    def sync(self, directories: Iterable[str], extensions: set):
+        """
+        Reconcile the index with the filesystem.
+
+        Drops aliases whose files were removed or replaced outside the store,
+        ingests untracked files under the given directories, and recomputes
+        reference counts from the surviving aliases.
+
+        Args:
+            directories: Directories (inside the media directory) to scan
+            extensions: File extensions to ingest
+        """
+        with self.lock:
+            for alias, sha in list(self.aliases.items()):
+                alias_path = os.path.join(self.media_dir, alias)
+                blob_path = self.blob_path(sha)
+                if not (os.path.exists(alias_path) and os.path.exists(blob_path)
+                        and os.path.samefile(alias_path, blob_path)):
+                    del self.aliases[alias]
+
+            untracked = []
+            for directory in directories:
+                for root, dirs, files in os.walk(directory):
+                    for filename in files:
+                        path = os.path.join(root, filename)
+                        if (os.path.splitext(filename)[1].lower() in extensions
+                                and self.alias_for(path) not in self.aliases):
+                            untracked.append(path)
+
+            # Recount references; _release then drops each recount's extra one,
+            # deleting blobs no alias refers to any more
+            refs: Dict[str, int] = {}
+            for sha in self.aliases.values():
+                refs[sha] = refs.get(sha, 0) + 1
+            for sha in list(self.blobs):
+                self.blobs[sha]["refs"] = refs.get(sha, 0) + 1
+                self._release(sha)
+
+            for path in untracked:
+                self.ingest(path)
+            self._save_index()
+
+        print(f"Media store: {len(self.aliases)} aliases, {len(self.blobs)} blobs "
+              f"({sum(b['size'] for b in self.blobs.values()) / (1024 * 1024):.1f} MB)")
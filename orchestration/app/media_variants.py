@@ -0,0 +1,185 @@
+"""
+Media Variants for SCIP v3 Generated Media
+
+Post-processes rendered inject cards (breaking news, social, intelligence)
+into smaller, size-budgeted encodings so dashboards on constrained exercise
+networks can fetch the cheapest suitable image instead of the full PNG.
+"""
+
+import io
+import os
+from typing import Dict, List, Optional
+from PIL import Image
+
+
+# Variant filename suffixes (inserted before the extension of the original)
+QUANTIZED_SUFFIX = ".q.png"
+WEBP_SUFFIX = ".webp"
+THUMB_SUFFIX = ".thumb.webp"
+
+# Size budgets in bytes (override via environment for very slow links)
+QUANTIZED_BUDGET = int(os.getenv('MEDIA_QUANTIZED_BUDGET', 300 * 1024))
+WEBP_BUDGET = int(os.getenv('MEDIA_WEBP_BUDGET', 120 * 1024))
+THUMB_BUDGET = int(os.getenv('MEDIA_THUMB_BUDGET', 20 * 1024))
+THUMB_WIDTH = int(os.getenv('MEDIA_THUMB_WIDTH', 320))
+
+# Encoder search ladders, best quality first
+PALETTE_LADDER = [256, 128, 64, 32]
+WEBP_QUALITY_LADDER = [85, 75, 65, 50, 35]
+
+
+def is_variant_file(filename: str) -> bool:
+    """Check whether a filename is a derived variant rather than an original."""
+    return filename.endswith((QUANTIZED_SUFFIX, WEBP_SUFFIX))
+
+
+def variant_paths(file_path: str) -> Dict[str, str]:
+    """
+    Get the filesystem paths of all variants for an original image.
+
+    Args:
+        file_path: Path of the original PNG
+
+    Returns:
+        Dict mapping variant name to filesystem path
+    """
+    base = os.path.splitext(file_path)[0]
+    return {
+        'quantized': base + QUANTIZED_SUFFIX,
+        'webp': base + WEBP_SUFFIX,
+        'thumbnail': base + THUMB_SUFFIX
+    }
+
+
+def remove_variants(file_path: str):
+    """Delete any existing variants for an original image."""
+    for path in variant_paths(file_path).values():
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _encode_within_budget(img: Image.Image, encoder, ladder: list, budget: int) -> bytes:
+    """
+    Encode an image with each ladder setting until the result fits the budget.
+
+    Falls back to the smallest encoding if no setting fits.
+    """
+    smallest = None
+    for setting in ladder:
+        data = encoder(img, setting)
+        if len(data) <= budget:
+            return data
+        if smallest is None or len(data) < len(smallest):
+            smallest = data
+    return smallest
+
+
+def _encode_quantized_png(img: Image.Image, colors: int) -> bytes:
+    # FASTOCTREE is the only quantizer that supports RGBA input
+    method = Image.Quantize.FASTOCTREE if img.mode == 'RGBA' else Image.Quantize.MEDIANCUT
+    buf = io.BytesIO()
+    img.quantize(colors=colors, method=method).save(buf, format='PNG', optimize=True)
+    return buf.getvalue()
+
+
+def _encode_webp(img: Image.Image, quality: int) -> bytes:
+    buf = io.BytesIO()
+    img.save(buf, format='WEBP', quality=quality, method=6)
+    return buf.getvalue()
+
+
+def generate_variants(file_path: str, media_path: str) -> List[Dict]:
+    """
+    Emit quantized PNG, WebP and thumbnail variants next to an original image.
+
+    Variants that would not save bytes are skipped: the thumbnail when the
+    card is already no wider than THUMB_WIDTH, and any encoding no smaller
+    than the original or a larger tier.
+
+    Args:
+        file_path: Filesystem path of the rendered PNG
+        media_path: Public /api/media/... path of the same PNG
+
+    Returns:
+        List of variant descriptors sorted by size (smallest first), each with
+        variant name, public path, mime type, size and dimensions
+    """
+    paths = variant_paths(file_path)
+    media_base = os.path.splitext(media_path)[0]
+    variants = []
+
+    with Image.open(file_path) as original:
+        img = original.convert('RGBA' if original.mode in ('RGBA', 'LA', 'P') else 'RGB')
+        width, height = img.size
+
+        encodings = [
+            ('quantized', QUANTIZED_SUFFIX, 'image/png', img,
+             _encode_within_budget(img, _encode_quantized_png, PALETTE_LADDER, QUANTIZED_BUDGET)),
+            ('webp', WEBP_SUFFIX, 'image/webp', img,
+             _encode_within_budget(img, _encode_webp, WEBP_QUALITY_LADDER, WEBP_BUDGET))
+        ]
+
+        # A card no wider than a thumbnail would only get a copy of the WebP variant
+        thumb = img.copy()
+        thumb.thumbnail((THUMB_WIDTH, THUMB_WIDTH * height // max(width, 1)), Image.Resampling.LANCZOS)
+        if thumb.size != img.size:
+            encodings.append(('thumbnail', THUMB_SUFFIX, 'image/webp', thumb,
+                              _encode_within_budget(thumb, _encode_webp, WEBP_QUALITY_LADDER, THUMB_BUDGET)))
+
+    # Each tier must undercut the original and every larger tier kept, or it is not worth fetching
+    smallest = os.path.getsize(file_path)
+    kept = set()
+    for name, suffix, mime_type, source, data in encodings:
+        if len(data) >= smallest:
+            continue
+        smallest = len(data)
+        kept.add(name)
+        with open(paths[name], 'wb') as f:
+            f.write(data)
+        variants.append({
+            'variant': name,
+            'path': media_base + suffix,
+            'mime_type': mime_type,
+            'size': len(data),
+            'width': source.width,
+            'height': source.height
+        })
+
+    # Leftovers from an earlier render would otherwise be stored and served
+    for name, path in paths.items():
+        if name not in kept and os.path.exists(path):
+            os.remove(path)
+
+    variants.sort(key=lambda v: v['size'])
+    return variants
+
+
+def attach_variants(inject: dict, file_path: str, media_path: str) -> Optional[List[Dict]]:
+    """
+    Generate variants for a rendered image and record them on the inject.
+
+    Variants are stored under inject['media_variants'][media_path] so they
+    travel with the inject to dashboards. Failures are logged and leave the
+    original media untouched.
+
+    Returns:
+        The variant list, or None if post-processing failed
+    """
+    media_variants = inject.get('media_variants', {})
+    # Drop entries for media that is no longer attached to the inject
+    media_variants = {k: v for k, v in media_variants.items() if k in inject.get('media', [])}
+
+    try:
+        variants = generate_variants(file_path, media_path)
+    except Exception as e:
+        print(f"Variant generation failed for {media_path} (non-critical): {e}")
+        media_variants.pop(media_path, None)
+        variants = None
+    else:
+        media_variants[media_path] = variants
+
+    if media_variants:
+        inject['media_variants'] = media_variants
+    else:
+        inject.pop('media_variants', None)
+    return variants
@@ -0,0 +1,285 @@
+import math
+from collections import deque
+import numpy as np
+
+SPEED_OF_LIGHT = 3e8  # m/s
+DEFAULT_RAMP_S = 0.05  # how long gains and Doppler take to move to new settings
+MAX_DOPPLER_FRACTION = 0.4  # Doppler limit as a fraction of the sample rate (kept clear of fs/2)
+
+# Link settings with everything disabled (the reference simulator's config layout)
+DEFAULT_CHANNEL = {
+    "path_loss": {"enabled": False, "distance_m": None, "frequency_hz": None, "reference_distance_m": None},
+    "awgn": {"enabled": False, "snr_db": 20.0},
+    "atmosphere": {"enabled": False, "rain_fade_db": 0.0},
+    "doppler": {"enabled": False, "shift_hz": 0.0, "rate_hz_s": 0.0},
+}
+
+
+def free_space_loss_db(distance_m, frequency_hz):
+    """Free-space path loss (4 pi d / lambda)^2, in dB"""
+    return 20 * math.log10(4 * math.pi * distance_m * frequency_hz / SPEED_OF_LIGHT)
+
+
+class _Ramp:
+    """A setting that moves linearly to its target at a fixed rate per sample, then holds it"""
+
+    def __init__(self, value):
+        self.value = value
+        self.target = value
+        self.step = 0.0
+
+    @property
+    def moving(self):
+        return self.value != self.target
+
+    def set(self, target, ramp_samples):
+        self.target = target
+        self.step = abs(target - self.value) / max(1, ramp_samples)
+
+    def fill(self, out, steps):
+        """Write the values at the next len(out) samples into out and move on
+
+        steps holds 1, 2, 3, ... (in out's dtype); the target is held from
+        the sample it is reached, so a ramp lands on its exact sample
+        whatever the chunking.
+        """
+        n = len(out)
+        delta = self.target - self.value
+        np.multiply(steps[:n], self.step, out=out)
+        np.minimum(out, abs(delta), out=out)
+        if delta < 0:
+            np.negative(out, out=out)
+        out += self.value
+        if self.step * n >= abs(delta):
+            self.value = self.target
+        else:
+            self.value += math.copysign(self.step * n, delta)
+        return out
+
+
+class ChannelEffects:
+    """Streaming link model for the main recording: path loss, rain fade, Doppler and AWGN.
+
+    A chunked port of the channel simulator's ChannelEffects (reference
+    rf-range scripts), which processes whole files in RAM. Here every
+    effect carries its state across chunks: the Doppler oscillator's phase
+    runs on from chunk to chunk, and gain and Doppler changes move linearly
+    over ramp_s instead of stepping, so link conditions can change while
+    the stream plays. Doppler may also drift at rate_hz_s (a pass); shift
+    and drift are bounded at +/- MAX_DOPPLER_FRACTION of the sample rate,
+    where a drift stops.
+
+    Unlike the file simulator, noise is added last and referenced to the
+    clear-sky signal (after path loss, before rain fade), so a fade lowers
+    the SNR as it would at a real receiver. The reference signal power is
+    the running estimate the mixer keeps of the recording.
+
+    Path loss is free-space loss at distance_m and frequency_hz (default:
+    the stream's centre frequency). With reference_distance_m it is relative
+    instead: the recording is taken as received at that distance, and only
+    the extra loss is applied, which keeps realistic ranges audible.
+
+    configure() may be called from any thread; it only queues the new
+    settings for the DSP thread, which applies them in process().
+    Steady-state processing writes into preallocated buffers only.
+    """
+
+    def __init__(self, sample_rate, center_freq=None, max_samples=16384):
+        self.sample_rate = sample_rate
+        self.center_freq = center_freq
+        self.max_doppler_hz = MAX_DOPPLER_FRACTION * sample_rate
+        self.settings = self.defaults()
+        self.inbox = deque()
+        self.rng = np.random.default_rng()
+
+        # DSP thread state
+        self.path_gain = _Ramp(1.0)
+        self.fade_gain = _Ramp(1.0)
+        self.doppler = _Ramp(0.0)
+        self.doppler_rate = 0.0  # Hz per second
+        self.phase = 0.0
+        self.snr = None  # linear, None = no noise
+        self._allocate(max_samples)
+
+    def _allocate(self, max_samples):
+        self.max_samples = max_samples
+        self._steps = np.arange(1, max_samples + 1, dtype=np.float64)
+        self._steps32 = self._steps.astype(np.float32)
+        self._freq = np.empty(max_samples, dtype=np.float64)
+        self._phase = np.empty(max_samples, dtype=np.float64)
+        self._trig = np.empty(max_samples, dtype=np.float64)
+        self._rotator = np.empty(max_samples, dtype=np.complex64)
+        self._noise = np.empty(max_samples, dtype=np.complex64)
+        self._gains = np.empty(max_samples, dtype=np.float32)
+        self._fade = np.empty(max_samples, dtype=np.float32)
+
+    # --- control (any thread) ---
+
+    def configure(self, changes, ramp_s=DEFAULT_RAMP_S):
+        """
+        Merge changes into the link settings and queue them for the DSP thread
+
+        changes uses the reference config layout, e.g. {"atmosphere":
+        {"enabled": true, "rain_fade_db": 6}}; sections and keys left out
+        keep their current values. Raises ValueError on bad settings.
+        """
+        settings = {key: dict(value) for key, value in self.settings.items()}
+        for section, values in changes.items():
+            if section not in settings or not isinstance(values, dict):
+                raise ValueError(f"Unknown channel effect: {section}")
+            for key, value in values.items():
+                if key not in settings[section]:
+                    raise ValueError(f"Unknown {section} setting: {key}")
+                settings[section][key] = bool(value) if key == "enabled" else (
+                    None if value is None else float(value))
+
+        path = settings["path_loss"]
+        path_loss_db = 0.0
+        if path["enabled"]:
+            frequency = path["frequency_hz"] or self.center_freq
+            if not path["distance_m"] or path["distance_m"] <= 0 or not frequency:
+                raise ValueError("Path loss needs a positive distance_m and frequency_hz")
+            path_loss_db = free_space_loss_db(path["distance_m"], frequency)
+            if path["reference_distance_m"]:
+                path_loss_db -= free_space_loss_db(path["reference_distance_m"], frequency)
+
+        atmosphere = settings["atmosphere"]
+        fade_db = atmosphere["rain_fade_db"] if atmosphere["enabled"] else 0.0
+        awgn = settings["awgn"]
+        snr = 10 ** (awgn["snr_db"] / 10) if awgn["enabled"] else None
+        doppler = settings["doppler"]
+        shift_hz, rate_hz_s = (doppler["shift_hz"], doppler["rate_hz_s"]) if doppler["enabled"] else (0.0, 0.0)
+        if abs(shift_hz) > self.max_doppler_hz:
+            raise ValueError(f"Doppler shift beyond the {self.max_doppler_hz:g} Hz limit")
+
+        self.settings = settings
+        self.inbox.append((10 ** (-path_loss_db / 20), 10 ** (-fade_db / 20), snr, shift_hz, rate_hz_s,
+                           int(round(float(ramp_s) * self.sample_rate))))
+        return settings
+
+    @staticmethod
+    def defaults():
+        """Settings with every effect disabled"""
+        return {key: dict(value) for key, value in DEFAULT_CHANNEL.items()}
+
+    # --- DSP thread ---
+
+    def _drain(self):
+        while self.inbox:
+            path_gain, fade_gain, snr, shift_hz, rate_hz_s, ramp = self.inbox.popleft()
+            self.path_gain.set(path_gain, ramp)
+            self.fade_gain.set(fade_gain, ramp)
+            self.doppler.set(shift_hz, ramp)
+            self.doppler_rate = rate_hz_s
+            self.snr = snr
+            print(f"📡 Channel: {20 * math.log10(path_gain * fade_gain):+.1f} dB, "
+                  f"Doppler {shift_hz:+g} Hz" + (f" ({rate_hz_s:+g} Hz/s)" if rate_hz_s else "")
+                  + (f", SNR {10 * math.log10(snr):g} dB" if snr is not None else ""))
+
+    @property
+    def shifting(self):
+        """True while the Doppler oscillator is off zero, gliding or drifting"""
+        return bool(self.doppler.value or self.doppler.moving or self.doppler_rate)
+
+    @property
+    def transparent(self):
+        """True while the channel leaves the recording untouched (up to a constant phase)"""
+        return (self.path_gain.value == self.fade_gain.value == 1.0 and not self.shifting
+                and not (self.path_gain.moving or self.fade_gain.moving) and self.snr is None)
+
+    def _apply_gain(self, out, signal, rotation):
+        """out = signal times the path and fade gains (per sample while either is moving) and rotation"""
+        n = len(out)
+        if not (self.path_gain.moving or self.fade_gain.moving):
+            gain = self.path_gain.value * self.fade_gain.value
+            if rotation == 1.0:
+                np.multiply(signal, np.float32(gain), out=out)
+            else:
+                np.multiply(signal, np.complex64(gain * rotation), out=out)
+            return
+        gains = self.path_gain.fill(self._gains[:n], self._steps32)
+        if self.fade_gain.moving:
+            gains *= self.fade_gain.fill(self._fade[:n], self._steps32)
+        else:
+            gains *= np.float32(self.fade_gain.value)
+        np.multiply(signal, gains, out=out)
+        if rotation != 1.0:
+            out *= np.complex64(rotation)
+
+    def _apply_doppler(self, out):
+        """Multiply out by the Doppler oscillator, phase-continuous from the last chunk"""
+        n = len(out)
+        w = 2 * math.pi / self.sample_rate
+        if not (self.doppler.moving or self.doppler_rate):
+            # Steady shift
+            f = self.doppler.value
+            phase = self._phase[:n]
+            np.multiply(self._steps[:n], w * f, out=phase)
+            phase += self.phase - w * f
+            self.phase = (self.phase + w * f * n) % (2 * math.pi)
+        else:
+            # Per-sample frequency: glide towards the target, plus any drift
+            freq = self.doppler.fill(self._freq[:n], self._steps)
+            phase = self._phase[:n]
+            if self.doppler_rate:
+                drift = self.doppler_rate / self.sample_rate
+                np.multiply(self._steps[:n], drift, out=phase)
+                freq += phase
+                # Drift stops at the Doppler limit rather than running on towards fs/2
+                limit = self.max_doppler_hz
+                np.minimum(freq, limit, out=freq)
+                np.maximum(freq, -limit, out=freq)
+                self.doppler.value = min(max(self.doppler.value + drift * n, -limit), limit)
+                self.doppler.target = min(max(self.doppler.target + drift * n, -limit), limit)
+                if abs(self.doppler.target) == limit:
+                    self.doppler_rate = 0.0
+                    print(f"📡 Doppler drift stopped at the {self.doppler.target:+g} Hz limit")
+            # phase(k) = phase + w * (freq(0) + ... + freq(k - 1))
+            np.add.accumulate(freq, out=phase)
+            phase -= freq
+            phase *= w
+            phase += self.phase
+            self.phase = float(phase[-1] + w * freq[-1]) % (2 * math.pi)
+
+        # cos/sin in float64 first: a ufunc casting into the strided float32
+        # view would allocate a conversion buffer on every call
+        rotator = self._rotator[:n]
+        parts = rotator.view(np.float32)
+        trig = self._trig[:n]
+        np.copyto(parts[0::2], np.cos(phase, out=trig), casting='same_kind')
+        np.copyto(parts[1::2], np.sin(phase, out=trig), casting='same_kind')
+        out *= rotator
+
+    def process(self, signal, out, signal_power):
+        """
+        Pass the next chunk of the recording through the link
+
+        Returns out holding the result, or signal itself while the channel
+        is transparent. signal_power is the recording's mean power.
+        """
+        self._drain()
+        if self.transparent:
+            # Nothing left but the oscillator's last phase: drop it along with the rest
+            self.phase = 0.0
+            return signal
+        n = len(signal)
+        if n > self.max_samples:
+            self._allocate(n)
+
+        out = out[:n]
+        if self.shifting:
+            self._apply_gain(out, signal, 1.0)
+            self._apply_doppler(out)
+        else:
+            # Doppler back at zero: hold its last phase, folded into the gain as one complex scalar
+            self._apply_gain(out, signal, complex(math.cos(self.phase), math.sin(self.phase)))
+
+        if self.snr is not None:
+            # Receiver noise against the clear-sky signal; sigma per I/Q component
+            sigma = math.sqrt(signal_power * self.path_gain.value ** 2 / self.snr / 2)
+            noise = self._noise[:n]
+            interleaved = noise.view(np.float32)
+            self.rng.standard_normal(len(interleaved), dtype=np.float32, out=interleaved)
+            interleaved *= np.float32(sigma)
+            out += noise
+        return out
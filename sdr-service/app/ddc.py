@@ -0,0 +1,112 @@
+import numpy as np
+from fractions import Fraction
+from numpy.lib.stride_tricks import sliding_window_view
+from jammers import tone_jammer
+
+class PolyphaseResampler:
+    """Streaming rational resampler (up/down) using a polyphase FIR bank.
+
+    The lowpass prototype is designed once at the upsampled rate and split
+    into `up` phases, so each output sample costs taps_per_phase multiplies
+    and nothing is ever computed for the zero-stuffed or discarded samples.
+    Filter history and the fractional output phase carry across chunks, so
+    the output is seamless however the input is chunked.
+    """
+
+    def __init__(self, up, down, taps_per_phase=24):
+        self.up = up
+        self.down = down
+        self.taps = taps_per_phase
+
+        # Windowed-sinc prototype at the upsampled rate, cut off at the
+        # narrower of the two Nyquist bands (with a little transition room)
+        num_taps = up * taps_per_phase
+        cutoff = 0.45 / max(up, down)
+        n = np.arange(num_taps) - (num_taps - 1) / 2
+        prototype = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(num_taps, 8.0)
+        prototype *= up / prototype.sum()
+
+        # bank[p] holds phase p's taps, reversed to line up with input windows
+        # (complex64 so matmul never casts the window views)
+        self.bank = prototype.reshape(taps_per_phase, up).T[:, ::-1].astype(np.complex64)
+
+        # Input history (taps_per_phase - 1 samples) followed by the current chunk
+        self._extended = np.zeros(taps_per_phase - 1, dtype=np.complex64)
+        self._out = np.empty(0, dtype=np.complex64)
+        self.next_m = 0  # upsampled-time index of the next output, relative to chunk start
+
+    def process(self, chunk):
+        """Resample a chunk; the result may be a reused buffer"""
+        n = len(chunk)
+        keep = self.taps - 1
+        if len(self._extended) < keep + n:
+            extended = np.empty(keep + n, dtype=np.complex64)
+            extended[:keep] = self._extended[:keep]
+            self._extended = extended
+        extended = self._extended[:keep + n]
+        extended[keep:] = chunk
+
+        # Output k sits at upsampled time m = next_m + k * down. Outputs
+        # k, k + up, k + 2 up, ... share one filter phase and their input
+        # windows start down samples apart, so each phase group is one
+        # matrix-vector product over a strided view (no gather)
+        count = max(0, -(-(n * self.up - self.next_m) // self.down))
+        if len(self._out) < count:
+            self._out = np.empty(count, dtype=np.complex64)
+        out = self._out[:count]
+        windows = sliding_window_view(extended, self.taps)
+        for first in range(min(self.up, count)):
+            m = self.next_m + first * self.down
+            base, phase = divmod(m, self.up)
+            group = out[first::self.up]
+            np.matmul(windows[base::self.down][:len(group)], self.bank[phase], out=group)
+
+        self.next_m += count * self.down - n * self.up
+        extended[:keep] = extended[n:]
+        return out
+
+
+class DownConverter:
+    """Digital down-converter: NCO frequency shift, gain, then resampling.
+
+    Translates the band around offset_hz (relative to the recording's
+    center) to baseband and resamples it to output_rate, emulating a tuner
+    retuned within the recording's bandwidth.
+    """
+
+    def __init__(self, input_rate, offset_hz=0.0, output_rate=None, gain=1.0):
+        self.input_rate = input_rate
+        self.offset_hz = offset_hz
+        self.output_rate = output_rate or input_rate
+        self.gain = gain
+
+        # Phase-continuous NCO (same table/rotation scheme as the jammers)
+        self.nco = tone_jammer(input_rate, -offset_hz, amplitude=1.0) if offset_hz else None
+
+        ratio = Fraction(self.output_rate / input_rate).limit_denominator(1024)
+        self.resampler = (PolyphaseResampler(ratio.numerator, ratio.denominator)
+                          if ratio != 1 else None)
+
+        self._mixed = np.empty(0, dtype=np.complex64)
+
+    @property
+    def passthrough(self):
+        return self.nco is None and self.resampler is None and self.gain == 1.0
+
+    def process(self, chunk):
+        """Down-convert a chunk; the result may be a reused buffer"""
+        n = len(chunk)
+        if len(self._mixed) < n:
+            self._mixed = np.empty(n, dtype=np.complex64)
+        mixed = self._mixed[:n]
+
+        if self.nco is not None:
+            # NCO output already carries the gain
+            self.nco.generate(mixed, self.gain)
+            np.multiply(mixed, chunk, out=mixed)
+        else:
+            np.multiply(chunk, np.float32(self.gain), out=mixed)
+
+        if self.resampler is not None:
+            return self.resampler.process(mixed)
+        return mixed
@@ -0,0 +1,176 @@
+import asyncio
+import signal
+import sys
+import numpy as np
+from iq_player import IQPlayer
+from signal_mixer import SignalMixer
+from mqtt_handler import MQTTHandler
+from pacer import StreamPacer
+from iq_convert import RTLConverter
+from ddc import DownConverter
+from spectrum import SpectrumAnalyzer
+from recorder import IQRecorder
+
+class RingSink:
+    """Stream loop output stage: one down-converted frame per tuned channel.
+
+    Follows the ring's tuning table: each active channel gets a
+    DownConverter (skipped entirely for an untuned full-band channel), and
+    its output is converted straight into a FrameRing slot.
+    """
+
+    def __init__(self, ring, sample_rate, quantizer="arith"):
+        self.ring = ring
+        self.sample_rate = sample_rate
+        self.converter = RTLConverter(ring.slot_bytes // 2, quantizer=quantizer)
+        self.tuning_seq = -1
+        self.channels = {}  # channel -> ((offset_hz, output_rate, gain, generation), DownConverter)
+
+    def _sync_tuning(self):
+        update = self.ring.read_tuning(self.tuning_seq)
+        if update is None:
+            return
+        self.tuning_seq, table = update
+
+        channels = {}
+        for channel, params in table.items():
+            current = self.channels.get(channel)
+            if current and current[0] == params:
+                # Unchanged: keep its NCO phase and filter state
+                channels[channel] = current
+                continue
+            offset_hz, output_rate, gain, _ = params
+            ddc = DownConverter(self.sample_rate, offset_hz, output_rate or self.sample_rate, gain)
+            channels[channel] = (params, ddc)
+            print(f"🎛️ Channel {channel}: offset {offset_hz / 1e3:+.1f} kHz, "
+                  f"{ddc.output_rate / 1e6:.3f} MS/s, gain {20 * np.log10(max(gain, 1e-10)):+.1f} dB")
+        self.channels = channels
+
+    async def broadcast_samples(self, iq_chunk):
+        if iq_chunk is None:
+            return
+        self._sync_tuning()
+
+        # With nobody connected there are no channels and nothing to compute
+        for channel, (params, ddc) in self.channels.items():
+            samples = iq_chunk if ddc.passthrough else ddc.process(iq_chunk)
+            if not len(samples):
+                continue
+            slot = self.ring.slot_for_write()
+            frame = self.converter.convert(samples, out=slot)
+            # Stamped with the tuning it was made for, so the server can drop it if the channel moved on
+            self.ring.publish(len(frame), channel, params[3])
+
+
+async def stream_loop(iq_player, signal_mixer, sink, pacer, spectrum=None, recorder=None):
+    """Main streaming loop"""
+    while True:
+        # Get chunk from player
+        chunk = await iq_player.get_chunk(pacer.chunk_size)
+
+        if chunk is None:
+            # Paused/stopped: start a fresh schedule when playback resumes
+            pacer.reset()
+            continue
+
+        # Mix in jamming if active
+        mixed_chunk = signal_mixer.mix_signals(chunk)
+
+        # Hand the finished frame to the rtl_tcp server process
+        await sink.broadcast_samples(mixed_chunk)
+
+        # Spectrum rows for the dashboards, from the same mixed stream
+        if spectrum is not None:
+            spectrum.process(mixed_chunk)
+
+        # After-action recording of exactly what was streamed (only copies; a thread writes)
+        if recorder is not None:
+            recorder.write(mixed_chunk)
+
+        # Sleep until this chunk is due; processing time is already accounted for
+        to_drop = await pacer.wait(len(chunk))
+        if to_drop:
+            iq_player.skip(to_drop)
+
+
+async def _worker_main(ring, config):
+    iq_player = IQPlayer(config["iq_file"], config["sample_rate"])
+    signal_mixer = SignalMixer(config["sample_rate"], config["chunk_size"], config["signal_power_tau"],
+                               config["center_freq"])
+    recorder = None
+    if config["record_dir"]:
+        recorder = IQRecorder(
+            config["record_dir"], config["sample_rate"], config["center_freq"], config["record_prefix"],
+            config["record_format"], config["record_rotate_mb"] * 1024 * 1024, config["record_rotate_s"]
+        )
+        # Jamming episodes become annotations in the recording's SigMF metadata
+        signal_mixer.timeline.listener = recorder.jamming_changed
+    mqtt = MQTTHandler(iq_player, signal_mixer, config["mqtt_topic"], recorder)
+    pacer = StreamPacer(config["sample_rate"], config["chunk_size"],
+                        config["pacing_policy"], config["max_lag"])
+    sink = RingSink(ring, config["sample_rate"], config["quantizer"])
+
+    # Start MQTT (control commands act on this process's player and mixer)
+    mqtt.start(config["mqtt_host"])
+
+    spectrum = None
+    if config["spectrum_rate"] > 0:
+        topic = config["spectrum_topic"]
+        spectrum = SpectrumAnalyzer(
+            config["sample_rate"],
+            lambda row: mqtt.client.publish(topic, row, qos=0),
+            config["spectrum_fft_size"], config["spectrum_overlap"], config["spectrum_rate"],
+            config["spectrum_db_min"], config["spectrum_db_max"]
+        )
+        # Retained, so a dashboard that subscribes later still knows the row format
+        mqtt.client.publish(f"{topic}/meta", spectrum.metadata(config["center_freq"]), qos=1, retain=True)
+        print(f"📈 Spectrum: {spectrum.fft_size} bins @ {spectrum.rate:g} rows/s on {topic}")
+
+    # Scenario RF environment beyond the main recording
+    if config["scene_sources"]:
+        signal_mixer.scene.load(config["scene_sources"])
+
+    # Scenario link conditions, in place from the first sample
+    if config["channel_effects"]:
+        channel = dict(config["channel_effects"])
+        signal_mixer.set_channel(channel, channel.pop("ramp_s", 0))
+
+    # Scenario jamming timeline, keyed to stream time from the first sample
+    if config["jamming_schedule"]:
+        signal_mixer.load_schedule(config["jamming_schedule"])
+
+    # Scenario cue: start offset, playback rate and A/B loop region
+    playback = config["playback"]
+    if playback.get("start") is not None:
+        iq_player.seek(playback["start"])
+    if playback.get("speed") is not None:
+        iq_player.set_speed(playback["speed"])
+    if playback.get("loop"):
+        iq_player.set_loop(*playback["loop"])
+
+    if recorder is not None and config["record_on_start"]:
+        recorder.start()
+
+    # Auto-start playback
+    iq_player.play()
+
+    try:
+        await stream_loop(iq_player, signal_mixer, sink, pacer, spectrum, recorder)
+    finally:
+        # Stopping the service must not lose the file being recorded
+        if recorder is not None:
+            recorder.close()
+
+
+def run_dsp_worker(ring, config):
+    """
+    DSP producer process entry point
+
+    Owns playback, jamming, pacing, per-channel down-conversion and uint8
+    conversion, so none of it runs on the event loop that serves the rtl_tcp
+    sockets.
+    """
+    print("⚙️ DSP worker started")
+    # The parent terminates us on shutdown: unwind so the recorder can flush
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    asyncio.run(_worker_main(ring, config))
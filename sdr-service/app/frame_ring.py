@@ -0,0 +1,170 @@
+import os
+import numpy as np
+from multiprocessing import shared_memory
+
+# Header words (uint64)
+_WRITE_SEQ = 0       # frames published so far (next sequence number to write)
+_TUNING_SEQ = 1      # tuning table seqlock: odd while the server is rewriting it
+_HEADER_WORDS = 8
+
+# Tuning table columns (float64), one row per channel
+_ACTIVE, _OFFSET_HZ, _OUTPUT_RATE, _GAIN, _GENERATION = range(5)
+_COLUMNS = 5
+
+class FrameRing:
+    """Single-producer, single-consumer ring of byte frames in shared memory.
+
+    The DSP worker writes finished rtl_tcp frames into fixed-size slots and
+    publishes them by bumping a sequence counter; the server process copies
+    them out. There is no lock: a reader validates each copy by re-checking
+    the sequence counter afterwards, and a reader that falls more than a ring
+    behind skips ahead to the oldest frame still intact.
+
+    New frames are signalled through a non-blocking pipe (the "doorbell") so
+    the server's event loop can wait on it with add_reader instead of polling.
+
+    A small tuning table travels the other way: the server assigns each
+    distinct client tuning (frequency offset, sample rate, gain) a channel
+    row, and the worker produces one frame per active channel per chunk,
+    tagged with the channel index and the row's generation. Every rewrite
+    of a row bumps its generation, so when a freed index is handed to a new
+    tuning, frames still in the ring from the old one can be recognised and
+    dropped instead of reaching the new client.
+
+    Created in the server process before the worker is forked; the worker
+    inherits the mapping and the pipe.
+    """
+
+    def __init__(self, slots=64, slot_bytes=2 * 16384, max_channels=8):
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.max_channels = max_channels
+
+        header_bytes = _HEADER_WORDS * 8
+        table_bytes = max_channels * _COLUMNS * 8
+        meta_bytes = 3 * slots * 8
+        self.shm = shared_memory.SharedMemory(
+            create=True, size=header_bytes + table_bytes + meta_bytes + slots * slot_bytes
+        )
+        buf = self.shm.buf
+        offset = 0
+        self.header = np.ndarray(_HEADER_WORDS, dtype=np.uint64, buffer=buf)
+        offset += header_bytes
+        self.tuning = np.ndarray((max_channels, _COLUMNS), dtype=np.float64, buffer=buf, offset=offset)
+        offset += table_bytes
+        self.lengths = np.ndarray(slots, dtype=np.uint64, buffer=buf, offset=offset)
+        self.channel_ids = np.ndarray(slots, dtype=np.uint64, buffer=buf, offset=offset + slots * 8)
+        self.generations = np.ndarray(slots, dtype=np.uint64, buffer=buf, offset=offset + 2 * slots * 8)
+        offset += meta_bytes
+        self.data = np.ndarray((slots, slot_bytes), dtype=np.uint8, buffer=buf, offset=offset)
+        self.header[:] = 0
+        self.tuning[:] = 0
+
+        self.doorbell_read, self.doorbell_write = os.pipe()
+        os.set_blocking(self.doorbell_read, False)
+        os.set_blocking(self.doorbell_write, False)
+
+        # Reader state (server process only)
+        self.read_seq = 0
+        self.frames_lost = 0
+
+    # --- tuning table ---
+
+    def set_channel(self, index, offset_hz=0.0, output_rate=0.0, gain=1.0, active=True):
+        """Server side: (re)define a channel row; output_rate 0 means the input rate
+
+        Returns:
+            The row's new generation
+        """
+        generation = self.generation(index) + 1
+        seq = int(self.header[_TUNING_SEQ])
+        self.header[_TUNING_SEQ] = seq + 1  # odd: table in flux
+        self.tuning[index] = (1.0 if active else 0.0, offset_hz, output_rate, gain, generation)
+        self.header[_TUNING_SEQ] = seq + 2
+        return generation
+
+    def generation(self, index):
+        """Server side: current generation of a channel row"""
+        return int(self.tuning[index, _GENERATION])
+
+    def clear_channel(self, index):
+        self.set_channel(index, active=False)
+
+    def read_tuning(self, since_seq):
+        """
+        Worker side: snapshot the tuning table if it changed since since_seq.
+
+        Returns:
+            (seq, {channel: (offset_hz, output_rate, gain, generation)}) or
+            None if the table is unchanged or mid-update (try again next chunk)
+        """
+        seq = int(self.header[_TUNING_SEQ])
+        if seq == since_seq or seq % 2:
+            return None
+        table = self.tuning.copy()
+        if int(self.header[_TUNING_SEQ]) != seq:
+            return None
+        channels = {index: (row[_OFFSET_HZ], row[_OUTPUT_RATE], row[_GAIN], int(row[_GENERATION]))
+                    for index, row in enumerate(table) if row[_ACTIVE]}
+        return seq, channels
+
+    # --- producer side (DSP worker) ---
+
+    def slot_for_write(self):
+        """Buffer for the next frame; fill it, then call publish()"""
+        return self.data[int(self.header[_WRITE_SEQ]) % self.slots]
+
+    def publish(self, num_bytes, channel=0, generation=0):
+        """Publish the frame written into slot_for_write() and ring the doorbell"""
+        seq = int(self.header[_WRITE_SEQ])
+        self.lengths[seq % self.slots] = num_bytes
+        self.channel_ids[seq % self.slots] = channel
+        self.generations[seq % self.slots] = generation
+        self.header[_WRITE_SEQ] = seq + 1
+        try:
+            os.write(self.doorbell_write, b'\0')
+        except BlockingIOError:
+            # Pipe full: the reader has plenty of wake-ups pending already
+            pass
+
+    # --- consumer side (server) ---
+
+    def drain_doorbell(self):
+        try:
+            while os.read(self.doorbell_read, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def read_frames(self):
+        """Copy out every (channel, generation, frame) published since the last call, oldest first"""
+        frames = []
+        write_seq = int(self.header[_WRITE_SEQ])
+
+        if write_seq - self.read_seq >= self.slots:
+            # Fell a whole ring behind: skip to the oldest slot not being rewritten
+            skip_to = write_seq - self.slots + 1
+            self.frames_lost += skip_to - self.read_seq
+            self.read_seq = skip_to
+
+        while self.read_seq < write_seq:
+            slot = self.read_seq % self.slots
+            channel = int(self.channel_ids[slot])
+            generation = int(self.generations[slot])
+            frame = self.data[slot, :int(self.lengths[slot])].tobytes()
+            # The producer may have lapped us during the copy; if so the frame is torn
+            if int(self.header[_WRITE_SEQ]) - self.read_seq >= self.slots:
+                self.frames_lost += 1
+            else:
+                frames.append((channel, generation, frame))
+            self.read_seq += 1
+
+        return frames
+
+    def close(self, unlink=False):
+        self.header = self.tuning = self.lengths = self.channel_ids = self.generations = self.data = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+            os.close(self.doorbell_read)
+            os.close(self.doorbell_write)
@@ -0,0 +1,124 @@
+import numpy as np
+
+class RTLConverter:
+    """complex64 -> rtl_tcp uint8 conversion into reused buffers.
+
+    A complex64 array viewed as float32 is already I/Q interleaved, so the
+    whole conversion is scale + offset + saturating clip + cast over one flat
+    buffer, with no per-chunk temporaries. Values are clipped to 0..255
+    instead of wrapping around on overflow.
+
+    The default scale/offset (128, 127.4) invert the uint8 -> float mapping
+    used by rtl_tcp clients (gr-osmosdr/GQRX: (v - 127.4) / 128), so a
+    round trip through GQRX is unbiased.
+
+    Quantizers:
+      arith - scale/offset/clip in place, then a rounding cast (default)
+      lut   - quantize onto a fine fixed-point grid and map each grid index
+              through a precomputed 256-level table (handy for non-linear
+              transfer curves; slower than arith for the linear mapping)
+    """
+
+    LUT_STEPS_PER_LEVEL = 16
+
+    def __init__(self, max_samples=16384, scale=128.0, offset=127.4, quantizer="arith"):
+        if quantizer not in ("arith", "lut"):
+            raise ValueError(f"Unknown quantizer: {quantizer}")
+
+        self.scale = np.float32(scale)
+        self.offset = np.float32(offset)
+        self.quantizer = quantizer
+
+        # LUT grid covers the representable input range [-offset/scale, (255-offset)/scale]
+        steps = self.LUT_STEPS_PER_LEVEL
+        self._lut_scale = np.float32(scale * steps)
+        self._lut_offset = np.float32(offset * steps)
+        grid = np.arange(256 * steps, dtype=np.float32) / steps
+        self._lut = np.clip(np.floor(grid + 0.5), 0, 255).astype(np.uint8)
+
+        self._allocate(max_samples)
+
+    def _allocate(self, max_samples):
+        self.max_samples = max_samples
+        self._scratch = np.empty(2 * max_samples, dtype=np.float32)
+        self._index = np.empty(2 * max_samples, dtype=np.intp)
+        self._out = np.empty(2 * max_samples, dtype=np.uint8)
+
+    def convert(self, iq_chunk, out=None):
+        """Convert a chunk; returns a uint8 view into the internal buffer.
+
+        The view is only valid until the next call. Pass out (a uint8 buffer
+        of at least 2 * len(iq_chunk) bytes) to write the result there instead.
+        """
+        n = len(iq_chunk)
+        if n > self.max_samples:
+            self._allocate(n)
+
+        if iq_chunk.dtype != np.complex64 or not iq_chunk.flags.c_contiguous:
+            iq_chunk = np.ascontiguousarray(iq_chunk, dtype=np.complex64)
+
+        interleaved = iq_chunk.view(np.float32)
+        scratch = self._scratch[:2 * n]
+        out = (self._out if out is None else out)[:2 * n]
+
+        if self.quantizer == "arith":
+            np.multiply(interleaved, self.scale, out=scratch)
+            # +0.5 so the truncating cast rounds to nearest
+            np.add(scratch, self.offset + np.float32(0.5), out=scratch)
+            np.clip(scratch, 0, 255, out=scratch)
+            np.copyto(out, scratch, casting='unsafe')
+        else:
+            index = self._index[:2 * n]
+            np.multiply(interleaved, self._lut_scale, out=scratch)
+            np.add(scratch, self._lut_offset, out=scratch)
+            np.clip(scratch, 0, len(self._lut) - 1, out=scratch)
+            np.copyto(index, scratch, casting='unsafe')
+            np.take(self._lut, index, out=out)
+
+        return out
+
+    def to_bytes(self, iq_chunk):
+        """Convert a chunk to an immutable bytes object.
+
+        The copy is deliberate: the bytes are shared by every client's send
+        queue and outlive this call, so they can't alias the reused buffer.
+        """
+        return self.convert(iq_chunk).tobytes()
+
+
+def _legacy_convert(iq_chunk):
+    """Original broadcast_samples conversion, kept for benchmarking"""
+    i = ((iq_chunk.real * 127.5) + 127.5).astype(np.uint8)
+    q = ((iq_chunk.imag * 127.5) + 127.5).astype(np.uint8)
+    iq_bytes = np.empty(len(iq_chunk) * 2, dtype=np.uint8)
+    iq_bytes[0::2] = i
+    iq_bytes[1::2] = q
+    return iq_bytes.tobytes()
+
+
+if __name__ == "__main__":
+    # Microbenchmark: python iq_convert.py
+    import time
+
+    chunk_size = 16384
+    iterations = 2000
+    rng = np.random.default_rng(0)
+    chunk = ((rng.standard_normal(chunk_size) + 1j * rng.standard_normal(chunk_size)) * 0.3).astype(np.complex64)
+
+    def bench(name, fn):
+        fn(chunk)  # warm up
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn(chunk)
+        elapsed = time.perf_counter() - start
+        rate = chunk_size * iterations / elapsed
+        print(f"{name:<28} {rate / 1e6:8.1f} MS/s  ({rate / 1.024e6:6.0f}x real time @ 1.024 MS/s)")
+
+    print(f"complex64 -> uint8, {chunk_size}-sample chunks, {iterations} iterations")
+    bench("legacy (5 temporaries)", _legacy_convert)
+    arith = RTLConverter(chunk_size)
+    bench("arith convert()", arith.convert)
+    bench("arith to_bytes()", arith.to_bytes)
+    lut = RTLConverter(chunk_size, quantizer="lut")
+    bench("lut convert()", lut.convert)
+    bench("lut to_bytes()", lut.to_bytes)
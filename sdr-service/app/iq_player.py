@@ -1,77 +1,270 @@
 import numpy as np
 import asyncio
+import mmap
 import os
+from collections import deque
+
+# Playback rate limits (1.0 = real time)
+MIN_SPEED = 0.25
+MAX_SPEED = 4.0
+# Shortest A/B loop region accepted, in samples
+MIN_LOOP_SAMPLES = 1024
+
+def map_iq_file(file_path):
+    """Memory-map a .iq (complex64) file without reading it.
+
+    Pages are faulted in on demand and live in the shared page cache, so
+    startup is instant, resident memory stays flat regardless of file size
+    and several SDR containers playing the same file share one copy.
+    """
+    # Check if file exists
+    if not os.path.exists(file_path):
+        print(f"❌ ERROR: File not found: {file_path}")
+        return None
+
+    if os.path.getsize(file_path) < 8:
+        print(f"❌ ERROR: File too small to contain samples: {file_path}")
+        return None
+
+    with open(file_path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    # Playback reads front to back: let the kernel read ahead aggressively
+    if hasattr(mapped, 'madvise'):
+        mapped.madvise(mmap.MADV_SEQUENTIAL)
+
+    # Support .iq (complex64) format; ignore any trailing partial sample
+    return np.frombuffer(mapped, dtype=np.complex64, count=len(mapped) // 8)
+
 
 class IQPlayer:
+    """Plays a memory-mapped IQ recording in chunks for the stream loop.
+
+    Besides play/pause/stop, playback can be cued: seek() jumps to any point
+    of the file in O(1) (it only moves the read position in the mapping),
+    set_loop() confines playback to an A/B region, and set_speed() plays the
+    recording 0.25x-4x as fast while the stream keeps its nominal sample
+    rate. Off-speed chunks are resampled with a running-sum boxcar over the
+    samples each output sample spans, which is linear interpolation when
+    slowed down and an anti-alias average when sped up. As with any change
+    of playback rate, the recording's spectrum is scaled by the same factor.
+
+    Like the mixer, control methods may be called from any thread: they
+    queue the change on a deque and the stream loop applies it at the top
+    of its next chunk, so the read position only ever moves on one thread.
+    open_file() is the event-loop variant of switch_file().
+    """
+
     def __init__(self, file_path, sample_rate=1024000):
         self.file_path = file_path
         self.sample_rate = sample_rate
         self.running = False
         self.paused = False
-        self.position = 0
+        self.position = 0  # in file samples; fractional while off-speed
         self.samples = None
+        self.speed = 1.0
+        self.loop_region = None  # (start, end) in file samples, or None for the whole file
+        self.inbox = deque()
 
     def load_file(self, file_path=None):
-        """Load IQ file as complex float32 numpy array"""
+        """Map IQ file into memory as a complex float32 numpy array"""
         if file_path:
             self.file_path = file_path
 
         print(f"Loading IQ file: {self.file_path}")
 
-        # Check if file exists
-        if not os.path.exists(self.file_path):
-            print(f"❌ ERROR: File not found: {self.file_path}")
+        samples = map_iq_file(self.file_path)
+        if samples is None:
             return None
 
-        # Support .iq (complex64) format
-        self.samples = np.fromfile(self.file_path, dtype=np.complex64)
-
-        print(f"Loaded {len(self.samples)} samples ({len(self.samples)/self.sample_rate:.1f} seconds)")
+        self.samples = samples
+        print(f"Mapped {len(self.samples)} samples ({len(self.samples)/self.sample_rate:.1f} seconds)")
         return self.samples
 
     def switch_file(self, new_file_path):
-        """Switch to a different IQ file"""
+        """Switch to a different IQ file without interrupting the stream"""
+        print(f"🔄 Switching to IQ file: {new_file_path}")
+
+        # Mapping is O(1), so the new file is ready before the next chunk is due
+        samples = map_iq_file(new_file_path)
+        if samples is None:
+            print(f"❌ Keeping current file: {self.file_path}")
+            return
+
+        # Swapped in by the stream loop at its next chunk
+        self.inbox.append((self._apply_switch, (new_file_path, samples)))
+
+    async def open_file(self, new_file_path):
+        """Switch files from the event loop: the file is opened in a worker thread, then queued like a cue"""
         print(f"🔄 Switching to IQ file: {new_file_path}")
+        samples = await asyncio.to_thread(map_iq_file, new_file_path)
+        if samples is None:
+            print(f"❌ Keeping current file: {self.file_path}")
+            return
+        # Behind any cue already queued, so cues sent after the switch apply to the new file
+        self.inbox.append((self._apply_switch, (new_file_path, samples)))
+
+    # --- cueing (any thread) ---
+
+    def seek(self, time=None, sample=None):
+        """Jump to a time offset (seconds) or sample index in the recording"""
+        position = int(sample) if sample is not None else int(round(float(time or 0) * self.sample_rate))
+        self.inbox.append((self._apply_seek, (position,)))
+
+    def set_speed(self, speed):
+        """
+        Set the playback rate (1.0 = real time)
+
+        Returns:
+            True if queued, False if outside MIN_SPEED..MAX_SPEED
+        """
+        speed = float(speed)
+        if not MIN_SPEED <= speed <= MAX_SPEED:
+            print(f"❌ Playback speed {speed:g}x out of range ({MIN_SPEED:g}x-{MAX_SPEED:g}x)")
+            return False
+        self.inbox.append((self._apply_speed, (speed,)))
+        return True
+
+    def set_loop(self, start=None, end=None, start_sample=None, end_sample=None):
+        """
+        Loop playback between A and B (seconds, or sample indices)
 
-        # Save playback state
-        was_running = self.running
+        A defaults to the start of the file and B to its end. If playback is
+        outside the region it is cued to A.
+        """
+        if start_sample is None:
+            start_sample = int(round(float(start or 0) * self.sample_rate))
+        if end_sample is None and end is not None:
+            end_sample = int(round(float(end) * self.sample_rate))
+        self.inbox.append((self._apply_loop, (int(start_sample), end_sample)))
 
-        # Stop playback
-        self.stop()
+    def clear_loop(self):
+        """Loop the whole file again"""
+        self.inbox.append((self._apply_loop, (None, None)))
 
-        # Load new file
-        self.load_file(new_file_path)
+    # --- stream loop ---
 
-        # Resume if was playing
-        if was_running:
-            self.play()
+    def _apply_switch(self, file_path, samples):
+        self.file_path = file_path
+        self.samples, self.position = samples, 0
+        # A/B regions belong to the file they were set on
+        self.loop_region = None
+        print(f"✅ Switched to: {os.path.basename(file_path)}")
+
+    def _apply_seek(self, position):
+        if self.samples is None:
+            self.load_file()
+        if self.samples is None:
+            return
+        self.position = min(max(position, 0), len(self.samples) - 1)
+        print(f"⏩ Seek to {self.position / self.sample_rate:.3f} s (sample {self.position})")
+
+    def _apply_speed(self, speed):
+        self.speed = speed
+        print(f"⏱️ Playback speed {speed:g}x")
+
+    def _apply_loop(self, start, end):
+        if start is None:
+            self.loop_region = None
+            print("🔁 Looping whole file")
+            return
+        if self.samples is None:
+            self.load_file()
+        if self.samples is None:
+            return
+
+        total = len(self.samples)
+        end = total if end is None else min(int(end), total)
+        start = max(start, 0)
+        if end - start < MIN_LOOP_SAMPLES:
+            print(f"❌ Loop region {start}-{end} rejected: shorter than {MIN_LOOP_SAMPLES} samples")
+            return
+        self.loop_region = (start, end)
+        if not start <= self.position < end:
+            self.position = start
+        print(f"🔁 Looping {start / self.sample_rate:.3f}-{end / self.sample_rate:.3f} s")
 
-        print(f"✅ Switched to: {os.path.basename(new_file_path)}")
+    def _drain(self):
+        while self.inbox:
+            apply, args = self.inbox.popleft()
+            apply(*args)
+
+    def _region(self, samples):
+        """Current (start, end) playback region of samples"""
+        region = self.loop_region
+        if region is None or region[1] > len(samples):
+            return 0, len(samples)
+        return region
+
+    def _read_resampled(self, samples, end, chunk_size):
+        """Up to chunk_size output samples from self.position, stepping self.speed input samples each"""
+        speed = self.speed
+        width = max(speed, 1.0)  # input samples averaged into each output sample
+        position = self.position
+        count = min(chunk_size, int((end - width - position) / speed) + 1)
+
+        t = position + np.arange(count) * speed
+        base = int(position)
+        segment = samples[base:min(int(t[-1] + width) + 2, end)]
+
+        # Running sum, so each output is a difference of two interpolated sums
+        cumulative = np.empty(len(segment) + 1, dtype=np.complex128)
+        cumulative[0] = 0
+        np.cumsum(segment, out=cumulative[1:])
+
+        def integral(x):
+            index = x.astype(np.int64)
+            return cumulative[index] + (x - index) * segment[np.minimum(index, len(segment) - 1)]
+
+        offsets = t - base
+        chunk = ((integral(offsets + width) - integral(offsets)) / width).astype(np.complex64)
+        self.position = position + count * speed
+        return chunk
 
     async def get_chunk(self, chunk_size=16384):
         """Get next chunk of samples"""
+        self._drain()
+
         if not self.running or self.paused:
             await asyncio.sleep(0.1)
             return None
 
         if self.samples is None:
-            self.load_file()
+            # First chunk: open the file without blocking the loop
+            await asyncio.to_thread(self.load_file)
+            if self.samples is None:
+                await asyncio.sleep(0.1)
+                return None
 
-        # Get chunk
-        end_pos = min(self.position + chunk_size, len(self.samples))
-        chunk = self.samples[self.position:end_pos]
+        samples = self.samples
+        start, end = self._region(samples)
 
-        # Loop if reached end
-        if end_pos >= len(self.samples):
-            self.position = 0
-        else:
-            self.position = end_pos
+        # Wrap at the end of the region (the whole file unless an A/B loop is set)
+        width = max(self.speed, 1.0)
+        if self.position + width > end:
+            self.position = start
 
-        # Real-time pacing
-        await asyncio.sleep(chunk_size / self.sample_rate)
+        if self.speed != 1.0:
+            return self._read_resampled(samples, end, chunk_size)
 
+        # Get chunk (a view into the mapped file, no copy)
+        position = int(self.position)
+        end_pos = min(position + chunk_size, end)
+        chunk = samples[position:end_pos]
+        self.position = end_pos
+
+        # Real-time pacing is done by the stream loop's StreamPacer
         return chunk
 
+    def skip(self, num_samples):
+        """Advance playback position (used to drop samples after an overrun)"""
+        if self.samples is not None and len(self.samples) > 0:
+            start, end = self._region(self.samples)
+            position = self.position + num_samples * self.speed
+            if position >= end:
+                position = start + (position - end) % (end - start)
+            self.position = position
+
     def play(self):
         """Start playback"""
         self.running = True
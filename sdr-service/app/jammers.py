@@ -0,0 +1,124 @@
+import numpy as np
+
+class PeriodicJammer:
+    """Plays one precomputed period of a waveform, phase-continuous across chunks.
+
+    The table holds one period of the complex baseband waveform (computed once,
+    in float64, stored as complex64). Consecutive periods of a tone or FM sweep
+    only differ by a constant phase rotation, so the generator keeps a read
+    position plus a running rotation phasor and advances the phasor by the
+    per-period rotation on every wrap. Generating a chunk is then a table
+    copy-and-scale, with no transcendental functions, and the waveform is
+    seamless across chunk boundaries no matter how the stream is chunked.
+    """
+
+    def __init__(self, table, period_phase=0.0):
+        self.table = table.astype(np.complex64)
+        # Mean power at unit gain, for levels set relative to the signal
+        self.mean_power = float(np.mean(np.abs(table) ** 2))
+        self.wrap_rotation = complex(np.exp(1j * period_phase))
+        self.position = 0
+        self.rotation = 1 + 0j
+
+    def generate(self, out, gain=1.0):
+        """Write the next len(out) samples (times gain) into out, in place"""
+        num_samples = len(out)
+        period = len(self.table)
+        filled = 0
+        while filled < num_samples:
+            take = min(num_samples - filled, period - self.position)
+            np.multiply(self.table[self.position:self.position + take],
+                        np.complex64(self.rotation * gain),
+                        out=out[filled:filled + take])
+            filled += take
+            self.position += take
+            if self.position == period:
+                self.position = 0
+                self.rotation *= self.wrap_rotation
+                # Keep the accumulated phasor on the unit circle
+                self.rotation /= abs(self.rotation)
+        return out
+
+
+class NoiseJammer:
+    """Wideband complex Gaussian noise (stateless apart from the RNG)"""
+
+    def __init__(self, amplitude=0.5):
+        self.amplitude = amplitude
+        self.mean_power = 2 * amplitude ** 2  # I and Q each have variance amplitude^2
+        self.rng = np.random.default_rng()
+
+    def generate(self, out, gain=1.0):
+        # Independent I/Q normals straight into the interleaved float32 view
+        interleaved = out.view(np.float32)
+        self.rng.standard_normal(len(interleaved), dtype=np.float32, out=interleaved)
+        np.multiply(interleaved, np.float32(self.amplitude * gain), out=interleaved)
+        return out
+
+
+def tone_jammer(sample_rate, freq_offset, amplitude=0.5, table_size=4096):
+    """Continuous tone at freq_offset Hz"""
+    phase_step = 2 * np.pi * freq_offset / sample_rate
+    table = amplitude * np.exp(1j * phase_step * np.arange(table_size))
+    return PeriodicJammer(table, phase_step * table_size)
+
+
+def linear_fm_jammer(sample_rate, f_start, f_stop, period_s, amplitude=0.5):
+    """Repeating linear FM ramp from f_start to f_stop Hz every period_s
+
+    The frequency is a sawtooth, but the phase is continuous at each restart.
+    """
+    period = max(1, int(round(period_s * sample_rate)))
+    period_s = period / sample_rate
+    t = np.arange(period) / sample_rate
+    rate = (f_stop - f_start) / period_s
+    table = amplitude * np.exp(2j * np.pi * (f_start * t + 0.5 * rate * t ** 2))
+    period_phase = 2 * np.pi * (f_start * period_s + 0.5 * rate * period_s ** 2)
+    return PeriodicJammer(table, period_phase)
+
+
+def pulse_jammer(sample_rate, freq_offset, pulse_width=1024, pulse_period=4096, amplitude=0.7):
+    """Gated carrier: pulse_width samples on every pulse_period samples"""
+    phase_step = 2 * np.pi * freq_offset / sample_rate
+    n = np.arange(pulse_period)
+    table = np.where(n < pulse_width, amplitude, 0.0) * np.exp(1j * phase_step * n)
+    return PeriodicJammer(table, phase_step * pulse_period)
+
+
+def make_jammer(jamming_type, sample_rate=1024000):
+    """
+    Create a generator for one of the built-in jamming types
+
+    Types: cw (tone at +50 kHz), noise (wideband complex Gaussian), sweep
+    (0 -> 32 kHz sawtooth every 16 ms), pulse (1024-sample bursts every
+    4096 samples) and chirp (0 -> 8 kHz linear FM every 16 ms).
+
+    Any other generator can be plugged into SignalMixer if it provides
+    generate(out, gain), which writes the next len(out) samples times gain
+    into the complex64 array out, phase-continuous from the previous call,
+    and mean_power, its power at unit gain (used for J/S levels).
+
+    Returns:
+        A generator object, or None for an unknown type
+    """
+    if jamming_type == "cw":
+        # Continuous Wave (pure tone at 50 kHz offset)
+        return tone_jammer(sample_rate, 50000)
+
+    if jamming_type == "noise":
+        # Wideband noise jamming
+        return NoiseJammer()
+
+    if jamming_type == "sweep":
+        # Frequency sweep jammer: 0 -> 32 kHz sawtooth every 16 ms
+        return linear_fm_jammer(sample_rate, 0, 32768, 0.016)
+
+    if jamming_type == "pulse":
+        # Pulsed jamming: 1024 on / 4096 period, carrier at 0.1 cycles/sample
+        return pulse_jammer(sample_rate, 0.1 * sample_rate)
+
+    if jamming_type == "chirp":
+        # Chirp jammer: 0 -> 8 kHz linear FM every 16 ms
+        return linear_fm_jammer(sample_rate, 0, 8192, 0.016)
+
+    return None
@@ -0,0 +1,314 @@
+import time
+from bisect import insort
+from collections import deque
+import numpy as np
+from jammers import make_jammer
+
+class JammingEvent:
+    """One scheduled jamming change.
+
+    jammer None means "stop jamming", unless level_change is set: then the
+    event only changes the level of whatever is on air, gliding to it over
+    ramp samples. The start is either a stream sample index, a wall-clock
+    timestamp (at_time, resolved to a sample index by the DSP thread), or
+    neither, meaning the next sample mixed. duration None means "until
+    replaced or cleared"; ramp is the linear amplitude ramp in samples,
+    applied at onset and again at the end.
+
+    The level is power_db (absolute, scaling the jammer's built-in
+    amplitude), or js_db: jammer-to-signal ratio against the running signal
+    power estimate, so the same inject has the same effect on any recording.
+    """
+
+    def __init__(self, jammer=None, jamming_type=None, power_db=-30, start=None, at_time=None,
+                 ramp=0, duration=None, js_db=None, level_change=False):
+        self.jammer = jammer
+        self.jamming_type = jamming_type
+        self.power_db = power_db
+        self.js_db = js_db
+        self.level_change = level_change
+        self.start = start
+        self.at_time = at_time
+        self.ramp = ramp
+        self.duration = duration
+
+
+def parse_schedule_entry(entry, sample_rate):
+    """
+    Build a JammingEvent from a scenario/MQTT schedule entry
+
+    Entry keys:
+        type: jamming type (see make_jammer), "clear" to stop jamming, or
+              "level" to change the level of the jamming on air (over ramp_s)
+        power_db: absolute jamming power (default -30)
+        js_db: jammer-to-signal ratio in dB, relative to the stream's
+               running signal power (overrides power_db)
+        snr_db: signal-to-jammer ratio in dB, the same as js_db = -snr_db
+               (handy for noise)
+        time: onset in seconds of stream time (samples mixed / sample_rate)
+        at_sample: onset as a stream sample index
+        at: onset as a Unix timestamp
+        ramp_s: onset/release ramp, or level glide, in seconds (default 0, a hard switch)
+        duration_s: how long to jam (default: until replaced or cleared)
+
+    With no onset given the change applies to the next sample mixed.
+
+    Raises:
+        ValueError: unknown jamming type
+    """
+    jamming_type = entry.get("type", "clear")
+    ramp = int(round(float(entry.get("ramp_s", 0)) * sample_rate))
+
+    start = None
+    if entry.get("at_sample") is not None:
+        start = int(entry["at_sample"])
+    elif entry.get("time") is not None:
+        start = int(round(float(entry["time"]) * sample_rate))
+
+    if jamming_type == "clear":
+        return JammingEvent(start=start, at_time=entry.get("at"), ramp=ramp)
+
+    js_db = None
+    if entry.get("js_db") is not None:
+        js_db = float(entry["js_db"])
+    elif entry.get("snr_db") is not None:
+        js_db = -float(entry["snr_db"])
+
+    if jamming_type == "level":
+        if js_db is None and entry.get("power_db") is None:
+            raise ValueError("Level change needs power_db, js_db or snr_db")
+        return JammingEvent(power_db=float(entry.get("power_db", -30)), start=start, at_time=entry.get("at"),
+                            ramp=ramp, js_db=js_db, level_change=True)
+
+    # Generators are built here, on the caller's thread, so the DSP thread only swaps them in
+    jammer = make_jammer(jamming_type, sample_rate)
+    if jammer is None:
+        raise ValueError(f"Unknown jamming type: {jamming_type}")
+
+    duration = entry.get("duration_s")
+    return JammingEvent(
+        jammer, jamming_type, float(entry.get("power_db", -30)), start, entry.get("at"), ramp,
+        int(round(float(duration) * sample_rate)) if duration is not None else None, js_db
+    )
+
+
+class _ActiveJamming:
+    """The jammer currently on air, its level and amplitude envelope (sample indices)"""
+
+    def __init__(self, event, start):
+        self.event = event
+        self.start = start
+        self.ramp_up = event.ramp
+        self.end = start + event.duration if event.duration is not None else None
+        self.ramp_down = event.ramp
+        self.power_db = event.power_db
+        self.js_db = event.js_db
+        self.gain = None  # applied at the end of the last segment
+        self.glide = None  # (start sample, length, gain it started from) of a level change
+
+    def describe(self):
+        return f"{self.power_db:g} dB" if self.js_db is None else f"J/S {self.js_db:g} dB"
+
+    def set_level(self, event, now):
+        self.power_db, self.js_db = event.power_db, event.js_db
+        self.glide = (now, event.ramp, self.gain) if event.ramp and self.gain is not None else None
+
+    def target_gain(self, signal_power):
+        """Gain for the current level setting, given the signal's mean power"""
+        if self.js_db is None:
+            return 10 ** (self.power_db / 20)
+        jammer_power = signal_power * 10 ** (self.js_db / 10)
+        return (jammer_power / self.event.jammer.mean_power) ** 0.5
+
+    def release(self, at, ramp):
+        """Ramp down from sample `at` over `ramp` samples (never extends an earlier end)"""
+        end = at + ramp
+        if self.end is None or end < self.end:
+            self.end = end
+            self.ramp_down = ramp
+
+
+class JammingTimeline:
+    """Applies jamming changes at exact stream sample boundaries.
+
+    The stream clock is the number of samples mixed so far, so a schedule
+    follows playback: it holds while the stream is paused and is unaffected
+    by chunking. Changes can come from any thread: submit() appends one batch
+    to a deque (atomic in CPython), and the DSP thread drains it at the top
+    of each chunk. Everything else, including all jammer state, is only ever
+    touched by the DSP thread, so no locks are needed.
+
+    render() splits each chunk at event boundaries, so an onset scheduled
+    for sample N starts exactly at sample N whatever the chunk size.
+
+    Levels set as J/S follow the signal power passed to render(). The gain
+    moves linearly across each segment from where the last one left off,
+    so neither the running estimate nor a level change (glided over its
+    ramp) steps the jammer's amplitude.
+
+    listener, if set, is called on the DSP thread as listener(sample,
+    jamming_type, level) whenever jamming goes on air or changes (level is
+    a description such as "-30 dB" or "J/S -10 dB"), and as
+    listener(sample) when it goes off air.
+    """
+
+    def __init__(self, sample_rate):
+        self.sample_rate = sample_rate
+        self.listener = None
+        # Scratch for per-sample gain ramps (grown on demand, then reused)
+        self._gains = np.empty(0, dtype=np.float32)
+        self._steps = np.empty(0, dtype=np.float32)
+        self.inbox = deque()
+        self.pending = []  # JammingEvents sorted by start
+        self.active = None
+        self.position = 0
+
+    # --- producer side (any thread) ---
+
+    def submit(self, events, replace=False):
+        """Hand over a batch of events; replace drops everything still pending first"""
+        self.inbox.append((replace, list(events)))
+
+    # --- DSP thread ---
+
+    @property
+    def jamming_type(self):
+        active = self.active
+        return active.event.jamming_type if active else None
+
+    def _drain(self):
+        while self.inbox:
+            replace, events = self.inbox.popleft()
+            if replace:
+                self.pending.clear()
+            for event in events:
+                if event.start is None:
+                    # Wall-clock onsets: the chunk being mixed now goes out now
+                    delay = (event.at_time - time.time()) if event.at_time is not None else 0.0
+                    event.start = self.position + max(0, int(round(delay * self.sample_rate)))
+                insort(self.pending, event, key=lambda e: e.start)
+
+    def _notify(self, now, jamming_type=None, level=None):
+        if self.listener is not None:
+            self.listener(now, jamming_type, level)
+
+    def _apply(self, event, now):
+        if event.level_change:
+            if self.active is None:
+                print(f"⚠️ Jamming level change at sample {now} ignored: no jamming on air")
+                return
+            self.active.set_level(event, now)
+            self._notify(now, self.active.event.jamming_type, self.active.describe())
+            print(f"🎚️ Jamming level: {self.active.describe()} at sample {now}")
+            return
+
+        if event.jammer is None:
+            if self.active is not None:
+                if event.ramp:
+                    self.active.release(now, event.ramp)
+                else:
+                    self.active = None
+                    self._notify(now)
+                print(f"✅ Jamming cleared at sample {now}")
+            return
+
+        # Events applied late (e.g. a schedule loaded mid-stream) keep their
+        # scheduled timing, and are skipped if they are already over
+        active = _ActiveJamming(event, event.start)
+        if active.end is not None and active.end <= now:
+            return
+        self.active = active
+        self._notify(now, event.jamming_type, active.describe())
+        print(f"🔴 Jamming enabled: {event.jamming_type} @ {active.describe()} at sample {now}")
+
+    def _envelope(self, segment, now, active):
+        """Scale a segment by the onset/release ramps, where it overlaps them"""
+        n = len(segment)
+        in_ramp_up = active.ramp_up and now < active.start + active.ramp_up
+        in_ramp_down = active.end is not None and active.ramp_down and now + n > active.end - active.ramp_down
+        if not (in_ramp_up or in_ramp_down):
+            return
+        t = np.arange(now, now + n, dtype=np.float64)
+        envelope = np.ones(n)
+        if in_ramp_up:
+            np.minimum(envelope, (t - active.start) / active.ramp_up, out=envelope)
+        if in_ramp_down:
+            np.minimum(envelope, (active.end - t) / active.ramp_down, out=envelope)
+        np.clip(envelope, 0.0, 1.0, out=envelope)
+        segment *= envelope.astype(np.float32)
+
+    def _generate(self, segment, now, active, signal_power):
+        """Fill a segment with the active jammer at its (possibly moving) level"""
+        n = len(segment)
+        target = active.target_gain(signal_power)
+        end_gain = target
+        if active.glide is not None:
+            glide_start, glide_length, glide_from = active.glide
+            progress = min(1.0, (now + n - glide_start) / glide_length)
+            end_gain = glide_from + (target - glide_from) * progress
+            if progress >= 1.0:
+                active.glide = None
+        start_gain = end_gain if active.gain is None else active.gain
+        active.gain = end_gain
+
+        if abs(end_gain - start_gain) <= 1e-4 * max(end_gain, start_gain):
+            active.event.jammer.generate(segment, end_gain)
+            return
+        if len(self._gains) < n:
+            self._gains = np.empty(n, dtype=np.float32)
+            self._steps = np.arange(1, n + 1, dtype=np.float32)
+        active.event.jammer.generate(segment, 1.0)
+        # start_gain + k * (end_gain - start_gain) / n for k = 1..n, in place
+        gains = self._gains[:n]
+        np.multiply(self._steps[:n], np.float32((end_gain - start_gain) / n), out=gains)
+        gains += np.float32(start_gain)
+        segment *= gains
+
+    def render(self, out, signal_power=0.0):
+        """
+        Write the next len(out) samples of jamming into out
+
+        signal_power is the stream's current mean signal power, the
+        reference for levels set as J/S.
+
+        Returns:
+            True if any jamming is on air in this stretch (out is then valid,
+            zero where nothing is on air), False if out was left untouched
+        """
+        self._drain()
+        n = len(out)
+        if self.active is None and (not self.pending or self.pending[0].start >= self.position + n):
+            self.position += n
+            return False
+
+        on_air = False
+        cursor = 0
+        while cursor < n:
+            now = self.position + cursor
+            while self.pending and self.pending[0].start <= now:
+                self._apply(self.pending.pop(0), now)
+
+            active = self.active
+            if active is not None and active.end is not None and active.end <= now:
+                self.active = active = None
+                self._notify(now)
+                print(f"✅ Jamming ended at sample {now}")
+
+            # Run to the next boundary: an event, or the end of the active jamming
+            stop = n
+            if self.pending:
+                stop = min(stop, self.pending[0].start - self.position)
+            if active is not None and active.end is not None:
+                stop = min(stop, active.end - self.position)
+
+            segment = out[cursor:stop]
+            if active is None:
+                segment[:] = 0
+            else:
+                self._generate(segment, now, active, signal_power)
+                self._envelope(segment, now, active)
+                on_air = True
+            cursor = stop
+
+        self.position += n
+        return on_air
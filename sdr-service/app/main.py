@@ -1,54 +1,147 @@
 import asyncio
+import json
+import multiprocessing
 import os
-from iq_player import IQPlayer
-from signal_mixer import SignalMixer
+import signal
+import sys
 from rtl_tcp import RTLTCPServer
-from mqtt_handler import MQTTHandler
+from frame_ring import FrameRing
+from dsp_worker import run_dsp_worker
 
-async def stream_loop(iq_player, signal_mixer, rtl_tcp):
-    """Main streaming loop"""
-    while True:
-        # Get chunk from player
-        chunk = await iq_player.get_chunk()
-
-        if chunk is not None:
-            # Mix in jamming if active
-            mixed_chunk = signal_mixer.mix_signals(chunk)
-
-            # Broadcast to GQRX clients
-            await rtl_tcp.broadcast_samples(mixed_chunk)
-
-async def main():
+def main():
     # Configuration from environment
     IQ_FILE = os.getenv('IQ_FILE_PATH', '/iq_files/demo.iq')
     SAMPLE_RATE = int(os.getenv('SAMPLE_RATE', '1024000'))
+    CHUNK_SIZE = int(os.getenv('CHUNK_SIZE', '16384'))
+    PACING_POLICY = os.getenv('PACING_POLICY', 'drop')
+    PACING_MAX_LAG_MS = float(os.getenv('PACING_MAX_LAG_MS', '100'))
+    CLIENT_QUEUE_CHUNKS = int(os.getenv('CLIENT_QUEUE_CHUNKS', '16'))
+    CLIENT_OVERFLOW_POLICY = os.getenv('CLIENT_OVERFLOW_POLICY', 'drop-oldest')
+    RTL_QUANTIZER = os.getenv('RTL_QUANTIZER', 'arith')
+    MQTT_HOST = os.getenv('MQTT_HOST', 'mqtt')
+    # Control topic, namespaced per exercise and team like the dashboards' topics
+    EXERCISE_ID = os.getenv('EXERCISE_ID', 'test')
+    TEAM_ID = os.getenv('TEAM_ID', 'default-team')
+    MQTT_TOPIC = os.getenv('MQTT_TOPIC', f"/exercise/{EXERCISE_ID}/team/{TEAM_ID}/injects")
+    # Spectrum rows go next to the control topic unless told otherwise
+    SPECTRUM_TOPIC = os.getenv('SPECTRUM_TOPIC', f"{MQTT_TOPIC.rsplit('/', 1)[0]}/spectrum")
+    SPECTRUM_FFT_SIZE = int(os.getenv('SPECTRUM_FFT_SIZE', '512'))
+    SPECTRUM_OVERLAP = float(os.getenv('SPECTRUM_OVERLAP', '0.5'))
+    SPECTRUM_RATE = float(os.getenv('SPECTRUM_RATE', '10'))
+    SPECTRUM_DB_MIN = float(os.getenv('SPECTRUM_DB_MIN', '-100'))
+    SPECTRUM_DB_MAX = float(os.getenv('SPECTRUM_DB_MAX', '0'))
+    # Scenario jamming timeline (JSON list of schedule entries, see jamming_schedule.py)
+    JAMMING_SCHEDULE = json.loads(os.getenv('JAMMING_SCHEDULE') or '[]')
+    # Link conditions applied to the main recording (JSON, see channel_effects.py)
+    CHANNEL_EFFECTS = json.loads(os.getenv('CHANNEL_EFFECTS') or '{}')
+    # Averaging time of the signal power that J/S and SNR jamming levels refer to
+    SIGNAL_POWER_TAU_S = float(os.getenv('SIGNAL_POWER_TAU_S', '1.0'))
+    # Extra scene sources mixed over the main recording (JSON list, see scene.py)
+    SCENE_SOURCES = json.loads(os.getenv('SCENE_SOURCES') or '[]')
+    # Initial cue: {"start": s, "speed": x, "loop": [a_s, b_s]} (see IQPlayer)
+    PLAYBACK = json.loads(os.getenv('PLAYBACK') or '{}')
+    # After-action recording of the mixed output into the IQ library (off without RECORD_DIR)
+    RECORD_DIR = os.getenv('RECORD_DIR', '')
+    RECORD_FORMAT = os.getenv('RECORD_FORMAT', 'cf32')
+    RECORD_PREFIX = os.getenv('RECORD_PREFIX', f"rec-{EXERCISE_ID}-{TEAM_ID}")
+    RECORD_ROTATE_MB = float(os.getenv('RECORD_ROTATE_MB', '1024'))
+    RECORD_ROTATE_S = float(os.getenv('RECORD_ROTATE_S', '0'))
+    RECORD_ON_START = os.getenv('RECORD_ON_START', 'true').lower() == 'true'
 
     print("=" * 60)
     print("SDR/GQRX Streaming Service")
     print("=" * 60)
     print(f"IQ File: {IQ_FILE}")
     print(f"Sample Rate: {SAMPLE_RATE} Hz")
+    print(f"Control topic: {MQTT_TOPIC} @ {MQTT_HOST}")
+    print(f"Client queues: {CLIENT_QUEUE_CHUNKS} chunks, overflow policy '{CLIENT_OVERFLOW_POLICY}'")
+    print(f"Pacing: {CHUNK_SIZE} samples/chunk, overrun policy '{PACING_POLICY}' after {PACING_MAX_LAG_MS:.0f} ms")
+    if JAMMING_SCHEDULE:
+        print(f"Jamming schedule: {len(JAMMING_SCHEDULE)} scenario entries")
+    if SCENE_SOURCES:
+        print(f"Scene: {len(SCENE_SOURCES)} extra sources")
+    if CHANNEL_EFFECTS:
+        print(f"Channel effects: {', '.join(CHANNEL_EFFECTS)}")
+    if PLAYBACK:
+        print(f"Playback cue: {PLAYBACK}")
+    if RECORD_DIR:
+        print(f"Recording: {RECORD_FORMAT} to {RECORD_DIR} as {RECORD_PREFIX}-*, rotating at "
+              f"{RECORD_ROTATE_MB:g} MB" + (f" / {RECORD_ROTATE_S:g} s" if RECORD_ROTATE_S else "")
+              + ("" if RECORD_ON_START else " (waiting for record_start)"))
 
-    # Initialize components
-    iq_player = IQPlayer(IQ_FILE, SAMPLE_RATE)
-    signal_mixer = SignalMixer()
-    rtl_tcp = RTLTCPServer()
-    mqtt = MQTTHandler(iq_player, signal_mixer)
+    RING_SLOTS = int(os.getenv('RING_SLOTS', '64'))
+    CENTER_FREQ = int(float(os.getenv('CENTER_FREQ', '100e6')))
+    MAX_CHANNELS = int(os.getenv('MAX_CHANNELS', '8'))
+    RTL_GAIN_REF_DB = float(os.getenv('RTL_GAIN_REF_DB', '29.7'))
+    print(f"DSP worker ring: {RING_SLOTS} frames of {CHUNK_SIZE} samples")
+    print(f"Tuning: center {CENTER_FREQ / 1e6:.3f} MHz, up to {MAX_CHANNELS} distinct client tunings, "
+          f"unity gain at {RTL_GAIN_REF_DB} dB")
 
-    # Start MQTT
-    mqtt.start()
+    # Shared-memory frame ring between the DSP worker and this process
+    ring = FrameRing(RING_SLOTS, 2 * CHUNK_SIZE, MAX_CHANNELS)
 
-    # Auto-start playback
-    iq_player.play()
+    # Playback, jamming, pacing, conversion and MQTT control run in the worker.
+    # Forked before the event loop starts, so it inherits the ring mapping.
+    worker = multiprocessing.get_context("fork").Process(
+        target=run_dsp_worker,
+        args=(ring, {
+            "iq_file": IQ_FILE,
+            "sample_rate": SAMPLE_RATE,
+            "chunk_size": CHUNK_SIZE,
+            "pacing_policy": PACING_POLICY,
+            "max_lag": PACING_MAX_LAG_MS / 1000,
+            "quantizer": RTL_QUANTIZER,
+            "mqtt_host": MQTT_HOST,
+            "mqtt_topic": MQTT_TOPIC,
+            "center_freq": CENTER_FREQ,
+            "spectrum_topic": SPECTRUM_TOPIC,
+            "spectrum_fft_size": SPECTRUM_FFT_SIZE,
+            "spectrum_overlap": SPECTRUM_OVERLAP,
+            "spectrum_rate": SPECTRUM_RATE,
+            "spectrum_db_min": SPECTRUM_DB_MIN,
+            "spectrum_db_max": SPECTRUM_DB_MAX,
+            "jamming_schedule": JAMMING_SCHEDULE,
+            "signal_power_tau": SIGNAL_POWER_TAU_S,
+            "channel_effects": CHANNEL_EFFECTS,
+            "scene_sources": SCENE_SOURCES,
+            "playback": PLAYBACK,
+            "record_dir": RECORD_DIR,
+            "record_format": RECORD_FORMAT,
+            "record_prefix": RECORD_PREFIX,
+            "record_rotate_mb": RECORD_ROTATE_MB,
+            "record_rotate_s": RECORD_ROTATE_S,
+            "record_on_start": RECORD_ON_START
+        }),
+        name="dsp-worker",
+        daemon=True
+    )
+    worker.start()
+
+    # docker stop sends SIGTERM: exit through the finally below so the ring is unlinked
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    # This process only serves sockets
+    rtl_tcp = RTLTCPServer(max_queue=CLIENT_QUEUE_CHUNKS, overflow_policy=CLIENT_OVERFLOW_POLICY,
+                           sample_rate=SAMPLE_RATE, center_freq=CENTER_FREQ,
+                           gain_ref_db=RTL_GAIN_REF_DB, max_channels=MAX_CHANNELS)
 
     print("✅ Service ready")
     print("=" * 60)
 
-    # Run server and streaming loop
+    try:
+        asyncio.run(serve(rtl_tcp, ring, worker))
+    finally:
+        worker.terminate()
+        # Give the worker time to close its recording
+        worker.join(timeout=5)
+        ring.close(unlink=True)
+
+async def serve(rtl_tcp, ring, worker):
+    """Run the rtl_tcp server and forward frames from the worker"""
     await asyncio.gather(
         rtl_tcp.start(),
-        stream_loop(iq_player, signal_mixer, rtl_tcp)
+        rtl_tcp.pump_frames(ring, worker)
     )
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    main()
@@ -1,67 +1,152 @@
 import paho.mqtt.client as mqtt
+import asyncio
 import json
 
+JAMMING_COMMANDS = {
+    "jamming_cw": "cw",
+    "jamming_noise": "noise",
+    "jamming_sweep": "sweep",
+    "jamming_pulse": "pulse",
+    "jamming_chirp": "chirp"
+}
+
 class MQTTHandler:
-    def __init__(self, iq_player, signal_mixer):
+    """Bridges inject commands from MQTT into the stream's event loop.
+
+    paho delivers messages on its own network thread. on_message only
+    decodes them there and queues each command on the event loop with
+    call_soon_threadsafe. One task on the loop applies them in arrival
+    order between chunks (the stream loop only yields while waiting for
+    the next chunk), so player, mixer and recorder state is only ever
+    touched by the DSP thread. Commands that open files (switch_iq, scene
+    recordings) do that in a worker thread, and later commands wait until
+    the load has landed: "switch_iq, then seek" seeks in the new file.
+    """
+
+    def __init__(self, iq_player, signal_mixer, topic, recorder=None):
         self.iq_player = iq_player
         self.signal_mixer = signal_mixer
+        self.recorder = recorder
+        self.topic = topic
         self.client = mqtt.Client()
+        self.loop = None
+        self.commands = None  # asyncio.Queue of (command, params), created in start()
+        self.worker = None
 
     def on_connect(self, client, userdata, flags, rc):
-        print(f"📨 Connected to MQTT broker")
-        client.subscribe("apex/team/sdr-rf/injects")
+        print(f"📨 Connected to MQTT broker, listening on {self.topic}")
+        client.subscribe(self.topic)
 
     def on_message(self, client, userdata, msg):
-        """Handle inject commands"""
+        """Decode an inject on paho's thread and pass trigger commands to the event loop"""
         try:
             inject = json.loads(msg.payload.decode())
 
             if inject.get("type") == "trigger":
                 command = inject["content"]["command"]
-                params = inject["content"].get("parameters", {})
-
-                # Playback controls
-                if command == "play":
-                    self.iq_player.play()
-
-                elif command == "pause":
-                    self.iq_player.pause()
-
-                elif command == "stop":
-                    self.iq_player.stop()
-
-                # Jamming controls
-                elif command == "jamming_cw":
-                    self.signal_mixer.set_jamming("cw", params.get("power_db", -30))
-
-                elif command == "jamming_noise":
-                    self.signal_mixer.set_jamming("noise", params.get("power_db", -30))
+                params = inject["content"].get("parameters") or {}
+                self.loop.call_soon_threadsafe(self.commands.put_nowait, (command, params))
 
-                elif command == "jamming_sweep":
-                    self.signal_mixer.set_jamming("sweep", params.get("power_db", -30))
-
-                elif command == "jamming_pulse":
-                    self.signal_mixer.set_jamming("pulse", params.get("power_db", -30))
-
-                elif command == "jamming_chirp":
-                    self.signal_mixer.set_jamming("chirp", params.get("power_db", -30))
+        except Exception as e:
+            print(f"❌ Error handling inject: {e}")
 
-                elif command == "jamming_clear":
-                    self.signal_mixer.clear_jamming()
+    async def _run_commands(self):
+        """Apply queued commands one at a time, each after the previous one has landed"""
+        while True:
+            command, params = await self.commands.get()
+            await self.dispatch(command, params)
 
-                # IQ file switching
-                elif command == "switch_iq":
-                    file_path = params.get("file")
-                    if file_path:
-                        self.iq_player.switch_file(file_path)
-                    else:
-                        print("❌ No file path provided for switch_iq")
+    async def dispatch(self, command, params):
+        """Apply one trigger command (event loop thread, between chunks)"""
+        try:
+            # Playback controls
+            if command == "play":
+                self.iq_player.play()
+
+            elif command == "pause":
+                self.iq_player.pause()
+
+            elif command == "stop":
+                self.iq_player.stop()
+
+            # Cueing: seek (time in seconds, or sample), playback rate and A/B loop
+            elif command == "seek":
+                self.iq_player.seek(params.get("time"), params.get("sample"))
+
+            elif command == "set_speed":
+                self.iq_player.set_speed(params.get("speed", 1.0))
+
+            elif command == "set_loop":
+                self.iq_player.set_loop(params.get("start"), params.get("end"),
+                                        params.get("start_sample"), params.get("end_sample"))
+
+            elif command == "clear_loop":
+                self.iq_player.clear_loop()
+
+            # Jamming controls. Parameters may time the change to the sample:
+            # time (stream seconds), at_sample or at (Unix time), plus ramp_s
+            # and duration_s; untimed changes apply to the next sample mixed.
+            # Levels are power_db (dBFS), or js_db / snr_db against the signal
+            elif command in JAMMING_COMMANDS:
+                self.signal_mixer.schedule_jamming(dict(params, type=JAMMING_COMMANDS[command]))
+
+            elif command == "jamming_level":
+                self.signal_mixer.set_jamming_level(**params)
+
+            elif command == "jamming_clear":
+                self.signal_mixer.clear_jamming(**params)
+
+            elif command == "jamming_schedule":
+                self.signal_mixer.load_schedule(params.get("entries", []), params.get("replace", True))
+
+            # Scene sources (extra recordings, emitters, always-on jammers)
+            elif command == "scene_add":
+                # Recording sources are mapped while they are built
+                await asyncio.to_thread(self.signal_mixer.scene.load, params.get("sources", []),
+                                        params.get("replace", False))
+
+            elif command == "scene_remove":
+                self.signal_mixer.scene.remove(params.get("ids", []))
+
+            elif command == "scene_clear":
+                self.signal_mixer.scene.clear()
+
+            # Link conditions for the main recording (see channel_effects.py):
+            # {"path_loss": {...}, "awgn": {...}, "atmosphere": {...},
+            # "doppler": {...}, "ramp_s": s}; sections left out keep their settings
+            elif command == "channel_set":
+                changes = dict(params)
+                ramp_s = changes.pop("ramp_s", None)
+                self.signal_mixer.set_channel(changes, ramp_s)
+
+            elif command == "channel_clear":
+                self.signal_mixer.clear_channel(params.get("ramp_s"))
+
+            # After-action recording of the mixed output
+            elif command in ("record_start", "record_stop"):
+                if self.recorder is None:
+                    print("❌ Recording is not enabled for this service")
+                elif command == "record_start":
+                    self.recorder.start()
+                else:
+                    self.recorder.stop()
+
+            # IQ file switching
+            elif command == "switch_iq":
+                file_path = params.get("file")
+                if file_path:
+                    await self.iq_player.open_file(file_path)
+                else:
+                    print("❌ No file path provided for switch_iq")
 
         except Exception as e:
-            print(f"❌ Error handling inject: {e}")
+            print(f"❌ Error handling {command}: {e}")
 
     def start(self, mqtt_host='mqtt', mqtt_port=1883):
-        """Start MQTT client"""
+        """Start MQTT client (call from the event loop that runs the stream)"""
+        self.loop = asyncio.get_running_loop()
+        self.commands = asyncio.Queue()
+        self.worker = self.loop.create_task(self._run_commands())
         self.client.on_connect = self.on_connect
         self.client.on_message = self.on_message
         self.client.connect(mqtt_host, mqtt_port)
@@ -0,0 +1,126 @@
+import asyncio
+import time
+
+class StreamPacer:
+    """Real-time pacing against a monotonic deadline.
+
+    Each chunk advances the deadline by exactly len(chunk) / sample_rate, and
+    the loop sleeps only for whatever is left after processing, so mixing,
+    conversion and socket writes no longer slow the effective sample rate.
+    When the loop falls more than max_lag behind, the overrun policy kicks in:
+      drop   - skip the missed samples and re-anchor the deadline to now
+      shrink - halve the chunk size (down to min_chunk_size) to cut per-chunk
+               latency; it grows back once the loop keeps up again
+    """
+
+    POLICIES = ("drop", "shrink")
+
+    def __init__(self, sample_rate, chunk_size=16384, policy="drop",
+                 max_lag=0.1, min_chunk_size=2048, report_interval=10.0):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown pacing policy: {policy}")
+
+        self.sample_rate = sample_rate
+        self.nominal_chunk_size = chunk_size
+        self.chunk_size = chunk_size
+        self.min_chunk_size = min_chunk_size
+        self.policy = policy
+        self.max_lag = max_lag
+        self.report_interval = report_interval
+
+        # Lifetime counters
+        self.total_samples = 0
+        self.overruns = 0
+        self.dropped_samples = 0
+        self.last_report = {}
+
+        self.reset()
+
+    def reset(self):
+        """Re-anchor the schedule (after pause/stop or a long stall)"""
+        self.deadline = None
+        self.on_time_chunks = 0
+        self._reset_window(time.monotonic())
+
+    def _reset_window(self, now):
+        self.window_start = now
+        self.window_samples = 0
+        self.window_jitter_sum = 0.0
+        self.window_jitter_max = 0.0
+        self.window_chunks = 0
+
+    async def wait(self, num_samples):
+        """Sleep until num_samples are due; return samples to drop (drop policy)"""
+        now = time.monotonic()
+        if self.deadline is None:
+            self.deadline = now
+
+        self.deadline += num_samples / self.sample_rate
+        self.total_samples += num_samples
+        self.window_samples += num_samples
+
+        delay = self.deadline - now
+        if delay > 0:
+            await asyncio.sleep(delay)
+            # Wake-up error: how late the event loop actually resumed us
+            lateness = max(0.0, time.monotonic() - self.deadline)
+        else:
+            lateness = -delay
+            # Yield so socket writers still run while we catch up
+            await asyncio.sleep(0)
+
+        self.window_chunks += 1
+        self.window_jitter_sum += lateness
+        self.window_jitter_max = max(self.window_jitter_max, lateness)
+
+        to_drop = self._handle_lag(lateness)
+        self._maybe_report()
+        return to_drop
+
+    def _handle_lag(self, lag):
+        if lag <= self.max_lag:
+            self.on_time_chunks += 1
+            # Shrink policy: grow back towards nominal after a run of on-time chunks
+            if self.chunk_size < self.nominal_chunk_size and self.on_time_chunks >= 32:
+                self.chunk_size = min(self.chunk_size * 2, self.nominal_chunk_size)
+                self.on_time_chunks = 0
+            return 0
+
+        self.overruns += 1
+        self.on_time_chunks = 0
+
+        if self.policy == "shrink" and self.chunk_size > self.min_chunk_size:
+            self.chunk_size = max(self.chunk_size // 2, self.min_chunk_size)
+            print(f"⚠️ Stream overrun ({lag * 1000:.1f} ms behind): chunk size -> {self.chunk_size}")
+            return 0
+
+        # Drop (or shrink already at its floor): skip what we missed and re-anchor
+        to_drop = int(lag * self.sample_rate)
+        self.dropped_samples += to_drop
+        self.deadline = time.monotonic()
+        print(f"⚠️ Stream overrun ({lag * 1000:.1f} ms behind): dropping {to_drop} samples")
+        return to_drop
+
+    def _maybe_report(self):
+        now = time.monotonic()
+        elapsed = now - self.window_start
+        if elapsed < self.report_interval:
+            return
+
+        actual_rate = self.window_samples / elapsed
+        self.last_report = {
+            "nominal_rate": self.sample_rate,
+            "actual_rate": actual_rate,
+            "rate_ratio": actual_rate / self.sample_rate,
+            "jitter_mean_ms": self.window_jitter_sum / max(self.window_chunks, 1) * 1000,
+            "jitter_max_ms": self.window_jitter_max * 1000,
+            "chunk_size": self.chunk_size,
+            "overruns": self.overruns,
+            "dropped_samples": self.dropped_samples
+        }
+        r = self.last_report
+        print(f"📊 Stream: {actual_rate / 1e6:.3f} MS/s ({r['rate_ratio'] * 100:.1f}% of nominal), "
+              f"jitter mean {r['jitter_mean_ms']:.2f} ms / max {r['jitter_max_ms']:.2f} ms, "
+              f"overruns {self.overruns}, dropped {self.dropped_samples}")
+
+        self._reset_window(now)
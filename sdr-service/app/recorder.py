@@ -0,0 +1,318 @@
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+import numpy as np
+from iq_convert import RTLConverter
+
+SIGMF_VERSION = "1.0.0"
+SIDECAR_SUFFIX = ".sigmf-meta"
+ORIGINALS_DIR_NAME = "originals"
+
+# format -> (SigMF datatype, file extension, bytes per sample)
+RECORD_FORMATS = {
+    "cf32": ("cf32_le", ".iq", 8),
+    "cu8": ("cu8", ".cu8", 2),
+}
+
+# cu8 mapping, the one rtl_tcp clients use (see RTLConverter); written into
+# the sidecar so the library ingestor decodes with the same offset and scale
+CU8_SCALE = 128.0
+CU8_OFFSET = 127.4
+
+# Hand-off unit between the DSP and writer threads: whole MiBs, so every
+# write() is one large block at a MiB-aligned file offset
+BUFFER_SAMPLES = 512 * 1024  # 4 MiB of complex64
+
+
+class _Segment:
+    """One recording file and the stretch of the stream it holds"""
+
+    def __init__(self, name, stream_start):
+        self.name = name
+        self.stream_start = stream_start
+        self.samples = 0
+
+
+class IQRecorder:
+    """Records the mixed stream (recording + scene + jamming) for after-action review.
+
+    The DSP thread only copies each chunk into a preallocated buffer; full
+    buffers go to a writer thread, which converts them (cu8), hashes them
+    and writes each with one unbuffered write. Nothing on the real-time
+    path blocks: if the disk falls so far behind that every buffer is in
+    flight, chunks are dropped and the file is closed at the gap, so each
+    file is one contiguous stretch of the stream and recording resumes in a
+    new file once buffers come back.
+
+    Files rotate after rotate_bytes of data or rotate_seconds of stream
+    time, whichever comes first. Each finished file gets a SigMF sidecar in
+    the IQ library's layout: cf32 recordings land as ready .iq datasets,
+    cu8 ones under originals/ with a "converting" sidecar, so the
+    orchestrator converts them to complex64 for playback. Every jamming
+    episode becomes a SigMF annotation spanning its samples.
+
+    start() and stop() may be called from any thread: like the mixer, they
+    only queue the change for the DSP thread, which applies it in write().
+    """
+
+    def __init__(self, directory, sample_rate, center_freq=None, prefix="recording", fmt="cf32",
+                 rotate_bytes=0, rotate_seconds=0, buffers=8, description=None):
+        if fmt not in RECORD_FORMATS:
+            raise ValueError(f"Unknown recording format: {fmt}")
+
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.center_freq = center_freq
+        self.prefix = prefix
+        self.datatype, self.extension, bytes_per_sample = RECORD_FORMATS[fmt]
+        self.description = description
+
+        # Rotation point in samples (0 = never)
+        limits = []
+        if rotate_bytes:
+            limits.append(int(rotate_bytes) // bytes_per_sample)
+        if rotate_seconds:
+            limits.append(int(rotate_seconds * sample_rate))
+        self.rotate_samples = min(limits) if limits else 0
+
+        self.inbox = deque()
+        self.free = deque(np.empty(BUFFER_SAMPLES, dtype=np.complex64) for _ in range(buffers))
+        self.queue = queue.Queue()
+        self.writer = None
+
+        # DSP thread state
+        self.position = 0  # stream samples seen; matches the jamming timeline's clock
+        self.recording = False
+        self.segment = None
+        self.buffer = None
+        self.filled = 0
+        self.file_index = 0
+        self.dropped_samples = 0  # in the current gap
+        self.episodes = []  # [stream_start, stream_end or None, jamming_type, level]
+
+    # --- control (any thread) ---
+
+    def start(self):
+        self.inbox.append(True)
+
+    def stop(self):
+        self.inbox.append(False)
+
+    # --- DSP thread ---
+
+    def jamming_changed(self, stream_sample, jamming_type=None, level=None):
+        """Jamming timeline listener: jamming_type None means jamming went off air"""
+        if self.episodes and self.episodes[-1][1] is None:
+            self.episodes[-1][1] = stream_sample
+        if not self.recording:
+            self.episodes.clear()
+        if jamming_type is not None:
+            self.episodes.append([stream_sample, None, jamming_type, level])
+
+    def _drain(self):
+        while self.inbox:
+            recording = self.inbox.popleft()
+            if recording == self.recording:
+                continue
+            self.recording = recording
+            if recording:
+                if self.writer is None:
+                    self.writer = threading.Thread(target=self._run, name="iq-recorder", daemon=True)
+                    self.writer.start()
+                print(f"⏺️ Recording to {self.directory} ({self.datatype})")
+            else:
+                self._finish()
+                print("⏹️ Recording stopped")
+
+    def _open(self):
+        self.file_index += 1
+        name = f"{self.prefix}-{time.strftime('%Y%m%d-%H%M%S')}-{self.file_index:03d}"
+        self.segment = _Segment(name, self.position)
+
+    def _finish(self):
+        """Hand the current file's last buffer and its metadata to the writer"""
+        segment = self.segment
+        if segment is None:
+            return
+        if self.filled:
+            self.queue.put((segment.name, self.buffer, self.filled))
+            self.buffer, self.filled = None, 0
+        self.segment = None
+        if segment.samples:
+            self.queue.put((segment.name, None, self._annotations(segment)))
+
+    def _annotations(self, segment):
+        """SigMF annotations for the jamming episodes overlapping a finished file"""
+        start, end = segment.stream_start, segment.stream_start + segment.samples
+        annotations = []
+        for episode_start, episode_end, jamming_type, level in self.episodes:
+            first = max(episode_start, start)
+            last = min(end if episode_end is None else episode_end, end)
+            if last > first:
+                annotations.append({
+                    "core:sample_start": first - start,
+                    "core:sample_count": last - first,
+                    "core:label": jamming_type,
+                    "core:comment": f"{jamming_type} jamming at {level}"
+                })
+        # Episodes over by now can't reach into later files
+        self.episodes = [e for e in self.episodes if e[1] is None or e[1] > end]
+        return annotations
+
+    def _append(self, data):
+        """Copy samples into the hand-off buffers; returns how many fitted"""
+        copied = 0
+        while copied < len(data):
+            if self.buffer is None:
+                if not self.free:
+                    break
+                self.buffer = self.free.popleft()
+            take = min(len(data) - copied, BUFFER_SAMPLES - self.filled)
+            self.buffer[self.filled:self.filled + take] = data[copied:copied + take]
+            self.filled += take
+            copied += take
+            if self.filled == BUFFER_SAMPLES:
+                self.queue.put((self.segment.name, self.buffer, self.filled))
+                self.buffer, self.filled = None, 0
+        return copied
+
+    def write(self, chunk):
+        """Record the next chunk of the mixed stream (call once per chunk, recording or not)"""
+        self._drain()
+        n = len(chunk)
+        offset = 0
+        while self.recording and offset < n:
+            if self.segment is None:
+                if not self.free:
+                    break  # still backed up
+                self._open()
+            take = n - offset
+            if self.rotate_samples:
+                take = min(take, self.rotate_samples - self.segment.samples)
+
+            copied = self._append(chunk[offset:offset + take])
+            self.segment.samples += copied
+            self.position += copied
+            offset += copied
+            if copied < take:
+                # Writer backed up: close the file at the gap rather than wait
+                self._finish()
+                break
+            if self.rotate_samples and self.segment.samples >= self.rotate_samples:
+                self._finish()
+
+        dropped = n - offset if self.recording else 0
+        if dropped and not self.dropped_samples:
+            print("⚠️ Recorder backed up: dropping samples until the writer catches up")
+        self.dropped_samples += dropped
+        if self.dropped_samples and not dropped and self.segment is not None:
+            print(f"⚠️ Recorder resumed after dropping {self.dropped_samples} samples")
+            self.dropped_samples = 0
+        self.position += n - offset
+
+    def close(self):
+        """Finish the current file and wait for the writer to flush everything"""
+        self._drain()
+        self._finish()
+        self.recording = False
+        if self.writer is not None:
+            self.queue.put(None)
+            self.writer.join()
+            self.writer = None
+
+    # --- writer thread ---
+
+    def _paths(self, name):
+        if self.datatype == "cf32_le":
+            data_path = os.path.join(self.directory, name + self.extension)
+        else:
+            data_path = os.path.join(self.directory, ORIGINALS_DIR_NAME, name + self.extension)
+        return data_path, os.path.join(self.directory, name + ".iq" + SIDECAR_SUFFIX)
+
+    def _run(self):
+        converter = RTLConverter(BUFFER_SAMPLES, CU8_SCALE, CU8_OFFSET) if self.datatype == "cu8" else None
+        files = {}  # name -> [file, sha512, samples]
+        failed = set()
+        while True:
+            message = self.queue.get()
+            if message is None:
+                break
+            name, buffer, payload = message
+            try:
+                if name in failed:
+                    continue
+                if buffer is not None:
+                    if name not in files:
+                        data_path, _ = self._paths(name)
+                        os.makedirs(os.path.dirname(data_path), exist_ok=True)
+                        # Unbuffered: each buffer goes to the kernel as one write
+                        files[name] = [open(data_path + ".partial", "wb", buffering=0), hashlib.sha512(), 0]
+                    entry = files[name]
+                    data = buffer[:payload] if converter is None else converter.convert(buffer[:payload])
+                    entry[0].write(data)
+                    entry[1].update(data)
+                    entry[2] += payload
+                elif name in files:
+                    self._finalize(name, *files.pop(name), payload)
+            except OSError as e:
+                print(f"❌ Recording {name} failed: {e}")
+                failed.add(name)
+                entry = files.pop(name, None)
+                if entry:
+                    entry[0].close()
+            finally:
+                if buffer is not None:
+                    self.free.append(buffer)
+
+    def _finalize(self, name, file, digest, num_samples, annotations):
+        file.close()
+        data_path, meta_path = self._paths(name)
+        os.replace(data_path + ".partial", data_path)
+
+        sha512 = digest.hexdigest()
+        recorder = "SCIP SDR service"
+        if self.datatype == "cf32_le":
+            bookkeeping = {
+                "core:sha512": sha512,
+                "scip:status": "ready",
+                "scip:num_samples": num_samples,
+                "scip:source": {"filename": os.path.basename(data_path), "path": os.path.basename(data_path),
+                                "datatype": self.datatype, "sha512": sha512}
+            }
+        else:
+            # The orchestrator converts it to complex64 and fills in the rest
+            bookkeeping = {
+                "scip:status": "converting",
+                "scip:source": {"filename": os.path.basename(data_path),
+                                "path": os.path.relpath(data_path, self.directory),
+                                "datatype": self.datatype, "data_offset": 0, "data_length": None,
+                                "offset": CU8_OFFSET, "scale": 1.0 / CU8_SCALE, "sha512": sha512}
+            }
+
+        capture = {"core:sample_start": 0}
+        if self.center_freq is not None:
+            capture["core:frequency"] = self.center_freq
+        document = {
+            "global": dict({
+                "core:datatype": "cf32_le",
+                "core:sample_rate": self.sample_rate,
+                "core:version": SIGMF_VERSION,
+                "core:dataset": name + ".iq",
+                "core:recorder": recorder,
+                "core:description": self.description or f"SDR output recording {name}"
+            }, **bookkeeping),
+            "captures": [capture],
+            "annotations": annotations
+        }
+        # Write-then-rename: the library index picks the file up when this lands
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump(document, f, indent=2)
+        os.replace(meta_path + ".tmp", meta_path)
+
+        size_mb = os.path.getsize(data_path) / (1024 * 1024)
+        print(f"💾 Recorded {os.path.basename(data_path)}: {num_samples} samples "
+              f"({num_samples / self.sample_rate:.1f} s, {size_mb:.1f} MB, {len(annotations)} annotations)")
@@ -1,12 +1,201 @@
 import asyncio
 import struct
-import numpy as np
+import time
+
+# rtl_tcp commands: 1-byte opcode + 4-byte big-endian argument
+CMD_SET_FREQUENCY = 0x01
+CMD_SET_SAMPLE_RATE = 0x02
+CMD_SET_GAIN_MODE = 0x03
+CMD_SET_GAIN = 0x04
+CMD_SET_GAIN_BY_INDEX = 0x0d
+
+# R820T gain steps (tenths of dB), as advertised in the dongle info
+R820T_GAINS = [0, 9, 14, 27, 37, 77, 87, 125, 144, 157, 166, 197, 207, 229, 254,
+               280, 297, 328, 338, 364, 372, 386, 402, 421, 434, 439, 445, 480, 496]
+
+class RTLClient:
+    """One GQRX connection with its own bounded send queue and writer task.
+
+    The stream loop only enqueues; the writer task does the socket writes,
+    so a slow or stalled client can fall behind (and lose chunks or be
+    disconnected) without holding up anyone else.
+    """
+
+    def __init__(self, writer, addr, max_queue=16, policy="drop-oldest"):
+        self.writer = writer
+        self.addr = addr
+        self.policy = policy
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.closed = False
+        self.task = None
+
+        # Tuning requested over rtl_tcp (None until the client sets it)
+        self.freq = None
+        self.sample_rate = None
+        self.manual_gain = False
+        self.gain_tenths_db = 0
+        self.channel = None
+        self.tuning = None
+
+        # Counters
+        self.connected_at = time.monotonic()
+        self.bytes_sent = 0
+        self.chunks_sent = 0
+        self.chunks_dropped = 0
+
+    def enqueue(self, data):
+        """Queue a chunk; returns False if the client should be disconnected"""
+        if self.closed:
+            return False
+
+        if self.queue.full():
+            if self.policy == "disconnect":
+                print(f"⚠️ GQRX client {self.addr} fell behind, disconnecting")
+                return False
+
+            # drop-oldest: discard the stalest chunk so the client stays near real time
+            self.queue.get_nowait()
+            self.chunks_dropped += 1
+
+        self.queue.put_nowait(data)
+        return True
+
+    async def run_writer(self):
+        """Drain the queue to the socket until the connection fails or closes"""
+        try:
+            while True:
+                data = await self.queue.get()
+                self.writer.write(data)
+                await self.writer.drain()
+                self.bytes_sent += len(data)
+                self.chunks_sent += 1
+        except (ConnectionError, OSError) as e:
+            print(f"❌ Write to GQRX client {self.addr} failed: {e}")
+        finally:
+            self.close()
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.writer.close()
+
+    def stats(self):
+        elapsed = max(time.monotonic() - self.connected_at, 1e-9)
+        return {
+            "addr": str(self.addr),
+            "bytes_sent": self.bytes_sent,
+            "chunks_sent": self.chunks_sent,
+            "chunks_dropped": self.chunks_dropped,
+            "queued": self.queue.qsize(),
+            "throughput_bps": self.bytes_sent / elapsed
+        }
+
 
 class RTLTCPServer:
-    def __init__(self, host='0.0.0.0', port=1234):
+    """rtl_tcp server emulating a tunable dongle over one wideband recording.
+
+    Clients retune with the standard rtl_tcp commands. Each distinct tuning
+    (offset from the recording's center frequency, sample rate, gain) is a
+    channel in the DSP worker's tuning table, shared by every client tuned
+    the same way; the worker down-converts each channel once per chunk and
+    frames are routed to clients by channel.
+    """
+
+    def __init__(self, host='0.0.0.0', port=1234, max_queue=16, overflow_policy="drop-oldest",
+                 sample_rate=1024000, center_freq=100000000, gain_ref_db=29.7,
+                 max_channels=8, report_interval=10.0):
         self.host = host
         self.port = port
+        self.max_queue = max_queue
+        self.overflow_policy = overflow_policy
+        self.sample_rate = sample_rate
+        self.center_freq = center_freq
+        self.gain_ref_db = gain_ref_db
+        self.max_channels = max_channels
+        self.report_interval = report_interval
         self.clients = []
+        self.channels = {}  # tuning -> [channel, client count]
+        self.ring = None
+        self.last_report = {}
+        self._last_arrival = {}  # channel -> monotonic time of its last frame
+
+    def _add_client(self, client):
+        self.clients.append(client)
+        self._retune(client)
+
+    def _remove_client(self, client):
+        if client in self.clients:
+            self.clients.remove(client)
+            self._release_channel(client.tuning)
+            client.channel = client.tuning = None
+
+    def _client_tuning(self, client):
+        """Map a client's rtl_tcp settings onto a (offset_hz, output_rate, gain) tuning"""
+        offset_hz = 0 if client.freq is None else client.freq - self.center_freq
+
+        output_rate = client.sample_rate or self.sample_rate
+        if output_rate > self.sample_rate:
+            print(f"⚠️ {client.addr} asked for {output_rate / 1e6:.3f} MS/s; "
+                  f"the recording only has {self.sample_rate / 1e6:.3f} MS/s")
+            output_rate = self.sample_rate
+
+        gain = 1.0
+        if client.manual_gain:
+            gain = round(10 ** ((client.gain_tenths_db / 10 - self.gain_ref_db) / 20), 4)
+        if abs(offset_hz) > self.sample_rate / 2:
+            # Tuned outside the recorded band: nothing to hear
+            gain = 0.0
+
+        return (int(offset_hz), int(output_rate), gain)
+
+    def _retune(self, client):
+        """Move a client onto the channel for its current settings"""
+        tuning = self._client_tuning(client)
+        if tuning == client.tuning:
+            return
+
+        if tuning in self.channels:
+            self.channels[tuning][1] += 1
+        else:
+            in_use = {channel for channel, _ in self.channels.values()}
+            free = [c for c in range(self.max_channels) if c not in in_use]
+            if not free:
+                print(f"⚠️ All {self.max_channels} channels in use; {client.addr} keeps its tuning")
+                return
+            self.channels[tuning] = [free[0], 1]
+            if self.ring is not None:
+                self.ring.set_channel(free[0], *tuning)
+
+        self._release_channel(client.tuning)
+        client.tuning = tuning
+        client.channel = self.channels[tuning][0]
+
+    def _release_channel(self, tuning):
+        if tuning not in self.channels:
+            return
+        self.channels[tuning][1] -= 1
+        if self.channels[tuning][1] <= 0:
+            channel, _ = self.channels.pop(tuning)
+            self._last_arrival.pop(channel, None)
+            if self.ring is not None:
+                self.ring.clear_channel(channel)
+
+    def handle_command(self, client, command, value):
+        """Apply one rtl_tcp command to a client's tuning"""
+        if command == CMD_SET_FREQUENCY:
+            client.freq = value
+        elif command == CMD_SET_SAMPLE_RATE:
+            client.sample_rate = value
+        elif command == CMD_SET_GAIN_MODE:
+            client.manual_gain = value == 1
+        elif command == CMD_SET_GAIN:
+            client.gain_tenths_db = struct.unpack('>i', struct.pack('>I', value))[0]
+        elif command == CMD_SET_GAIN_BY_INDEX:
+            client.gain_tenths_db = R820T_GAINS[min(value, len(R820T_GAINS) - 1)]
+        else:
+            # AGC, direct sampling, bias tee, etc. have no meaning for a recording
+            return
+        self._retune(client)
 
     def create_dongle_info(self):
         """RTL-TCP handshake: 12-byte header"""
@@ -22,46 +211,114 @@ class RTLTCPServer:
         writer.write(self.create_dongle_info())
         await writer.drain()
 
-        self.clients.append(writer)
+        client = RTLClient(writer, addr, self.max_queue, self.overflow_policy)
+        client.task = asyncio.create_task(client.run_writer())
+        self._add_client(client)
 
         try:
             # Keep connection alive, listen for commands
-            while True:
-                data = await reader.read(4)
-                if not data:
-                    break
-                # Commands from GQRX (frequency tuning, etc.)
-                # We ignore them for v1 simplicity
-        except:
+            while not client.closed:
+                command, value = struct.unpack('>BI', await reader.readexactly(5))
+                self.handle_command(client, command, value)
+        except asyncio.IncompleteReadError:
             pass
+        except (ConnectionError, OSError) as e:
+            print(f"❌ GQRX connection error {addr}: {e}")
         finally:
-            if writer in self.clients:
-                self.clients.remove(writer)
-            writer.close()
-            print(f"❌ GQRX disconnected: {addr}")
-
-    async def broadcast_samples(self, iq_chunk):
-        """Send IQ samples to all connected GQRX clients"""
-        if not self.clients or iq_chunk is None:
-            return
+            self._remove_client(client)
+            client.task.cancel()
+            client.close()
+            stats = client.stats()
+            print(f"❌ GQRX disconnected: {addr} "
+                  f"(sent {stats['bytes_sent'] / 1e6:.1f} MB, "
+                  f"{stats['throughput_bps'] / 1e6:.2f} MB/s, "
+                  f"dropped {stats['chunks_dropped']} chunks)")
 
-        # Convert complex64 to uint8 I/Q pairs (RTL-TCP format)
-        i = ((iq_chunk.real * 127.5) + 127.5).astype(np.uint8)
-        q = ((iq_chunk.imag * 127.5) + 127.5).astype(np.uint8)
+    def broadcast_frame(self, data, channel=0):
+        """Queue one finished rtl_tcp frame for every client on its channel"""
+        # Every client queue holds a reference to the same bytes
+        for client in self.clients[:]:
+            if client.channel != channel:
+                continue
+            if not client.enqueue(data):
+                self._remove_client(client)
+                client.close()
 
-        # Interleave
-        iq_bytes = np.empty(len(iq_chunk) * 2, dtype=np.uint8)
-        iq_bytes[0::2] = i
-        iq_bytes[1::2] = q
+    async def pump_frames(self, ring, worker):
+        """
+        Forward frames from the DSP worker's ring to the clients.
 
-        # Broadcast to all clients
-        for client in self.clients[:]:
-            try:
-                client.write(iq_bytes.tobytes())
-                await client.drain()
-            except:
-                if client in self.clients:
-                    self.clients.remove(client)
+        Wakes on the ring's doorbell pipe, so this loop does nothing but copy
+        frames out of shared memory and queue them. Also measures frame
+        arrival jitter against each frame's duration and exits if the worker
+        process dies.
+        """
+        self.ring = ring
+        for tuning, (channel, _) in self.channels.items():
+            ring.set_channel(channel, *tuning)
+
+        loop = asyncio.get_running_loop()
+        doorbell = asyncio.Event()
+        loop.add_reader(ring.doorbell_read, doorbell.set)
+
+        window_start = time.monotonic()
+        window_frames = 0
+        window_jitter_sum = 0.0
+        window_jitter_max = 0.0
+
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(doorbell.wait(), timeout=1.0)
+                except asyncio.TimeoutError:
+                    if not worker.is_alive():
+                        raise RuntimeError(f"DSP worker exited (code {worker.exitcode})")
+                    # Idle (nobody connected): don't count the gap as jitter
+                    self._last_arrival.clear()
+                    continue
+                doorbell.clear()
+                ring.drain_doorbell()
+
+                for channel, generation, data in ring.read_frames():
+                    if generation != ring.generation(channel):
+                        # Made for an earlier tuning of a reused channel index
+                        continue
+                    now = time.monotonic()
+                    previous = self._last_arrival.get(channel)
+                    if previous is not None:
+                        # How far this frame's arrival strays from its channel's previous frame duration
+                        arrival, duration = previous
+                        jitter = abs((now - arrival) - duration)
+                        window_jitter_sum += jitter
+                        window_jitter_max = max(window_jitter_max, jitter)
+                        window_frames += 1
+                    tuning = next((t for t, (c, _) in self.channels.items() if c == channel), None)
+                    rate = tuning[1] if tuning else self.sample_rate
+                    self._last_arrival[channel] = (now, len(data) / 2 / rate)
+                    self.broadcast_frame(data, channel)
+
+                now = time.monotonic()
+                if now - window_start >= self.report_interval:
+                    if window_frames:
+                        self.last_report = {
+                            "frames": window_frames,
+                            "jitter_mean_ms": window_jitter_sum / window_frames * 1000,
+                            "jitter_max_ms": window_jitter_max * 1000,
+                            "frames_lost": ring.frames_lost
+                        }
+                        r = self.last_report
+                        print(f"📊 Delivery: {window_frames} frames, jitter mean {r['jitter_mean_ms']:.2f} ms / "
+                              f"max {r['jitter_max_ms']:.2f} ms, ring frames lost {ring.frames_lost}")
+                    window_start = now
+                    window_frames = 0
+                    window_jitter_sum = 0.0
+                    window_jitter_max = 0.0
+        finally:
+            loop.remove_reader(ring.doorbell_read)
+
+    def client_stats(self):
+        """Per-client throughput and drop counters"""
+        return [client.stats() for client in self.clients]
 
     async def start(self):
         """Start RTL-TCP server"""
@@ -0,0 +1,169 @@
+from collections import deque
+import numpy as np
+from iq_player import map_iq_file
+from jammers import NoiseJammer, tone_jammer, linear_fm_jammer, pulse_jammer, make_jammer
+
+class RecordingSource:
+    """A looping (or one-shot) IQ recording placed at a frequency offset.
+
+    The recording must already be at the stream's sample rate. It is
+    memory-mapped like the main recording, and shifted by a phase-continuous
+    NCO whose output carries the source gain.
+    """
+
+    def __init__(self, samples, sample_rate, offset_hz=0.0, gain=1.0, loop=True):
+        self.samples = samples
+        self.gain = gain
+        self.loop = loop
+        self.position = 0
+        self.nco = tone_jammer(sample_rate, offset_hz, amplitude=1.0) if offset_hz else None
+
+    @property
+    def active(self):
+        return self.loop or self.position < len(self.samples)
+
+    def add_to(self, out, scratch):
+        """Accumulate the next len(out) samples into out, using scratch as workspace"""
+        n = len(out)
+        if self.nco is not None:
+            self.nco.generate(scratch, self.gain)
+        else:
+            scratch[:] = self.gain
+
+        filled = 0
+        while filled < n and self.active:
+            take = min(n - filled, len(self.samples) - self.position)
+            segment = scratch[filled:filled + take]
+            np.multiply(segment, self.samples[self.position:self.position + take], out=segment)
+            filled += take
+            self.position += take
+            if self.loop and self.position == len(self.samples):
+                self.position = 0
+
+        np.add(out[:filled], scratch[:filled], out=out[:filled])
+
+
+class EmitterSource:
+    """A synthetic emitter: any generator with a generate(out, gain) method"""
+
+    active = True
+
+    def __init__(self, generator, gain=1.0):
+        self.generator = generator
+        self.gain = gain
+
+    def add_to(self, out, scratch):
+        self.generator.generate(scratch, self.gain)
+        np.add(out, scratch, out=out)
+
+
+def build_source(spec, sample_rate):
+    """
+    Build a scene source from a scenario/MQTT spec
+
+    Spec keys:
+        kind: recording, tone, sweep, pulse, noise or jammer
+        power_db: source level in dBFS (default -20)
+        offset_hz: frequency offset from the stream center (default 0)
+        recording: file, loop (default true)
+        sweep: f_start, f_stop (Hz), period_s
+        pulse: pulse_width, pulse_period (samples)
+        jammer: type (any make_jammer type, at its built-in offset)
+
+    Raises:
+        ValueError: unknown kind, or a recording that can't be mapped
+    """
+    kind = spec.get("kind")
+    gain = 10 ** (float(spec.get("power_db", -20)) / 20)
+    offset_hz = float(spec.get("offset_hz", 0.0))
+
+    if kind == "recording":
+        samples = map_iq_file(spec["file"])
+        if samples is None:
+            raise ValueError(f"Cannot map recording: {spec['file']}")
+        return RecordingSource(samples, sample_rate, offset_hz, gain, spec.get("loop", True))
+
+    if kind == "tone":
+        generator = tone_jammer(sample_rate, offset_hz, amplitude=1.0)
+    elif kind == "sweep":
+        generator = linear_fm_jammer(sample_rate, float(spec["f_start"]), float(spec["f_stop"]),
+                                     float(spec.get("period_s", 0.016)), amplitude=1.0)
+    elif kind == "pulse":
+        generator = pulse_jammer(sample_rate, offset_hz, int(spec.get("pulse_width", 1024)),
+                                 int(spec.get("pulse_period", 4096)), amplitude=1.0)
+    elif kind == "noise":
+        generator = NoiseJammer(amplitude=1.0)
+    elif kind == "jammer":
+        generator = make_jammer(spec.get("type"), sample_rate)
+        if generator is None:
+            raise ValueError(f"Unknown jamming type: {spec.get('type')}")
+    else:
+        raise ValueError(f"Unknown source kind: {kind}")
+
+    return EmitterSource(generator, gain)
+
+
+class SceneCompositor:
+    """Sums any number of extra sources into the stream.
+
+    Sources (recordings at offsets, synthetic emitters, always-on jammers)
+    are accumulated one after another into the caller's output buffer,
+    each through one shared scratch buffer, so a chunk costs one generate
+    and one add per active source and nothing is allocated per chunk.
+    Sources that have run out (one-shot recordings) are skipped.
+
+    Like the jamming timeline, changes may come from any thread: they are
+    queued on a deque and applied by the DSP thread at the top of a chunk,
+    so sources are only ever touched by one thread.
+    """
+
+    def __init__(self, sample_rate):
+        self.sample_rate = sample_rate
+        self.inbox = deque()
+        self.sources = {}  # id -> source, in insertion order
+
+    # --- producer side (any thread) ---
+
+    def load(self, specs, replace=False):
+        """
+        Queue a batch of source specs (each with an "id"); all-or-nothing
+
+        Returns:
+            True if queued, False if any spec was rejected
+        """
+        try:
+            sources = [(spec["id"], build_source(spec, self.sample_rate)) for spec in specs]
+        except (KeyError, ValueError, TypeError) as e:
+            print(f"❌ Rejected scene sources: {e}")
+            return False
+        self.inbox.append((replace, sources, ()))
+        return True
+
+    def remove(self, source_ids):
+        self.inbox.append((False, (), tuple(source_ids)))
+
+    def clear(self):
+        self.inbox.append((True, (), ()))
+
+    # --- DSP thread ---
+
+    def _drain(self):
+        while self.inbox:
+            replace, sources, removed = self.inbox.popleft()
+            if replace:
+                self.sources = {}
+            for source_id in removed:
+                self.sources.pop(source_id, None)
+            self.sources.update(sources)
+            print(f"🛰️ Scene: {len(self.sources)} source(s) ({', '.join(self.sources) or 'none'})")
+
+    def has_sources(self):
+        self._drain()
+        return bool(self.sources)
+
+    def add_to(self, out, scratch):
+        """Accumulate every active source into out (scratch must be at least len(out))"""
+        scratch = scratch[:len(out)]
+        for source in self.sources.values():
+            if source.active:
+                source.add_to(out, scratch)
@@ -1,83 +1,269 @@
 import numpy as np
+from channel_effects import ChannelEffects
+from jammers import make_jammer
+from jamming_schedule import JammingTimeline, parse_schedule_entry
+from scene import SceneCompositor
+from signal_power import SignalPowerEstimator
 
 class SignalMixer:
-    def __init__(self):
-        self.jamming_type = None
-        self.jamming_power = 0.0
-
-    def set_jamming(self, jamming_type, power_db=-30):
-        """Enable jamming with specified type and power"""
-        self.jamming_type = jamming_type
-        # Convert dB to linear amplitude
-        self.jamming_power = 10 ** (power_db / 20)
-        print(f"🔴 Jamming enabled: {jamming_type} @ {power_db} dB")
-
-    def clear_jamming(self):
-        """Disable jamming"""
-        self.jamming_type = None
-        self.jamming_power = 0.0
-        print("✅ Jamming cleared")
+    """Mixes jamming and scene sources into the IQ stream as a float32/complex64 pipeline.
+
+    Jamming comes from stateful generators (see jammers.py) that carry their
+    phase across chunks, switched on and off at exact sample indices by a
+    JammingTimeline (see jamming_schedule.py). Jamming is written straight
+    into a preallocated scratch buffer (scaled by the jamming power on the
+    way) and accumulated in place, so the steady-state hot path allocates
+    nothing and never upcasts to complex128. The array returned by
+    mix_signals is reused: it is only valid until the next call.
+
+    Any further sources (other recordings, synthetic emitters, always-on
+    jammers) come from a SceneCompositor (see scene.py), accumulated into
+    the same output buffer.
+
+    The clean recording's power is tracked by a running estimator (see
+    signal_power.py), the reference for jamming levels given as J/S or SNR.
+
+    Before anything is mixed in, the recording goes through a ChannelEffects
+    link model (see channel_effects.py: path loss, rain fade, Doppler,
+    AWGN). Jamming and scene sources reach the receiver by other paths and
+    are not impaired; J/S levels stay referenced to the unimpaired
+    recording, so a fade worsens the effective J/S.
+
+    set_jamming, clear_jamming, load_schedule, set_channel, clear_channel
+    and the scene's load/remove may be called from any thread (e.g. the MQTT client's); they only queue
+    changes for the thread that calls mix_signals.
+    """
+
+    def __init__(self, sample_rate=1024000, max_samples=16384, signal_power_tau=1.0, center_freq=None):
+        self.sample_rate = sample_rate
+        self.signal_power = SignalPowerEstimator(sample_rate, signal_power_tau)
+        self.channel = ChannelEffects(sample_rate, center_freq, max_samples)
+        self.timeline = JammingTimeline(sample_rate)
+        self.scene = SceneCompositor(sample_rate)
+        self._allocate(max_samples)
+
+    def _allocate(self, max_samples):
+        """(Re)allocate scratch buffers for chunks of up to max_samples"""
+        self.max_samples = max_samples
+        self._jam = np.empty(max_samples, dtype=np.complex64)
+        self._out = np.empty(max_samples, dtype=np.complex64)
+
+    @property
+    def jamming_type(self):
+        return self.timeline.jamming_type
+
+    def schedule_jamming(self, entry):
+        """Queue one schedule entry (see parse_schedule_entry); returns False if rejected"""
+        return self.load_schedule([entry], replace=False)
+
+    def set_jamming(self, jamming_type, power_db=-30, **timing):
+        """Enable jamming with specified type and power (now, or as timed by the timing keys)
+
+        Pass js_db or snr_db among the keys to set the level relative to the signal instead.
+        """
+        return self.schedule_jamming(dict(timing, type=jamming_type, power_db=power_db))
+
+    def set_jamming_level(self, **level):
+        """Glide the jamming on air to a new power_db, js_db or snr_db over ramp_s"""
+        return self.schedule_jamming(dict(level, type="level"))
+
+    def clear_jamming(self, **timing):
+        """Disable jamming (now, or as timed by the timing keys)"""
+        return self.schedule_jamming(dict(timing, type="clear"))
+
+    def set_channel(self, changes, ramp_s=None):
+        """Change the link conditions (see ChannelEffects.configure); returns False if rejected"""
+        try:
+            if ramp_s is None:
+                self.channel.configure(changes)
+            else:
+                self.channel.configure(changes, ramp_s)
+        except (ValueError, TypeError) as e:
+            print(f"❌ Rejected channel settings: {e}")
+            return False
+        return True
+
+    def clear_channel(self, ramp_s=None):
+        """Glide back to the unimpaired recording"""
+        return self.set_channel(ChannelEffects.defaults(), ramp_s)
+
+    def load_schedule(self, entries, replace=True):
+        """
+        Queue a batch of schedule entries
+
+        The batch is all-or-nothing: one bad entry rejects it. With replace,
+        changes still pending from earlier schedules are dropped.
+        """
+        try:
+            events = [parse_schedule_entry(entry, self.sample_rate) for entry in entries]
+        except (ValueError, TypeError) as e:
+            print(f"❌ Rejected jamming schedule: {e}")
+            return False
+
+        self.timeline.submit(events, replace)
+        if len(events) > 1 or any(event.start is not None or event.at_time is not None for event in events):
+            print(f"🗓️ Jamming schedule: {len(events)} change(s) queued")
+        return True
 
     def mix_signals(self, clean_iq):
         """Mix jamming signal into clean IQ samples"""
-        if self.jamming_type is None or len(clean_iq) == 0:
+        num_samples = len(clean_iq)
+        if num_samples == 0:
             return clean_iq
+        if num_samples > self.max_samples:
+            self._allocate(num_samples)
 
-        # Generate jamming signal based on type
-        jamming_iq = self._generate_jamming(len(clean_iq), self.jamming_type)
+        # The recording as received over the link (into out, unless the link is transparent)
+        signal_power = self.signal_power.update(clean_iq)
+        out = self._out[:num_samples]
+        received = self.channel.process(clean_iq, out, signal_power)
 
-        # Mix with appropriate power level
-        mixed = clean_iq + (jamming_iq * self.jamming_power)
+        # Generate the next stretch of jamming at the right power level, then mix in place
+        jamming_iq = self._jam[:num_samples]
+        jamming = self.timeline.render(jamming_iq, signal_power)
+        has_scene = self.scene.has_sources()
+        if not (jamming or has_scene):
+            return received
 
-        return mixed
+        if jamming:
+            np.add(received, jamming_iq, out=out)
+        elif received is not out:
+            np.copyto(out, received)
 
-    def _generate_jamming(self, num_samples, jamming_type):
-        """
-        Generate jamming signal
+        if has_scene:
+            # The jamming is in out by now, so its buffer serves as the scene's scratch
+            self.scene.add_to(out, self._jam)
 
-        TODO: REPLACE THIS WITH YOUR ACTUAL JAMMING CODE
+        return out
 
-        This is a placeholder implementation with basic jamming types.
-        Integrate your existing jamming code here.
-        """
 
-        if jamming_type == "cw":
-            # Continuous Wave (pure tone at offset frequency)
-            t = np.arange(num_samples) / 1024000  # Sample rate
-            freq_offset = 50000  # 50 kHz offset
-            jamming = 0.5 * np.exp(2j * np.pi * freq_offset * t)
-
-        elif jamming_type == "noise":
-            # Wideband noise jamming
-            i = np.random.randn(num_samples) * 0.5
-            q = np.random.randn(num_samples) * 0.5
-            jamming = i + 1j * q
-
-        elif jamming_type == "sweep":
-            # Frequency sweep jammer
-            t = np.arange(num_samples) / 1024000
-            sweep_rate = 1000000  # 1 MHz/sec sweep
-            freq = 0 + sweep_rate * t
-            jamming = 0.5 * np.exp(2j * np.pi * freq * t)
-
-        elif jamming_type == "pulse":
-            # Pulsed jamming (on/off pattern)
-            pulse_pattern = np.zeros(num_samples, dtype=np.complex64)
-            pulse_width = 1024  # samples
-            pulse_period = 4096  # samples
-            for i in range(0, num_samples, pulse_period):
-                pulse_pattern[i:i+pulse_width] = 0.7
-            jamming = pulse_pattern * np.exp(2j * np.pi * 0.1 * np.arange(num_samples))
-
-        elif jamming_type == "chirp":
-            # Chirp jammer (linear frequency modulation)
-            t = np.arange(num_samples) / 1024000
-            chirp_rate = 500000  # Hz/sec
-            phase = 2 * np.pi * (0.5 * chirp_rate * t**2)
-            jamming = 0.5 * np.exp(1j * phase)
-
-        else:
-            # No jamming
-            jamming = np.zeros(num_samples, dtype=np.complex64)
-
-        return jamming
+if __name__ == "__main__":
+    # Regression self-check: python signal_mixer.py
+    # Output must stay complex64, steady-state mixing must not allocate, and
+    # jamming must be seamless however the stream is chunked.
+    import tracemalloc
+
+    chunk_size = 16384
+    mixer = SignalMixer()
+    clean = np.zeros(chunk_size, dtype=np.complex64)
+
+    for jamming_type in ("cw", "noise", "sweep", "pulse", "chirp"):
+        mixer.set_jamming(jamming_type, -10)
+        mixer.mix_signals(clean)  # warm up
+
+        # numpy reports its data buffers to tracemalloc, so any per-chunk
+        # temporary (>= 64 KB here) shows up in the traced peak
+        tracemalloc.start()
+        baseline, _ = tracemalloc.get_traced_memory()
+        for _ in range(20):
+            mixed = mixer.mix_signals(clean)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        growth = peak - baseline
+        assert mixed.dtype == np.complex64, f"{jamming_type}: output dtype {mixed.dtype}"
+        assert growth < 4096, f"{jamming_type}: {growth} bytes allocated while mixing"
+
+        if jamming_type != "noise":
+            # Odd-sized chunks must reproduce one long block exactly
+            whole = make_jammer(jamming_type).generate(np.empty(100000, dtype=np.complex64))
+            pieces = make_jammer(jamming_type)
+            chunked = np.concatenate([pieces.generate(np.empty(size, dtype=np.complex64))
+                                      for size in (1000, 16384, 3, 50000, 32613)])
+            assert np.allclose(whole, chunked, atol=1e-5), f"{jamming_type}: chunking changes the waveform"
+
+        print(f"✅ {jamming_type}: complex64 out, peak allocation {growth} bytes")
+
+    # Scheduled changes must land on their exact sample, whatever the chunking
+    mixer = SignalMixer()
+    mixer.load_schedule([
+        {"type": "cw", "power_db": 0, "at_sample": 20000, "duration_s": 5000 / mixer.sample_rate},
+        {"type": "noise", "power_db": 0, "at_sample": 40000, "ramp_s": 1000 / mixer.sample_rate},
+        {"type": "clear", "at_sample": 50000},
+    ])
+    mixed = np.concatenate([mixer.mix_signals(np.zeros(size, dtype=np.complex64)).copy()
+                            for size in (16384, 1000, 16384, 3, 16384, 16384)])
+    on_air = np.flatnonzero(np.abs(mixed) > 0)
+    assert on_air[0] == 20000 and np.all(np.abs(mixed[20000:25000]) > 0), "cw onset/duration off"
+    assert not np.any(mixed[25000:40001]), "jamming outside its window"
+    # Noise power over the first half of the ramp averages 1/12 of full power
+    ramp_power = np.mean(np.abs(mixed[40000:40500]) ** 2)
+    full_power = np.mean(np.abs(mixed[41000:49000]) ** 2)
+    assert ramp_power < 0.25 * full_power, "noise onset not ramped"
+    assert np.any(mixed[49000:50000]) and not np.any(mixed[50000:]), "clear not sample-accurate"
+    print("✅ schedule: onsets, durations, ramps and clears land on their samples")
+
+    # J/S levels track the recording's power, whatever its absolute level
+    for signal_db in (-40, -10):
+        mixer = SignalMixer()
+        rng = np.random.default_rng(1)
+        amplitude = 10 ** (signal_db / 20) / np.sqrt(2)
+        clean = (amplitude * (rng.standard_normal(chunk_size) + 1j * rng.standard_normal(chunk_size))).astype(np.complex64)
+        mixer.set_jamming("cw", js_db=-6)
+        for _ in range(8):
+            mixed = mixer.mix_signals(clean)
+        jam_power = np.mean(np.abs(mixed - clean) ** 2)
+        js = 10 * np.log10(jam_power / np.mean(np.abs(clean) ** 2))
+        assert abs(js + 6) < 0.1, f"J/S -6 dB measured {js:.2f} dB at {signal_db} dBFS signal"
+
+        # A level glide moves the gain smoothly: no sample-to-sample jump in the envelope
+        mixer.set_jamming_level(js_db=6, ramp_s=4 * chunk_size / mixer.sample_rate)
+        envelope = np.concatenate([np.abs(mixer.mix_signals(clean) - clean) for _ in range(6)])
+        assert np.max(np.abs(np.diff(envelope))) < 1e-3 * envelope.max(), "level glide steps"
+        assert abs(envelope[-1] / envelope[0] - 10 ** (12 / 20)) < 0.05, "glide did not reach the new level"
+        print(f"✅ J/S at {signal_db} dBFS signal: {js:.2f} dB (set -6), glide smooth")
+
+    # Channel effects: Doppler phase runs on across chunks of any size, without allocating
+    sample_rate = 1024000
+    tone = (0.1 * np.exp(2j * np.pi * 10000 * np.arange(100000) / sample_rate)).astype(np.complex64)
+    outputs = []
+    for sizes in ((100000,), (16384, 1000, 3, 50000, 32613)):
+        mixer = SignalMixer(sample_rate, center_freq=100e6)
+        mixer.set_channel({"doppler": {"enabled": True, "shift_hz": 2500, "rate_hz_s": -4000},
+                           "atmosphere": {"enabled": True, "rain_fade_db": 6}}, ramp_s=0)
+        bounds = np.cumsum((0,) + sizes)
+        outputs.append(np.concatenate([mixer.mix_signals(tone[a:b]).copy() for a, b in zip(bounds, bounds[1:])]))
+    whole, chunked = outputs
+    assert np.allclose(whole[20000:], chunked[20000:], atol=1e-5), "channel: chunking changes the output"
+    assert abs(np.mean(np.abs(whole[-1000:]) ** 2) / 0.01 - 10 ** -0.6) < 0.01, "channel: rain fade level off"
+    mixer.set_channel({"awgn": {"enabled": True, "snr_db": 10}})
+    mixer.mix_signals(clean)
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    for _ in range(20):
+        mixed = mixer.mix_signals(clean)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert mixed.dtype == np.complex64 and peak - baseline < 4096, "channel: allocates"
+    # Clearing goes fully transparent again, and drift stops at the Doppler limit
+    mixer.clear_channel(ramp_s=0)
+    mixer.mix_signals(clean)
+    assert mixer.mix_signals(clean) is clean, "channel: not transparent after clear"
+    mixer.set_channel({"doppler": {"enabled": True, "shift_hz": 0, "rate_hz_s": 1e6}})
+    for _ in range(40):
+        mixer.mix_signals(clean)
+    assert abs(mixer.channel.doppler.value) <= mixer.channel.max_doppler_hz, "channel: drift unbounded"
+    print(f"✅ channel: phase-continuous Doppler, fade and AWGN, peak allocation {peak - baseline} bytes")
+
+    # Scene sources: no allocation per chunk, and cost linear in the number of sources
+    import time
+    clean = np.zeros(chunk_size, dtype=np.complex64)
+    for count in (0, 4, 8, 16):
+        mixer = SignalMixer()
+        mixer.set_jamming("noise", -30)
+        mixer.scene.load([{"id": f"e{i}", "kind": ("tone", "pulse", "noise", "jammer")[i % 4],
+                           "type": "sweep", "offset_hz": 10000 * i, "power_db": -40}
+                          for i in range(count)])
+        mixer.mix_signals(clean)
+
+        tracemalloc.start()
+        baseline, _ = tracemalloc.get_traced_memory()
+        started = time.perf_counter()
+        for _ in range(50):
+            mixed = mixer.mix_signals(clean)
+        elapsed = (time.perf_counter() - started) / 50
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        assert mixed.dtype == np.complex64 and peak - baseline < 4096, f"{count} sources: allocates"
+        print(f"✅ scene with {count:2d} sources: {elapsed * 1e3:.2f} ms/chunk, peak allocation {peak - baseline} bytes")
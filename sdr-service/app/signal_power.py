@@ -0,0 +1,33 @@
+import math
+import numpy as np
+
+class SignalPowerEstimator:
+    """Running mean power of the stream, exponentially averaged.
+
+    Each chunk costs one dot product (mean |x|^2, no temporaries). The
+    averaging weight is derived from the chunk length, so the time constant
+    is tau seconds whatever the chunk size; the first chunk seeds the
+    estimate directly instead of averaging up from zero.
+    """
+
+    def __init__(self, sample_rate, tau=1.0):
+        self.sample_rate = sample_rate
+        self.tau = tau
+        self.power = 0.0
+        self.seeded = False
+
+    def update(self, chunk):
+        n = len(chunk)
+        if n == 0:
+            return self.power
+        chunk_power = float(np.vdot(chunk, chunk).real) / n
+        if not self.seeded:
+            self.power, self.seeded = chunk_power, True
+        else:
+            alpha = 1.0 - math.exp(-n / (self.tau * self.sample_rate))
+            self.power += alpha * (chunk_power - self.power)
+        return self.power
+
+    @property
+    def power_db(self):
+        return 10 * math.log10(self.power) if self.power > 0 else float("-inf")
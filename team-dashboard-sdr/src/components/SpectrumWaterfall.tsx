@@ -0,0 +1,112 @@
+import { useCallback, useEffect, useRef } from 'react';
+import { useSpectrum } from '../hooks/useSpectrum';
+
+interface SpectrumWaterfallProps {
+  brokerUrl: string;
+  topic: string;
+  history?: number;
+}
+
+const SPECTRUM_HEIGHT = 120;
+
+// 0..255 (db_min..db_max) -> dark blue through yellow to white
+const PALETTE = (() => {
+  const stops = [
+    [0, 0, 16], [0, 0, 128], [0, 160, 200], [240, 220, 0], [255, 64, 0], [255, 255, 255],
+  ];
+  const palette = new Uint8ClampedArray(256 * 4);
+  for (let i = 0; i < 256; i++) {
+    const position = (i / 255) * (stops.length - 1);
+    const index = Math.min(Math.floor(position), stops.length - 2);
+    const t = position - index;
+    for (let c = 0; c < 3; c++) {
+      palette[i * 4 + c] = stops[index][c] + (stops[index + 1][c] - stops[index][c]) * t;
+    }
+    palette[i * 4 + 3] = 255;
+  }
+  return palette;
+})();
+
+export const SpectrumWaterfall = ({ brokerUrl, topic, history = 200 }: SpectrumWaterfallProps) => {
+  const spectrumRef = useRef<HTMLCanvasElement>(null);
+  const waterfallRef = useRef<HTMLCanvasElement>(null);
+
+  const drawRow = useCallback((row: Uint8Array) => {
+    const spectrum = spectrumRef.current;
+    const waterfall = waterfallRef.current;
+    if (!spectrum || !waterfall) return;
+
+    // Canvases are sized to the row on first use (or when the FFT size changes)
+    if (spectrum.width !== row.length) {
+      spectrum.width = row.length;
+      waterfall.width = row.length;
+    }
+
+    const ctx = spectrum.getContext('2d');
+    if (ctx) {
+      ctx.fillStyle = '#0b1020';
+      ctx.fillRect(0, 0, spectrum.width, spectrum.height);
+      ctx.strokeStyle = '#38bdf8';
+      ctx.beginPath();
+      for (let x = 0; x < row.length; x++) {
+        const y = spectrum.height - (row[x] / 255) * spectrum.height;
+        if (x === 0) ctx.moveTo(x, y);
+        else ctx.lineTo(x, y);
+      }
+      ctx.stroke();
+    }
+
+    const wctx = waterfall.getContext('2d');
+    if (wctx) {
+      // Scroll down one line, then paint the new row on top
+      wctx.drawImage(waterfall, 0, 1);
+      const line = wctx.createImageData(row.length, 1);
+      for (let x = 0; x < row.length; x++) {
+        line.data.set(PALETTE.subarray(row[x] * 4, row[x] * 4 + 4), x * 4);
+      }
+      wctx.putImageData(line, 0, 0);
+    }
+  }, []);
+
+  const { meta, connected } = useSpectrum(brokerUrl, topic, drawRow);
+
+  useEffect(() => {
+    const waterfall = waterfallRef.current;
+    const ctx = waterfall?.getContext('2d');
+    if (waterfall && ctx) {
+      ctx.fillStyle = '#000010';
+      ctx.fillRect(0, 0, waterfall.width, waterfall.height);
+    }
+  }, [meta?.fft_size]);
+
+  const span = meta ? meta.sample_rate / 1e3 : null;
+  const center = meta?.center_freq ? `${(meta.center_freq / 1e6).toFixed(3)} MHz` : 'center';
+
+  return (
+    <div className="space-y-2">
+      <canvas
+        ref={spectrumRef}
+        width={meta?.fft_size ?? 512}
+        height={SPECTRUM_HEIGHT}
+        className="w-full rounded bg-surface-dark"
+        style={{ height: SPECTRUM_HEIGHT, imageRendering: 'pixelated' }}
+      />
+      <canvas
+        ref={waterfallRef}
+        width={meta?.fft_size ?? 512}
+        height={history}
+        className="w-full rounded bg-surface-dark"
+        style={{ height: history, imageRendering: 'pixelated' }}
+      />
+      <div className="flex justify-between text-xs text-text-muted font-mono">
+        <span>{span ? `-${(span / 2).toFixed(0)} kHz` : ''}</span>
+        <span>
+          {center}
+          {meta ? ` · ${meta.db_min}..${meta.db_max} dBFS · ${meta.rate} rows/s` : ''}
+          {connected ? '' : ' · disconnected'}
+        </span>
+        <span>{span ? `+${(span / 2).toFixed(0)} kHz` : ''}</span>
+      </div>
+    </div>
+  );
+};
@@ -58,7 +58,8 @@ export const InjectProvider = ({ children }: { children: ReactNode }) => {
 
   const publishInject = (inject: any) => {
     if (client && client.connected) {
-      const injectsTopic = `apex/team/${teamId}/injects`;
+      // Control topic of this team's SDR service in this exercise
+      const injectsTopic = `/exercise/${exerciseName}/team/${teamId}/injects`;
       client.publish(injectsTopic, JSON.stringify(inject), (err) => {
         if (err) {
           console.error('Failed to publish inject:', err);
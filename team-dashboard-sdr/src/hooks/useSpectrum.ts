@@ -0,0 +1,60 @@
+import { useEffect, useRef, useState } from 'react';
+import mqtt from 'mqtt';
+
+// Row format published retained on `${topic}/meta` by the SDR service
+export interface SpectrumMeta {
+  fft_size: number;
+  sample_rate: number;
+  center_freq: number | null;
+  rate: number;
+  overlap: number;
+  db_min: number;
+  db_max: number;
+}
+
+// Rows arrive ~10 times a second, so they are handed to a callback instead of
+// going through React state (useMqtt keeps every message it receives)
+export const useSpectrum = (brokerUrl: string, topic: string, onRow: (row: Uint8Array) => void) => {
+  const [meta, setMeta] = useState<SpectrumMeta | null>(null);
+  const [connected, setConnected] = useState(false);
+  const onRowRef = useRef(onRow);
+  onRowRef.current = onRow;
+
+  useEffect(() => {
+    const metaTopic = `${topic}/meta`;
+    const client = mqtt.connect(brokerUrl, {
+      reconnectPeriod: 5000,
+      connectTimeout: 30000,
+    });
+
+    client.on('connect', () => {
+      setConnected(true);
+      client.subscribe([topic, metaTopic], (err) => {
+        if (err) {
+          console.error(`Subscription error for ${topic}:`, err);
+        }
+      });
+    });
+
+    client.on('message', (messageTopic, payload) => {
+      if (messageTopic === metaTopic) {
+        try {
+          setMeta(JSON.parse(payload.toString()));
+        } catch (err) {
+          console.error('Invalid spectrum metadata:', err);
+        }
+      } else {
+        onRowRef.current(new Uint8Array(payload.buffer, payload.byteOffset, payload.byteLength));
+      }
+    });
+
+    client.on('close', () => setConnected(false));
+    client.on('offline', () => setConnected(false));
+
+    return () => {
+      client.end();
+    };
+  }, [brokerUrl, topic]);
+
+  return { meta, connected };
+};
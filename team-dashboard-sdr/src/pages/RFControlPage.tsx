@@ -1,12 +1,33 @@
 import { useState, useEffect } from 'react';
 import { useInjects } from '../contexts/InjectContext';
+import { SpectrumWaterfall } from '../components/SpectrumWaterfall';
 
 export const RFControlPage = () => {
   const { publishInject } = useInjects();
   const [jammingPower, setJammingPower] = useState(-30);
+  // Absolute power (dBFS), or jammer-to-signal ratio against the recording's power
+  const [levelMode, setLevelMode] = useState<'power_db' | 'js_db'>('power_db');
+  const [jsRatio, setJsRatio] = useState(0);
+  // Link conditions applied to the recording by the SDR service's channel model
+  const [rainFade, setRainFade] = useState(0);
+  const [noiseEnabled, setNoiseEnabled] = useState(false);
+  const [linkSnr, setLinkSnr] = useState(20);
+  const [dopplerShift, setDopplerShift] = useState('0');
+  const [dopplerRate, setDopplerRate] = useState('0');
   const [playbackState, setPlaybackState] = useState<'play' | 'pause' | 'stop'>('stop');
   const [iqFiles, setIqFiles] = useState<any[]>([]);
   const [selectedIqFile, setSelectedIqFile] = useState<string>('');
+  const [playbackSpeed, setPlaybackSpeed] = useState(1);
+  const [seekTime, setSeekTime] = useState('0');
+  const [loopStart, setLoopStart] = useState('');
+  const [loopEnd, setLoopEnd] = useState('');
+
+  // rtl_tcp endpoint of this team's SDR service (port is allocated per team)
+  const sdrHost = window.location.hostname;
+  const urlParams = new URLSearchParams(window.location.search);
+  const sdrPort = urlParams.get('sdr_port') || '1234';
+  // Spectrum rows published by the same SDR service, next to its control topic
+  const spectrumTopic = `/exercise/${urlParams.get('exercise') || 'test'}/team/${urlParams.get('team') || 'default-team'}/spectrum`;
 
   useEffect(() => {
     // Fetch available IQ files
@@ -21,6 +42,19 @@ export const RFControlPage = () => {
       .catch(err => console.error('Failed to load IQ files:', err));
   }, []);
 
+  const applyChannel = () => {
+    const shift = Number(dopplerShift) || 0;
+    const rate = Number(dopplerRate) || 0;
+    sendCommand('channel_set', {
+      atmosphere: { enabled: rainFade > 0, rain_fade_db: rainFade },
+      awgn: { enabled: noiseEnabled, snr_db: linkSnr },
+      doppler: { enabled: shift !== 0 || rate !== 0, shift_hz: shift, rate_hz_s: rate },
+      ramp_s: 0.5
+    });
+  };
+
+  const jammingLevel = () => (levelMode === 'js_db' ? { js_db: jsRatio } : { power_db: jammingPower });
+
   const sendCommand = (command: string, parameters?: Record<string, any>) => {
     publishInject({
       type: 'trigger',
@@ -48,6 +82,20 @@ export const RFControlPage = () => {
     { label: 'Stop', command: 'stop', icon: '⏹' },
   ];
 
+  const playbackSpeeds = [0.25, 0.5, 1, 2, 4];
+
+  const setSpeed = (speed: number) => {
+    setPlaybackSpeed(speed);
+    sendCommand('set_speed', { speed });
+  };
+
+  const setLoop = () => {
+    sendCommand('set_loop', {
+      start: loopStart === '' ? 0 : Number(loopStart),
+      ...(loopEnd !== '' && { end: Number(loopEnd) }),
+    });
+  };
+
   const jammingTypes = [
     { label: 'CW Tone', command: 'jamming_cw', description: 'Continuous wave jamming' },
     { label: 'Noise', command: 'jamming_noise', description: 'Wideband noise' },
@@ -71,11 +119,11 @@ export const RFControlPage = () => {
             <div className="space-y-2 text-sm text-text-muted font-mono">
               <div className="flex justify-between">
                 <span>Host:</span>
-                <span className="text-text-primary">localhost</span>
+                <span className="text-text-primary">{sdrHost}</span>
               </div>
               <div className="flex justify-between">
                 <span>Port:</span>
-                <span className="text-text-primary">1234</span>
+                <span className="text-text-primary">{sdrPort}</span>
               </div>
               <div className="flex justify-between">
                 <span>Protocol:</span>
@@ -93,13 +141,23 @@ export const RFControlPage = () => {
               <li>Open GQRX</li>
               <li>Go to File → I/O Devices</li>
               <li>Select "RTL-TCP" as device</li>
-              <li>Enter "localhost:1234" as server</li>
+              <li>Enter "{sdrHost}:{sdrPort}" as server</li>
               <li>Click "OK" and start DSP</li>
             </ol>
           </div>
         </div>
       </div>
 
+      {/* Live Spectrum */}
+      <div className="card">
+        <div className="card-header">
+          <h2 className="card-title">Live Spectrum</h2>
+        </div>
+        <div className="card-content">
+          <SpectrumWaterfall brokerUrl={`ws://${sdrHost}:9001`} topic={spectrumTopic} />
+        </div>
+      </div>
+
       {/* IQ File Selection */}
       <div className="card">
         <div className="card-header">
@@ -171,33 +229,215 @@ export const RFControlPage = () => {
               Status: {playbackState.toUpperCase()}
             </div>
           </div>
+
+          {/* Cueing: speed, seek and A/B loop */}
+          <div className="mt-6 space-y-4">
+            <div>
+              <label className="block text-sm font-medium text-text-primary mb-2">Speed</label>
+              <div className="flex gap-2">
+                {playbackSpeeds.map((speed) => (
+                  <button
+                    key={speed}
+                    onClick={() => setSpeed(speed)}
+                    className={`btn flex-1 ${playbackSpeed === speed ? 'bg-primary text-white' : 'btn-secondary'}`}
+                  >
+                    {speed}×
+                  </button>
+                ))}
+              </div>
+            </div>
+            <div className="flex gap-2 items-end">
+              <div className="flex-1">
+                <label className="block text-sm font-medium text-text-primary mb-2">Seek (s)</label>
+                <input
+                  type="number"
+                  min="0"
+                  step="0.1"
+                  value={seekTime}
+                  onChange={(e) => setSeekTime(e.target.value)}
+                  className="w-full bg-surface-dark text-text-primary border border-surface-light rounded px-3 py-2"
+                />
+              </div>
+              <button onClick={() => sendCommand('seek', { time: Number(seekTime) })} className="btn btn-primary">
+                Seek
+              </button>
+            </div>
+            <div className="flex gap-2 items-end">
+              <div className="flex-1">
+                <label className="block text-sm font-medium text-text-primary mb-2">Loop A (s)</label>
+                <input
+                  type="number"
+                  min="0"
+                  step="0.1"
+                  value={loopStart}
+                  onChange={(e) => setLoopStart(e.target.value)}
+                  placeholder="start"
+                  className="w-full bg-surface-dark text-text-primary border border-surface-light rounded px-3 py-2"
+                />
+              </div>
+              <div className="flex-1">
+                <label className="block text-sm font-medium text-text-primary mb-2">Loop B (s)</label>
+                <input
+                  type="number"
+                  min="0"
+                  step="0.1"
+                  value={loopEnd}
+                  onChange={(e) => setLoopEnd(e.target.value)}
+                  placeholder="end of file"
+                  className="w-full bg-surface-dark text-text-primary border border-surface-light rounded px-3 py-2"
+                />
+              </div>
+              <button onClick={setLoop} className="btn btn-primary">
+                Set Loop
+              </button>
+              <button onClick={() => sendCommand('clear_loop')} className="btn btn-secondary">
+                Clear
+              </button>
+            </div>
+          </div>
         </div>
       </div>
 
-      {/* Jamming Controls */}
+      {/* Link Conditions */}
       <div className="card">
         <div className="card-header">
-          <h2 className="card-title">Jamming Controls</h2>
+          <h2 className="card-title">Link Conditions</h2>
         </div>
-        <div className="card-content space-y-6">
-          {/* Power Control */}
+        <div className="card-content space-y-4">
           <div>
             <label className="block text-sm font-medium text-text-primary mb-2">
-              Jamming Power: {jammingPower} dB
+              Rain Fade: {rainFade} dB
+            </label>
+            <input
+              type="range"
+              min="0"
+              max="20"
+              step="0.5"
+              value={rainFade}
+              onChange={(e) => setRainFade(Number(e.target.value))}
+              className="w-full"
+            />
+          </div>
+          <div>
+            <label className="flex items-center gap-2 text-sm font-medium text-text-primary mb-2">
+              <input
+                type="checkbox"
+                checked={noiseEnabled}
+                onChange={(e) => setNoiseEnabled(e.target.checked)}
+              />
+              Receiver Noise: SNR {linkSnr} dB (clear sky)
             </label>
             <input
               type="range"
-              min="-50"
-              max="-10"
+              min="-5"
+              max="40"
               step="1"
-              value={jammingPower}
-              onChange={(e) => setJammingPower(Number(e.target.value))}
+              value={linkSnr}
+              disabled={!noiseEnabled}
+              onChange={(e) => setLinkSnr(Number(e.target.value))}
               className="w-full"
             />
-            <div className="flex justify-between text-xs text-text-muted mt-1">
-              <span>-50 dB (Weak)</span>
-              <span>-10 dB (Strong)</span>
+          </div>
+          <div className="flex gap-2 items-end">
+            <div className="flex-1">
+              <label className="block text-sm font-medium text-text-primary mb-2">Doppler (Hz)</label>
+              <input
+                type="number"
+                step="100"
+                value={dopplerShift}
+                onChange={(e) => setDopplerShift(e.target.value)}
+                className="w-full bg-surface-dark text-text-primary border border-surface-light rounded px-3 py-2"
+              />
             </div>
+            <div className="flex-1">
+              <label className="block text-sm font-medium text-text-primary mb-2">Drift (Hz/s)</label>
+              <input
+                type="number"
+                step="10"
+                value={dopplerRate}
+                onChange={(e) => setDopplerRate(e.target.value)}
+                className="w-full bg-surface-dark text-text-primary border border-surface-light rounded px-3 py-2"
+              />
+            </div>
+          </div>
+          <div className="flex gap-2">
+            <button onClick={applyChannel} className="btn btn-primary flex-1">
+              Apply
+            </button>
+            <button onClick={() => sendCommand('channel_clear', { ramp_s: 0.5 })} className="btn btn-secondary">
+              Clear Link Effects
+            </button>
+          </div>
+        </div>
+      </div>
+
+      {/* Jamming Controls */}
+      <div className="card">
+        <div className="card-header">
+          <h2 className="card-title">Jamming Controls</h2>
+        </div>
+        <div className="card-content space-y-6">
+          {/* Power Control */}
+          <div>
+            <div className="flex gap-2 mb-3">
+              <button
+                onClick={() => setLevelMode('power_db')}
+                className={`btn ${levelMode === 'power_db' ? 'btn-primary' : 'btn-secondary'}`}
+              >
+                Absolute
+              </button>
+              <button
+                onClick={() => setLevelMode('js_db')}
+                className={`btn ${levelMode === 'js_db' ? 'btn-primary' : 'btn-secondary'}`}
+              >
+                J/S
+              </button>
+            </div>
+            {levelMode === 'power_db' ? (
+              <>
+                <label className="block text-sm font-medium text-text-primary mb-2">
+                  Jamming Power: {jammingPower} dB
+                </label>
+                <input
+                  type="range"
+                  min="-50"
+                  max="-10"
+                  step="1"
+                  value={jammingPower}
+                  onChange={(e) => setJammingPower(Number(e.target.value))}
+                  className="w-full"
+                />
+                <div className="flex justify-between text-xs text-text-muted mt-1">
+                  <span>-50 dB (Weak)</span>
+                  <span>-10 dB (Strong)</span>
+                </div>
+              </>
+            ) : (
+              <>
+                <label className="block text-sm font-medium text-text-primary mb-2">
+                  Jammer-to-Signal: {jsRatio > 0 ? '+' : ''}{jsRatio} dB
+                </label>
+                <input
+                  type="range"
+                  min="-20"
+                  max="20"
+                  step="1"
+                  value={jsRatio}
+                  onChange={(e) => setJsRatio(Number(e.target.value))}
+                  className="w-full"
+                />
+                <div className="flex justify-between text-xs text-text-muted mt-1">
+                  <span>-20 dB (Below signal)</span>
+                  <span>+20 dB (Swamps signal)</span>
+                </div>
+              </>
+            )}
+            <button
+              onClick={() => sendCommand('jamming_level', { ...jammingLevel(), ramp_s: 1 })}
+              className="btn btn-secondary mt-3"
+            >
+              Glide Active Jamming to This Level
+            </button>
           </div>
 
           {/* Jamming Type Buttons */}
@@ -205,7 +445,7 @@ export const RFControlPage = () => {
             {jammingTypes.map(({ label, command, description }) => (
               <button
                 key={command}
-                onClick={() => sendCommand(command, { power_db: jammingPower })}
+                onClick={() => sendCommand(command, jammingLevel())}
                 className="btn btn-error text-left flex flex-col"
               >
                 <span className="font-semibold">{label}</span>